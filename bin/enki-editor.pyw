@@ -3,6 +3,7 @@ Enki. A text editor for programmers
 Windows entry point. See also enki.
 """
 
+import multiprocessing
 import sys
 import os.path
 
@@ -15,4 +16,5 @@ sys.path.insert(0, os.path.join(sys.path[0], '..'))
 import enki.main
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # the search worker processes of the frozen executable start here
     sys.exit(enki.main.main())
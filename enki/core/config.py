@@ -238,3 +238,16 @@ class Config():
     def _migrate_to_21(self):
         if not '.*' in self._data['NegativeFileFilter']:
             self._data['NegativeFileFilter'].insert(0, '.*')
+
+    def _migrate_to_22(self):
+        self._data['SearchReplace'] = {'Processes': 0,
+                                       'FilesPerChunk': 64}
+
+    def _migrate_to_23(self):
+        self._data['SearchReplace']['UseIndex'] = False
+
+    def _migrate_to_24(self):
+        self._data['FuzzyOpen'] = {'Backend': 'auto'}
+
+    def _migrate_to_25(self):
+        self._data['UseIgnoreFiles'] = False  # existing users keep seeing their files until they enable it in the settings
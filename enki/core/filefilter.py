@@ -5,17 +5,71 @@ filefilter --- Filter temporary files from FS views
 File browser, Locator, and probably other functionality shall ignore temporaty files,
 such as *.bak, *.o for C++, *.pyc for Python.
 
-This module provides regular expression, which tests, if file shall be ignored.
-Regexp is constructed from patterns, configurable in the settings
+This module provides matcher, which tests, if file shall be ignored.
+Matcher is constructed from patterns, configurable in the settings.
+Names are checked with a few set lookups, only complicated patterns are joined to a regular expression.
+
+Project scanner and search in directory also skip files, ignored by ``.gitignore`` and ``.ignore`` files,
+if ``UseIgnoreFiles`` option is enabled. See :mod:`enki.lib.ignorefiles`
 """
 
 import fnmatch
+import functools
 import re
 
 from PyQt5.QtCore import pyqtSignal, QObject, pyqtSlot
 
 from enki.core.core import core
-from enki.core.uisettings import ListOnePerLineOption, UISettings
+from enki.core.uisettings import CheckableOption, ListOnePerLineOption, UISettings
+
+
+_GLOB_CHARS = '*?['
+# Count of recent results, remembered by the matcher
+_CACHE_SIZE = 4096
+
+
+class FileNameMatcher:
+    """Compiled negative filter. Patterns are split to exact names, prefixes (``.*``), suffixes (``*.pyc``)
+    and the rest, which is joined to a regular expression.
+    Simple patterns are checked with a set lookup and str.startswith()/str.endswith().
+    If there is a regular expression, results are cached.
+
+    match() returns True, if the name matches any pattern.
+    The matcher is immutable and can be used by the threads
+    """
+
+    def __init__(self, patterns):
+        names = set()
+        prefixes = []
+        suffixes = []
+        regExPatterns = []
+        for pattern in patterns:
+            if not any(char in pattern for char in _GLOB_CHARS):
+                names.add(pattern)
+            elif pattern.startswith('*') and not any(char in pattern[1:] for char in _GLOB_CHARS):
+                suffixes.append(pattern[1:])
+            elif pattern.endswith('*') and not any(char in pattern[:-1] for char in _GLOB_CHARS):
+                prefixes.append(pattern[:-1])
+            else:
+                regExPatterns.append(fnmatch.translate(pattern))
+
+        self._names = frozenset(names)
+        self._prefixes = tuple(prefixes)
+        self._suffixes = tuple(suffixes)
+        if regExPatterns:
+            self._regExp = re.compile('(' + ')|('.join(regExPatterns) + ')')
+            self.match = functools.lru_cache(maxsize=_CACHE_SIZE)(self._matchWithRegExp)
+        else:
+            self._regExp = None
+            self.match = self._match
+
+    def _match(self, name):
+        return name in self._names or \
+            name.endswith(self._suffixes) or \
+            name.startswith(self._prefixes)
+
+    def _matchWithRegExp(self, name):
+        return self._match(name) or self._regExp.match(name) is not None
 
 
 class FileFilter(QObject):
@@ -26,7 +80,7 @@ class FileFilter(QObject):
     """
     regExpChanged()
 
-    **Signal** emitted, when regExp has changed
+    **Signal** emitted, when regExp, matcher or useIgnoreFiles option has changed
     """  # pylint: disable=W0105
 
     def __init__(self):
@@ -38,16 +92,30 @@ class FileFilter(QObject):
     def regExp(self):
         """Get negative filer reg exp.
 
-        If file name matches it, ignore this file
+        If file name matches it, ignore this file.
+        matcher() is faster
         """
         return self._regExp
 
+    def matcher(self):
+        """Get negative filter :class:`FileNameMatcher`.
+
+        If ``matcher().match(name)`` returns True, ignore this file
+        """
+        return self._matcher
+
+    def useIgnoreFiles(self):
+        """Check if files, ignored by .gitignore and .ignore files, shall be skipped
+        """
+        return self._useIgnoreFiles
+
     @pyqtSlot(UISettings)
     def _onSettingsDialogAboutToExecute(self, dialog):
         """UI settings dialogue is about to execute.
-        Add own option
+        Add own options
         """
         dialog.appendOption(ListOnePerLineOption(dialog, core.config(), "NegativeFileFilter", dialog.pteFilesToHide))
+        dialog.appendOption(CheckableOption(dialog, core.config(), "UseIgnoreFiles", dialog.cbUseIgnoreFiles))
 
     @pyqtSlot()
     def _applySettings(self):
@@ -58,4 +126,6 @@ class FileFilter(QObject):
         regExPatterns = [fnmatch.translate(f) for f in filters]
         compositeRegExpPattern = '(' + ')|('.join(regExPatterns) + ')'
         self._regExp = re.compile(compositeRegExpPattern)
+        self._matcher = FileNameMatcher(filters)
+        self._useIgnoreFiles = core.config()["UseIgnoreFiles"]
         self.regExpChanged.emit()
@@ -455,10 +455,26 @@ class _CompletableLineEdit(QLineEdit):
         return text
 
 
+class _CompleterLoaderSignals(QObject):
+    """Signals of _CompleterLoaderThread. The object lives in the GUI thread,
+    therefore the signals, emitted by the thread, are queued to the GUI thread
+    """
+    completerLoaded = pyqtSignal(int, object, object)
+    """
+    completerLoaded(taskId, command, completer)
+
+    **Signal** emitted by the thread, when the completer has been loaded
+    """  # pylint: disable=W0105
+
+
 class _CompleterLoaderThread(Thread):
     """Thread constructs Completer
     Sometimes it requires a lot of time, i.e. when expanding "/usr/lib/*"
     hlamer: I tried to use QThread + pyqtSignal, but got tired with crashes and deadlocks
+
+    Loaded completer is delivered with a queued Qt signal as soon as it is ready.
+    Every task has own stop event, therefore a new task doesn't wait, until the previous one is stopped.
+    Results of the stale tasks are dropped
     """
     daemon = True
 
@@ -469,43 +485,35 @@ class _CompleterLoaderThread(Thread):
 
         self._locator = locator
 
-        self._taskQueue = Queue()  # completer or None as exit signal
-        self._resultQueue = Queue()
+        self._taskQueue = Queue()  # (task id, command, completer, stop event) or None as exit signal
+        self._lastTaskId = 0
+        self._stopEvent = Event()  # of the last task
 
-        self._checkResultQueueTimer = QTimer()
-        self._checkResultQueueTimer.setInterval(50)
-        self._checkResultQueueTimer.timeout.connect(self._checkResultQueue)
-        self._checkResultQueueTimer.start()
+        self._signals = _CompleterLoaderSignals()
+        self._signals.completerLoaded.connect(self._onCompleterLoaded)
 
-        self._stopEvent = Event()
         Thread.start(self)
 
-    def _checkResultQueue(self):
-        """Check if thread constructed a completer and put it to the queue
+    def _onCompleterLoaded(self, taskId, command, completer):
+        """Thread constructed a completer
         Works in the GUI thread
         """
-        if not self._resultQueue.empty():
-            command, completer = self._resultQueue.get()
+        if taskId == self._lastTaskId:  # not stale
             self._locator.onCompleterLoaded(command, completer)
 
     def loadCompleter(self, command, completer):
         """Start constructing completer
         Works in the GUI thread
         """
-        # Stop previous
+        # Stop previous. Don't wait for it
         self._stopEvent.set()
-        self._taskQueue.join()
-
-        # Drop previous result
-        while not self._resultQueue.empty():
-            self._resultQueue.get()
 
         # Start new
-        self._stopEvent.clear()
-        task = (command, completer)
+        self._lastTaskId += 1
+        self._stopEvent = Event()
         if not self.is_alive():
             assert 0
-        self._taskQueue.put(task)
+        self._taskQueue.put((self._lastTaskId, command, completer, self._stopEvent))
 
     def terminate(self):
         """Set termination flag
@@ -513,18 +521,17 @@ class _CompleterLoaderThread(Thread):
         """
         if self.is_alive():
             self._stopEvent.set()
+            self._lastTaskId += 1  # drop not delivered results
             self._taskQueue.put(None)
-            self._checkResultQueueTimer.stop()
             self.join()
+        self._signals.completerLoaded.disconnect(self._onCompleterLoaded)
 
     def _getNextTask(self):
-        # discard old commands
-        while self._taskQueue.qsize() > 1:
-            self._taskQueue.get()
-            self._taskQueue.task_done()
-
-        # Get the last command
-        return self._taskQueue.get()
+        # Get the last command, discard old
+        task = self._taskQueue.get()
+        while task is not None and not self._taskQueue.empty():
+            task = self._taskQueue.get()
+        return task
 
     def run(self):
         """Thread function
@@ -532,16 +539,16 @@ class _CompleterLoaderThread(Thread):
         """
         while True:
             task = self._getNextTask()
-            try:
-                if task is None:  # exit command
-                    break
+            if task is None:  # exit command
+                break
+
+            taskId, command, completer, stopEvent = task
+            if stopEvent.is_set():
+                continue
 
-                command, completer = task
-                completer.load(self._stopEvent)
-                if self._taskQueue.empty():
-                    self._resultQueue.put((command, completer))
-            finally:
-                self._taskQueue.task_done()
+            completer.load(stopEvent)
+            if not stopEvent.is_set():
+                self._signals.completerLoaded.emit(taskId, command, completer)
 
 
 def splitLine(text):
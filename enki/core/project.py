@@ -5,63 +5,838 @@ project --- Open project and manage it
 :class:`enki.core.project.Project`
 """
 
+import concurrent.futures
+import hashlib
 import os
 import os.path
+import pickle
+import sys
 import time
 
-from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QThread, QTimer, pyqtSignal, pyqtSlot
 
 from enki.core.core import core
+import enki.core.defines
+from enki.lib import ignorefiles
+from enki.lib.filelist import FileList, FileNameIndex
 
 
 STATUS_UPDATE_TIMEOUT_SEC = 0.25
 STATUS_SHOW_TIMEOUT_MSEC = 3000
 
+# Directory listing mostly waits for the file system and doesn't hold the GIL,
+# therefore subtrees are scanned concurrently even on one CPU
+_SCAN_THREAD_COUNT = 8
+_DIRS_PER_TASK = 64
+
+# Changes are collected during this time and applied at once
+_WATCH_NOTIFY_DELAY_MSEC = 300
+# Directories, which failed to watch, are polled. Every poll checks a batch of them
+_POLL_INTERVAL_MSEC = 2000
+_POLLED_PATHS_PER_BATCH = 500
+
+_CACHE_FORMAT_VERSION = 2
+
+# Directory modification time might not change, if the directory is modified
+# shortly after scanning it. Listings of such directories are not trusted
+_RACY_MTIME_NS = 2 * 1000 * 1000 * 1000
+
+
+def _cacheFilePath(projectPath):
+    pathHash = hashlib.sha1(projectPath.encode('utf8', errors='replace')).hexdigest()
+    return os.path.join(enki.core.defines.CONFIG_DIR, 'project_cache', pathHash + '.pickle')
+
+
+def _filterKey():
+    """Listings are filtered. Cached listings are used only with the same filter settings
+    """
+    fileFilter = core.fileFilter()
+    return (fileFilter.regExp().pattern, fileFilter.useIgnoreFiles())
+
+
+def _ignoreFilesStamp(fullPath, fileNames):
+    """Get tuple of (name, mtime, size) of the ignore files in the directory.
+    Ignore files are checked, when the directory listing is taken from the cache
+    """
+    stamp = []
+    for fileName in sorted(fileNames):
+        try:
+            stat = os.stat(os.path.join(fullPath, fileName))
+        except OSError:
+            continue
+        stamp.append((fileName, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+def _loadCache(projectPath, filterKey):
+    """Load directory listings of the project, saved by the previous scan.
+    Returns dictionary {relative directory path: (mtime, file names, directory names, ignore files stamp)} or None
+    """
+    filePath = _cacheFilePath(projectPath)
+    try:
+        with open(filePath, 'rb') as cacheFile:
+            data = pickle.load(cacheFile)
+    except FileNotFoundError:
+        return None
+    except Exception as ex:  # broken file
+        print('Failed to load project cache {}: {}'.format(filePath, ex), file=sys.stderr)
+        return None
+
+    if data.get('version') == _CACHE_FORMAT_VERSION and \
+       data['projectPath'] == projectPath and \
+       data['filter'] == filterKey:  # listings are filtered
+        return data['dirs']
+    else:
+        return None
+
+
+def _saveCache(projectPath, filterKey, dirs):
+    filePath = _cacheFilePath(projectPath)
+    data = {'version': _CACHE_FORMAT_VERSION,
+            'projectPath': projectPath,
+            'filter': filterKey,
+            'dirs': dirs}
+    tmpPath = filePath + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(filePath), exist_ok=True)
+        with open(tmpPath, 'wb') as cacheFile:
+            pickle.dump(data, cacheFile, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpPath, filePath)
+    except (IOError, OSError) as ex:
+        print('Failed to save project cache {}: {}'.format(filePath, ex), file=sys.stderr)
+
+
+def _cachedFiles(dirs, rootPrefix=''):
+    """Make :class:`enki.lib.filelist.FileList` of the project files from the directory listings.
+    Order of the files is the same as when scanning.
+    rootPrefix is the path of the project root relative to the main root, it is prepended to the paths
+    """
+    files = []
+    stack = ['']
+    while stack:
+        relDir = stack.pop()
+        if relDir not in dirs:
+            continue
+        mtime, fileNames, dirNames, ignoreStamp = dirs[relDir]
+        if relDir or rootPrefix:
+            prefix = os.path.join(rootPrefix, relDir, '')
+            files.extend([prefix + fileName for fileName in fileNames])
+        else:
+            files.extend(fileNames)
+        stack.extend(os.path.join(relDir, dirName) for dirName in reversed(dirNames))
+    return FileList(files)
+
 
 class _ScannerThread(QThread):
-    itemsReady = pyqtSignal(str, list)
+    itemsReady = pyqtSignal(str, object)
     status = pyqtSignal(str)
 
-    def __init__(self, parent, path):
+    def __init__(self, parent, path, cachedDirs, changedDirs=None, reportStatus=True, rootPrefix='',
+                 previousFiles=None):
+        """If changedDirs is set, only these directories and new subdirectories are scanned.
+        Other directory listings are taken from cachedDirs.
+        rootPrefix is prepended to the paths of the found files, see _cachedFiles()
+        previousFiles is the current FileList of the root, which is made of cachedDirs, if these are set.
+        Changes of the list are detected by the thread
+        """
         QThread.__init__(self, parent)
         self._path = path
+        self._rootPrefix = rootPrefix
+        self._hasCachedDirs = cachedDirs is not None
+        self._cachedDirs = cachedDirs or {}
+        self._changedDirs = changedDirs
+        self._reportStatus = reportStatus
+        self._previousFiles = previousFiles
+        self._dirs = None
+        self._files = None
+        self._fileNameIndex = None
+        self._changes = None
         self._stop = False
 
-    def run(self):
-        results = []
+    def dirs(self):
+        """Directory listings, made by the finished scan. See _loadCache()
+        """
+        return self._dirs
 
-        filterRe = core.fileFilter().regExp()
+    def files(self):
+        """FileList of the files, found by the finished scan. The previous list, if nothing has changed
+        """
+        return self._files
+
+    def fileNameIndex(self):
+        """FileNameIndex of the files, found by the finished scan.
+        None, if nothing has changed since the previous list
+        """
+        return self._fileNameIndex
+
+    def changes(self):
+        """Tuple (added paths, removed paths) since the previous list of files.
+        None, if the previous list hasn't been passed
+        """
+        return self._changes
+
+    def _filePaths(self, dirs, relDir):
+        """Paths of the files of the listed directory, relative to the main root
+        """
+        listing = dirs.get(relDir)
+        if listing is None:
+            return []
+        if relDir or self._rootPrefix:
+            prefix = os.path.join(self._rootPrefix, relDir, '')
+            return [prefix + fileName for fileName in listing[1]]
+        return list(listing[1])
+
+    def _diffListings(self, dirs, relDirs):
+        """Get (added paths, removed paths) in the directories since the cached listings
+        """
+        added = []
+        removed = []
+        for relDir in sorted(relDirs):
+            oldFiles = self._filePaths(self._cachedDirs, relDir)
+            newFiles = self._filePaths(dirs, relDir)
+            if oldFiles != newFiles:
+                oldFilesSet = set(oldFiles)
+                newFilesSet = set(newFiles)
+                added += [filePath for filePath in newFiles if filePath not in oldFilesSet]
+                removed += [filePath for filePath in oldFiles if filePath not in newFilesSet]
+        return added, removed
 
+    def _listDir(self, relDir, fullPath, filterMatcher, parentRules):
+        """Get (file names, directory names, ignore files stamp, ignore rules) of not filtered directory items.
+        parentRules are ignore rules of the parent directory or None, if ignore files are not used.
+        Ignored items are skipped, ignored directories are not scanned at all
+        """
+        fileNames = []
+        dirNames = []
+        ignoreFileNames = []
+        try:
+            with os.scandir(fullPath) as entries:
+                for entry in entries:
+                    if entry.name in ignorefiles.IGNORE_FILE_NAMES:
+                        ignoreFileNames.append(entry.name)
+                    if filterMatcher.match(entry.name):
+                        continue
+                    try:
+                        # DirEntry knows the type without stat() on the most of platforms
+                        if entry.is_dir():
+                            if not entry.is_symlink():  # os.walk doesn't follow links to directories
+                                dirNames.append(entry.name)
+                        else:
+                            fileNames.append(entry.name)
+                    except OSError:
+                        pass
+        except OSError:  # os.walk ignores not readable directories
+            pass
+
+        if parentRules is None:
+            return fileNames, dirNames, (), None
+
+        rules = parentRules.forDirectory(relDir, fullPath, ignoreFileNames)
+        if not rules.isEmpty():
+            fileNames = [fileName for fileName in fileNames
+                         if not rules.isIgnored(os.path.join(relDir, fileName), False)]
+            dirNames = [dirName for dirName in dirNames
+                        if not rules.isIgnored(os.path.join(relDir, dirName), True)]
+        return fileNames, dirNames, _ignoreFilesStamp(fullPath, ignoreFileNames), rules
+
+    def _scanDir(self, relDir, filterMatcher, parentRules, scanStartTimeNs, useCache=True):
+        """Get (listing, ignore rules, ignore files changed) of the directory.
+        Listing is (mtime, file names, directory names, ignore files stamp).
+        Cached listing is used, if the directory and its ignore files haven't been modified.
+        If the ignore files have been modified, cached listings of the subdirectories are outdated
+        """
+        fullPath = os.path.join(self._path, relDir)
+        try:
+            mtime = os.stat(fullPath).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        oldListing = self._cachedDirs.get(relDir)
+        cached = oldListing if useCache else None
+        if mtime is not None and cached is not None and cached[0] == mtime and \
+           (parentRules is None or
+            _ignoreFilesStamp(fullPath, [item[0] for item in cached[3]]) == cached[3]):
+            fileNames, dirNames, ignoreStamp = cached[1:]
+            if parentRules is None:
+                rules = None
+            else:
+                rules = parentRules.forDirectory(relDir, fullPath, [item[0] for item in ignoreStamp])
+        else:
+            fileNames, dirNames, ignoreStamp, rules = self._listDir(relDir, fullPath, filterMatcher, parentRules)
+
+        ignoreFilesChanged = oldListing is not None and oldListing[3] != ignoreStamp
+
+        if mtime is not None and scanStartTimeNs - mtime < _RACY_MTIME_NS:
+            mtime = None  # list again next time
+        return (mtime, fileNames, dirNames, ignoreStamp), rules, ignoreFilesChanged
+
+    def _scanSubtree(self, relDir, parentRules, useCache, filterMatcher, scanStartTimeNs):
+        """Scan the directory and its subdirectories. Executed by the thread pool.
+
+        Not more than _DIRS_PER_TASK directories are scanned.
+        Returns (dictionary of directory listings, list of not scanned subtrees).
+        Subtree is a tuple (relative path, ignore rules of the parent, use cache)
+        """
+        listings = {}
+        stack = [(relDir, parentRules, useCache)]
+        while stack and len(listings) < _DIRS_PER_TASK and not self._stop:
+            relDir, parentRules, useCache = stack.pop()
+            listing, rules, ignoreFilesChanged = self._scanDir(relDir, filterMatcher, parentRules,
+                                                               scanStartTimeNs, useCache)
+            listings[relDir] = listing
+            useCache = useCache and not ignoreFilesChanged
+            stack.extend((os.path.join(relDir, dirName), rules, useCache) for dirName in listing[2])
+        return listings, stack
+
+    def _scanSubtrees(self, subtrees, filterMatcher, scanStartTimeNs):
+        """Scan the subtrees concurrently with a thread pool. See _scanSubtree()
+        Returns dictionary of directory listings
+        """
+        dirs = {}
+        fileCount = 0
         basename = os.path.basename(self._path)
         lastUpdateTime = time.time()
 
-        self.status.emit('Scanning {}: {} files found'.format(basename, len(results)))
+        with concurrent.futures.ThreadPoolExecutor(_SCAN_THREAD_COUNT) as executor:
+            pending = {executor.submit(self._scanSubtree, *subtree, filterMatcher, scanStartTimeNs)
+                       for subtree in subtrees}
+            while pending and not self._stop:
+                done, pending = concurrent.futures.wait(pending,
+                                                        timeout=STATUS_UPDATE_TIMEOUT_SEC,
+                                                        return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    listings, notScannedSubtrees = future.result()
+                    dirs.update(listings)
+                    fileCount += sum(len(listing[1]) for listing in listings.values())
+                    for subtree in notScannedSubtrees:
+                        pending.add(executor.submit(self._scanSubtree, *subtree, filterMatcher, scanStartTimeNs))
+
+                if self._reportStatus and \
+                   time.time() - lastUpdateTime > STATUS_UPDATE_TIMEOUT_SEC:
+                    self.status.emit('Scanning {}: {} files found'.format(basename, fileCount))
+                    lastUpdateTime = time.time()
+
+            for future in pending:
+                future.cancel()
+
+        return dirs
+
+    def _rulesFor(self, dirs, relDir, rootRules):
+        """Get ignore rules of the directory from the ignore files of the listed directories
+        """
+        if rootRules is None:
+            return None
+
+        rules = rootRules
+        parts = relDir.split(os.sep) if relDir else []
+        for index in range(len(parts) + 1):
+            dirPath = os.sep.join(parts[:index])
+            listing = dirs.get(dirPath)
+            if listing is not None and listing[3]:
+                rules = rules.forDirectory(dirPath, os.path.join(self._path, dirPath),
+                                           [item[0] for item in listing[3]])
+        return rules
+
+    def _updateDirs(self, filterMatcher, rootRules, scanStartTimeNs):
+        """List the changed directories again. Scan new subdirectories and forget removed.
+        If ignore files of a directory have changed, the whole subtree is listed again.
+        Returns (dictionary of directory listings, set of listed, new and removed directories)
+        """
+        dirs = dict(self._cachedDirs)
+        touchedDirs = set()
+        newSubtrees = []
+
+        for relDir in sorted(self._changedDirs):  # parents first
+            oldListing = dirs.get(relDir)
+            if oldListing is None:  # removed together with the parent or not a project directory
+                continue
+
+            if relDir:
+                parentRules = self._rulesFor(dirs, os.path.dirname(relDir), rootRules)
+            else:
+                parentRules = rootRules
+            listing, rules, ignoreFilesChanged = self._scanDir(relDir, filterMatcher, parentRules,
+                                                               scanStartTimeNs, useCache=False)
+            dirs[relDir] = listing
+            touchedDirs.add(relDir)
+
+            oldDirNames = set(oldListing[2])
+            if ignoreFilesChanged:  # subdirectories are filtered with the new rules
+                keptDirNames = set()
+            else:
+                keptDirNames = oldDirNames & set(listing[2])
+            for dirName in oldDirNames - keptDirNames:
+                subtree = os.path.join(relDir, dirName)
+                subtreePrefix = os.path.join(subtree, '')
+                for removedDir in [key for key in dirs
+                                   if key == subtree or key.startswith(subtreePrefix)]:
+                    del dirs[removedDir]
+                    touchedDirs.add(removedDir)
+            newSubtrees += [(os.path.join(relDir, dirName), rules, not ignoreFilesChanged)
+                            for dirName in listing[2]
+                            if dirName not in keptDirNames]
+
+        newDirs = self._scanSubtrees(newSubtrees, filterMatcher, scanStartTimeNs)
+        dirs.update(newDirs)
+        touchedDirs.update(newDirs)
+        return dirs, touchedDirs
+
+    def run(self):
+        """Scan the project. Subtrees are scanned concurrently with a thread pool.
+        Directories, which haven't been modified since the previous scan, are not listed again
+        """
+        filterMatcher = core.fileFilter().matcher()
+        filterKey = _filterKey()
+        if core.fileFilter().useIgnoreFiles():
+            rootRules = ignorefiles.rulesForTree(self._path)
+        else:
+            rootRules = None
+
+        basename = os.path.basename(self._path)
+        scanStartTimeNs = time.time_ns()
+
+        if self._reportStatus:
+            self.status.emit('Scanning {}: {} files found'.format(basename, 0))
+
+        if self._changedDirs is not None:
+            dirs, touchedDirs = self._updateDirs(filterMatcher, rootRules, scanStartTimeNs)
+        else:
+            dirs = self._scanSubtrees([('', rootRules, True)], filterMatcher, scanStartTimeNs)
+            touchedDirs = set(dirs) | set(self._cachedDirs)
 
-        for root, dirnames, filenames in os.walk(self._path):
-            if self._stop:
-                break
+        if self._stop:
+            return
 
-            # remove not interesting directories
-            for dirname in dirnames[:]:
-                if filterRe.match(dirname):
-                    dirnames.remove(dirname)
+        # Changes are detected in the touched directories only, the list and the index are rebuilt
+        # only if something has been added or removed
+        if self._previousFiles is None:
+            self._changes = None
+        elif self._hasCachedDirs:
+            self._changes = self._diffListings(dirs, touchedDirs)
+        else:  # the listings have been filtered with another filter
+            self._changes = self._diffFiles(_cachedFiles(dirs, self._rootPrefix))
 
-            for filename in filenames:
-                if not filterRe.match(filename):
-                    results.append(os.path.relpath(os.path.join(root, filename), self._path))
-            if time.time() - lastUpdateTime > STATUS_UPDATE_TIMEOUT_SEC:
-                self.status.emit('Scanning {}: {} files found'.format(basename, len(results)))
-                lastUpdateTime = time.time()
+        if self._changes is not None and not any(self._changes):
+            results = self._previousFiles
+        else:
+            results = _cachedFiles(dirs, self._rootPrefix)
+            self._fileNameIndex = FileNameIndex(results)
 
-        if not self._stop:
+        self._files = results
+        self._dirs = dirs
+        if dirs != self._cachedDirs:
+            _saveCache(self._path, filterKey, dirs)
+        if self._reportStatus:
             self.status.emit('Scanning {} done: {} files found'.format(basename, len(results)))
-            self.itemsReady.emit(self._path, results)
+        self.itemsReady.emit(self._path, results)
+
+    def _diffFiles(self, files):
+        """Get (added paths, removed paths) since the previous list of files
+        """
+        previousFilesSet = set(self._previousFiles)
+        filesSet = set(files)
+        added = [filePath for filePath in files if filePath not in previousFilesSet]
+        removed = [filePath for filePath in self._previousFiles if filePath not in filesSet]
+        return added, removed
 
     def stop(self):
         self._stop = True
 
 
+class _FileNameIndexThread(QThread):
+    """Builds FileNameIndex of the files, which have been loaded from the cache.
+    Sorting of the index of a big project takes noticeable time
+    """
+    indexReady = pyqtSignal(object)
+
+    def __init__(self, parent, files):
+        QThread.__init__(self, parent)
+        self._files = files
+
+    def run(self):
+        self.indexReady.emit(FileNameIndex(self._files))
+
+
+class _DirectoryWatcher(QObject):
+    """Watches the project directories with QFileSystemWatcher and reports changed directories.
+    Ignore files are watched too, modified ignore file is reported as a change of its directory.
+
+    If failed to watch some of the directories, i.e. the system limit of the watches has been reached,
+    the watcher falls back to polling of these directories: it periodically checks their modification time
+    """
+
+    dirsChanged = pyqtSignal(object)
+    """
+    dirsChanged(relDirs)
+
+    **Signal** emitted, when directories have been changed.
+    Parameter is a list of relative paths of the directories
+    """
+
+    def __init__(self, parent):
+        QObject.__init__(self, parent)
+        self._path = None
+        self._fsWatcher = None
+        self._watchedPaths = set()
+        self._relDirs = frozenset()
+        self._polledPaths = {}  # relative path: stamp, see _pathStamp()
+        self._pollQueue = []  # paths, which are checked by the next polls
+        self._changedDirs = set()
+
+        self._notifyTimer = QTimer(self)
+        self._notifyTimer.setSingleShot(True)
+        self._notifyTimer.setInterval(_WATCH_NOTIFY_DELAY_MSEC)
+        self._notifyTimer.timeout.connect(self._notify)
+
+        self._pollTimer = QTimer(self)
+        self._pollTimer.setInterval(_POLL_INTERVAL_MSEC)
+        self._pollTimer.timeout.connect(self._poll)
+
+    def watch(self, path, relDirs, relFiles=()):
+        """Watch the project directories and files. Replaces the previous lists
+        """
+        if path != self._path:
+            self.stop()
+            self._path = path
+
+        if self._fsWatcher is None:
+            self._fsWatcher = QFileSystemWatcher(self)
+            self._fsWatcher.directoryChanged.connect(self._onDirectoryChanged)
+            self._fsWatcher.fileChanged.connect(self._onFileChanged)
+
+        self._relDirs = frozenset(relDirs)
+        relPaths = self._relDirs | set(relFiles)
+        notWatchedPaths = self._watchedPaths - relPaths
+        newPaths = list(relPaths - self._watchedPaths - self._polledPaths.keys())
+        if notWatchedPaths:
+            self._fsWatcher.removePaths([os.path.join(path, relPath) for relPath in notWatchedPaths])
+        self._watchedPaths = self._watchedPaths & relPaths
+        self._polledPaths = {relPath: stamp
+                             for relPath, stamp in self._polledPaths.items()
+                             if relPath in relPaths}
+
+        if newPaths:
+            fullPaths = [os.path.join(path, relPath) for relPath in newPaths]
+            failedPaths = set(self._fsWatcher.addPaths(fullPaths))
+            for relPath, fullPath in zip(newPaths, fullPaths):
+                if fullPath in failedPaths:
+                    self._polledPaths[relPath] = self._pathStamp(relPath)
+                else:
+                    self._watchedPaths.add(relPath)
+
+        if self._polledPaths and not self._pollTimer.isActive():
+            self._pollTimer.start()
+        elif not self._polledPaths:
+            self._pollTimer.stop()
+
+    def stop(self):
+        """Stop watching
+        """
+        self._stopFsWatcher()
+        self._pollTimer.stop()
+        self._polledPaths = {}
+        self._pollQueue = []
+        self._notifyTimer.stop()
+        self._changedDirs = set()
+
+    def _stopFsWatcher(self):
+        if self._fsWatcher is not None:
+            self._fsWatcher.directoryChanged.disconnect(self._onDirectoryChanged)
+            self._fsWatcher.fileChanged.disconnect(self._onFileChanged)
+            self._fsWatcher.deleteLater()
+            self._fsWatcher = None
+        self._watchedPaths = set()
+
+    @pyqtSlot(str)
+    def _onDirectoryChanged(self, fullPath):
+        relDir = os.path.relpath(fullPath, self._path)
+        if relDir == os.curdir:
+            relDir = ''
+        self._changedDirs.add(relDir)
+        self._notifyTimer.start()
+
+    @pyqtSlot(str)
+    def _onFileChanged(self, fullPath):
+        relPath = os.path.relpath(fullPath, self._path)
+        # The watch is lost, if the file has been replaced. Add it again with the next watch()
+        self._watchedPaths.discard(relPath)
+        if self._fsWatcher is not None:
+            self._fsWatcher.removePath(fullPath)
+        self._changedDirs.add(os.path.dirname(relPath))
+        self._notifyTimer.start()
+
+    def _pathStamp(self, relPath):
+        """Get (mtime, size) of the path. Empty tuple, if the path is not readable.
+        None, if the mtime can't be trusted yet
+        """
+        try:
+            stat = os.stat(os.path.join(self._path, relPath))
+        except OSError:
+            return ()
+        if time.time_ns() - stat.st_mtime_ns < _RACY_MTIME_NS:
+            return None  # might be modified again without changing the mtime. Report it with the next poll
+        return stat.st_mtime_ns, stat.st_size
+
+    def _poll(self):
+        """Check the next batch of the polled paths, report the changed ones as the fs watcher does
+        """
+        if not self._pollQueue:
+            self._pollQueue = list(self._polledPaths)
+        batch = self._pollQueue[-_POLLED_PATHS_PER_BATCH:]
+        del self._pollQueue[-_POLLED_PATHS_PER_BATCH:]
+
+        for relPath in batch:
+            if relPath not in self._polledPaths:  # not watched anymore
+                continue
+            stamp = self._pathStamp(relPath)
+            if stamp is None or stamp != self._polledPaths[relPath]:
+                self._polledPaths[relPath] = stamp
+                # A modified ignore file is a change of its directory
+                self._changedDirs.add(relPath if relPath in self._relDirs else os.path.dirname(relPath))
+                self._notifyTimer.start()
+
+    def _notify(self):
+        changedDirs = sorted(self._changedDirs)
+        self._changedDirs = set()
+        self.dirsChanged.emit(changedDirs)
+
+
+class _ProjectFileNameIndex:
+    """FileNameIndex of the project with a few roots. Every root has own index.
+    Found paths are returned in the order of the project files
+    """
+
+    def __init__(self, files, indexes):
+        self._files = files
+        self._indexes = indexes
+
+    def files(self):
+        return self._files
+
+    def findByName(self, name):
+        return [path for index in self._indexes for path in index.findByName(name)]
+
+    def findByStem(self, stem):
+        return [path for index in self._indexes for path in index.findByStem(stem)]
+
+
+class _ProjectRoot(QObject):
+    """Root directory of the project.
+
+    Every root has own scanner thread, directory watcher, cache of the directory listings, list of files and status.
+    Paths of the files are relative to the main root of the project, the root path relative to it is the prefix
+    """
+
+    filesUpdated = pyqtSignal(object, object, object)
+    """
+    filesUpdated(root, added, removed)
+
+    **Signal** emitted, when list of the root files has been loaded or updated.
+    added and removed are lists of the paths or ``None``, if the files haven't been loaded before
+    """
+    # pylint: disable=W0105
+
+    scanStatusChanged = pyqtSignal(object, str)
+    """
+    scanStatusChanged(root, text)
+
+    **Signal** emitted, when scanning status of the root is changed
+    """
+    # pylint: disable=W0105
+
+    fileNameIndexReady = pyqtSignal(object)
+    """
+    fileNameIndexReady(root)
+
+    **Signal** emitted, when the file name index of the files, loaded from the cache, has been built
+    """
+    # pylint: disable=W0105
+
+    def __init__(self, parent, path, prefix):
+        QObject.__init__(self, parent)
+        self._path = path
+        self._prefix = prefix
+        self._files = None
+        self._filesAreCached = False
+        self._fileNameIndex = None
+        self._indexThread = None
+        self._cachedDirs = None
+        self._thread = None
+        self._threadIsUpdate = False
+        self._pendingChangedDirs = None
+        self._scanStatus = 'Not scanning'
+
+        self._watcher = _DirectoryWatcher(self)
+        self._watcher.dirsChanged.connect(self._onDirsChanged)
+
+        self._loadCache()
+
+    def terminate(self):
+        self._watcher.stop()
+        self._stopScannerThread()
+        if self._indexThread is not None:
+            self._indexThread.indexReady.disconnect(self._onFileNameIndexReady)
+            self._indexThread.wait()
+            self._indexThread = None
+
+    def path(self):
+        return self._path
+
+    def files(self):
+        """FileList of the root files or ``None``, if not loaded yet
+        """
+        return self._files
+
+    def fileNameIndex(self):
+        """FileNameIndex of the root files or ``None``, if not loaded yet.
+        Index of the files, loaded from the cache, is built by a thread, see fileNameIndexReady
+        """
+        if self._fileNameIndex is None or self._fileNameIndex.files() is not self._files:
+            return None
+        return self._fileNameIndex
+
+    def scanStatus(self):
+        return self._scanStatus
+
+    def isScanning(self):
+        return self._thread is not None
+
+    def isLoading(self):
+        """Scanning, which is not an update of the loaded files
+        """
+        return self._thread is not None and not self._threadIsUpdate
+
+    def _startScannerThread(self, changedDirs=None, isUpdate=False):
+        """Start scanning. Update only applies changes, reported by the watcher, and doesn't report status
+        """
+        assert self._thread is None
+        self._thread = _ScannerThread(self, self._path, self._cachedDirs,
+                                      changedDirs, reportStatus=not isUpdate, rootPrefix=self._prefix,
+                                      previousFiles=self._files)
+        self._threadIsUpdate = isUpdate
+        self._thread.itemsReady.connect(self._onFilesReady)
+        self._thread.status.connect(self._onScanStatus)
+        if not isUpdate:
+            self._scanStatus = ''
+        self._thread.start()
+
+    def _stopScannerThread(self):
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread.wait()
+            self._thread.itemsReady.disconnect(self._onFilesReady)
+            self._thread.status.disconnect(self._onScanStatus)
+            self._thread = None
+
+    def _loadCache(self):
+        """Serve list of files from the previous scan, if available.
+        It will be verified by the next scan
+        """
+        self._cachedDirs = _loadCache(self._path, _filterKey())
+        if self._cachedDirs is not None:
+            self._files = _cachedFiles(self._cachedDirs, self._prefix)
+            self._filesAreCached = True
+            self._indexThread = _FileNameIndexThread(self, self._files)
+            self._indexThread.indexReady.connect(self._onFileNameIndexReady)
+            self._indexThread.start()
+        else:
+            self._files = None
+            self._filesAreCached = False
+
+    def startLoadingFiles(self):
+        """See Project.startLoadingFiles()
+        """
+        if self._thread is None and \
+           (self._files is None or self._filesAreCached):
+            self._startScannerThread()
+
+    def cancelLoadingFiles(self):
+        """See Project.cancelLoadingFiles()
+        """
+        if self.isLoading():
+            self._stopScannerThread()
+
+    def startScan(self):
+        """Scan the root, if it is not being scanned
+        """
+        if self._thread is None:
+            self._startScannerThread()
+
+    @pyqtSlot(object)
+    def _onFileNameIndexReady(self, fileNameIndex):
+        self._indexThread.wait()  # finishes after emitting the signal
+        self._indexThread = None
+        if fileNameIndex.files() is self._files:  # not replaced by the scanner yet
+            self._fileNameIndex = fileNameIndex
+            self.fileNameIndexReady.emit(self)
+
+    @pyqtSlot(str)
+    def _onScanStatus(self, text):
+        self._scanStatus = text
+        self.scanStatusChanged.emit(self, text)
+
+    @pyqtSlot(str, object)
+    def _onFilesReady(self, path, files):
+        """The scanner thread has finished. The changes have been detected by the thread
+        """
+        self._filesAreCached = False
+        self._cachedDirs = self._thread.dirs()  # for the next scan
+        fileNameIndex = self._thread.fileNameIndex()
+        changes = self._thread.changes()
+        self._stopScannerThread()
+
+        if changes is None:
+            self._files = files
+            self._fileNameIndex = fileNameIndex
+            self.filesUpdated.emit(self, None, None)
+        elif any(changes):
+            self._files = files
+            self._fileNameIndex = fileNameIndex
+            self.filesUpdated.emit(self, *changes)
+
+        ignoreFiles = [os.path.join(relDir, item[0])
+                       for relDir, listing in self._cachedDirs.items()
+                       for item in listing[3]]
+        self._watcher.watch(self._path, self._cachedDirs.keys(), ignoreFiles)
+        if self._pendingChangedDirs is not None:
+            changedDirs = self._pendingChangedDirs
+            self._pendingChangedDirs = None
+            self._onDirsChanged(changedDirs)
+
+    def _onDirsChanged(self, relDirs):
+        """Watcher reported changed directories. Apply the changes to the list of files
+        """
+        if self._cachedDirs is None or not relDirs:  # files are not loaded or nothing changed
+            return
+
+        if self._thread is not None:  # apply later
+            if self._pendingChangedDirs is None:
+                self._pendingChangedDirs = set()
+            self._pendingChangedDirs.update(relDirs)
+            return
+
+        self._startScannerThread(relDirs, isUpdate=True)
+
+    def onFileFilterChanged(self):
+        self._watcher.stop()
+        self._pendingChangedDirs = None
+        self._cachedDirs = None  # cached listings are filtered with the old filter
+        if self.isScanning():
+            self._stopScannerThread()
+            self._startScannerThread()
+        else:
+            self._files = None
+            self._filesAreCached = False
+
+
 class Project(QObject):
+    """Project is the main root directory and optionally a few more roots, i.e. sibling repositories.
+
+    Every root is scanned by own thread and has own cache and status.
+    Files of all roots are merged to one list. Paths are relative to the main root,
+    therefore files of the other roots start with their path relative to it, i.e. ``../other/file.py``.
+    Rescanning a root doesn't invalidate files of the other roots
+    """
 
     changed = pyqtSignal(str)
     """
@@ -70,11 +845,28 @@ class Project(QObject):
     **Signal** emitted, when project path is changed
     """
 
+    rootsChanged = pyqtSignal()
+    """
+    rootsChanged()
+
+    **Signal** emitted, when a root has been added to the project or removed from it
+    """
+
     filesReady = pyqtSignal()
     """
     filesReady()
 
-    **Signal** emitted, when list of project files has been loaded
+    **Signal** emitted, when list of project files has been loaded.
+    Also emitted, when the list loaded from the cache has been updated by scanning,
+    when files of a root have been loaded, added or removed,
+    and when the file name index of the list loaded from the cache has been built
+    """
+    filesChanged = pyqtSignal(list, list)
+    """
+    filesChanged(added, removed)
+
+    **Signal** emitted after ``filesReady``, when the previous list of project files
+    has been updated. Parameters are lists of added and removed relative paths
     """
     scanStatusChanged = pyqtSignal(str)
     """
@@ -87,69 +879,151 @@ class Project(QObject):
     def __init__(self, core):
         QObject.__init__(self, core)
         self._path = None
+        self._roots = []
         self._projectFiles = None
-        self._thread = None
-        self._scanStatus = None
+        self._fileNameIndex = None
+        self._backgroundScan = False
         self._core = core
+
         self.open(os.path.abspath('.'))
         core.fileFilter().regExpChanged.connect(self._onFileFilterChanged)
 
     def terminate(self):
-        self._stopScannerThread()
+        for root in self._roots:
+            root.terminate()
 
-    def _startScannerThread(self):
-        assert self._thread is None
-        self._thread = _ScannerThread(self, self._path)
-        self._thread.itemsReady.connect(self._onFilesReady)
-        self._thread.status.connect(self._onScanStatus)
-        self._scanStatus = ''
-        self._thread.start()
+    def _createRoot(self, path, prefix):
+        root = _ProjectRoot(self, path, prefix)
+        root.filesUpdated.connect(self._onRootFilesUpdated)
+        root.scanStatusChanged.connect(self._onRootScanStatusChanged)
+        root.fileNameIndexReady.connect(self._onRootFileNameIndexReady)
+        self._roots.append(root)
+        return root
 
-    def _stopScannerThread(self):
-        if self._thread is not None:
-            self._thread.stop()
-            self._thread.wait()
-            self._thread.itemsReady.disconnect(self._onFilesReady)
-            self._thread.status.disconnect(self._onScanStatus)
-            self._thread = None
+    def _removeRoot(self, root):
+        root.terminate()
+        root.filesUpdated.disconnect(self._onRootFilesUpdated)
+        root.scanStatusChanged.disconnect(self._onRootScanStatusChanged)
+        root.fileNameIndexReady.disconnect(self._onRootFileNameIndexReady)
+        root.deleteLater()
+        self._roots.remove(root)
 
     def open(self, path):
         """Open project.
-        Replaces previous opened project
+        Replaces previous opened project together with its other roots
         """
         path = os.path.normpath(path)
         if self._path == path:
             return
 
-        self._stopScannerThread()
+        for root in self._roots[:]:
+            self._removeRoot(root)
         self._path = path
-        self._projectFiles = None
-        self._scanStatus = 'Not scanning'
+        self._createRoot(path, '')
+        self._updateFiles()
         self._backgroundScan = False
 
         self.changed.emit(path)
 
+    def addRoot(self, path):
+        """Add one more root directory to the project.
+        Returns False, if the path is already a root, is inside a root or contains a root
+        """
+        path = os.path.normpath(path)
+        for rootPath in self.roots():
+            if path == rootPath or \
+               path.startswith(os.path.join(rootPath, '')) or \
+               rootPath.startswith(os.path.join(path, '')):
+                return False
+
+        try:
+            prefix = os.path.relpath(path, self._path)
+        except ValueError:  # another drive on Windows
+            prefix = path
+
+        isLoaded = self._projectFiles is not None or self.isScanning()
+        root = self._createRoot(path, prefix)
+        self.rootsChanged.emit()
+
+        if root.files() is not None:  # loaded from the cache
+            self._onRootFilesUpdated(root, None, None)
+        if isLoaded:
+            root.startLoadingFiles()
+        return True
+
+    def removeRoot(self, path):
+        """Remove root directory, added with addRoot().
+        Returns False, if there is no such root. The main root can't be removed
+        """
+        path = os.path.normpath(path)
+        for root in self._roots[1:]:
+            if root.path() == path:
+                removedFiles = root.files()
+                self._removeRoot(root)
+                self.rootsChanged.emit()
+                if removedFiles is not None:
+                    self._updateFiles()
+                    self.filesReady.emit()
+                    self.filesChanged.emit([], list(removedFiles))
+                return True
+        return False
+
+    def roots(self):
+        """List of the project root directories. The first one is the main root, see path()
+        """
+        return [root.path() for root in self._roots]
+
     def path(self):
-        """Current project path.
+        """Current project path. Path of the main root, paths of the project files are relative to it
 
         Can be `None` if no project is opened
         """
         return self._path
 
     def files(self):
-        """List of project files
+        """List of project files. :class:`enki.lib.filelist.FileList` of relative paths.
+        Items are created on access, iterate the list instead of indexing it, when possible.
 
-        ``None`` if not loaded yet
+        ``None`` if not loaded yet. Files of the roots, which are not loaded yet, are not included.
+        The list might be loaded from the cache and not verified yet.
+        The list is never modified, but replaced, when the files are loaded again
         """
         return self._projectFiles
 
+    def fileNameIndex(self):
+        """:class:`enki.lib.filelist.FileNameIndex` of the project files.
+        Finds files by the file name or the file name without the suffix without scanning the list.
+
+        ``None`` if the files are not loaded yet, or the index of the files, loaded from the cache,
+        is being built. ``filesReady`` is emitted, when it is ready.
+        The index is never modified, but replaced together with the list of files
+        """
+        if self._projectFiles is None:
+            return None
+        if self._fileNameIndex is None or self._fileNameIndex.files() is not self._projectFiles:
+            indexes = [root.fileNameIndex() for root in self._roots if root.files() is not None]
+            if None in indexes:
+                return None
+            if len(indexes) == 1:
+                self._fileNameIndex = indexes[0]
+            else:
+                self._fileNameIndex = _ProjectFileNameIndex(self._projectFiles, indexes)
+        return self._fileNameIndex
+
+    def _updateFiles(self):
+        """Merge files of the roots
+        """
+        fileLists = [root.files() for root in self._roots if root.files() is not None]
+        self._projectFiles = FileList.concatenate(fileLists) if fileLists else None
+
     def startLoadingFiles(self):
         """Start asyncronous loading project files.
+        If the files have been loaded from the cache, only modified directories are scanned.
 
         It is allowed to call this method multiple times.
         """
-        if self._thread is None and self._projectFiles is None:
-            self._startScannerThread()
+        for root in self._roots:
+            root.startLoadingFiles()
 
     def cancelLoadingFiles(self):
         """Cancel asyncronous loading project files.
@@ -157,14 +1031,15 @@ class Project(QObject):
         It is allowed to call this method multiple times.
 
         If files are already loaded, they will be kept.
+        Updates of the loaded files are not cancelled.
         """
-        if self._thread is not None:
-            self._stopScannerThread()
+        for root in self._roots:
+            root.cancelLoadingFiles()
 
     def scanStatus(self):
         """Get scanning status as text message
         """
-        return self._scanStatus
+        return '; '.join([root.scanStatus() for root in self._roots if root.scanStatus()])
 
     def startBackgroundScan(self):
         """Scan the project in background.
@@ -172,33 +1047,44 @@ class Project(QObject):
         Report progress to status bar.
         It is allowed to call this method multiple times.
         """
-        if self._thread is not None:
+        if self.isScanning():
             return
 
         self._backgroundScan = True
-        self._startScannerThread()
+        for root in self._roots:
+            root.startScan()
 
     def isScanning(self):
-        return self._thread is not None
+        return any([root.isScanning() for root in self._roots])
 
-    @pyqtSlot(str)
-    def _onScanStatus(self, text):
-        self._scanStatus = text
-        self.scanStatusChanged.emit(text)
+    @pyqtSlot(object, str)
+    def _onRootScanStatusChanged(self, root, text):
+        self.scanStatusChanged.emit(self.scanStatus())
         if self._backgroundScan:
             self._core.mainWindow().statusBar().showMessage(text,
                                                             STATUS_SHOW_TIMEOUT_MSEC)
-    @pyqtSlot(str, list)
-    def _onFilesReady(self, path, files):
-        self._projectFiles = files
-        self._backgroundScan = False
-        self._stopScannerThread()
+
+    @pyqtSlot(object)
+    def _onRootFileNameIndexReady(self, root):
+        self._fileNameIndex = None
+        self.filesReady.emit()
+
+    @pyqtSlot(object, object, object)
+    def _onRootFilesUpdated(self, root, added, removed):
+        previousFiles = self._projectFiles
+        if not any([otherRoot.isLoading() for otherRoot in self._roots]):
+            self._backgroundScan = False
+
+        self._updateFiles()
         self.filesReady.emit()
+        if previousFiles is not None:
+            if added is None:  # the root files have been loaded
+                self.filesChanged.emit(list(root.files()), [])
+            else:
+                self.filesChanged.emit(added, removed)
 
     @pyqtSlot()
     def _onFileFilterChanged(self):
-        if self.isScanning():
-            self._stopScannerThread()
-            self._startScannerThread()
-        else:
-            self._projectFiles = None
+        for root in self._roots:
+            root.onFileFilterChanged()
+        self._updateFiles()
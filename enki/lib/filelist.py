@@ -0,0 +1,177 @@
+"""
+filelist --- Compact list of file paths
+=======================================
+
+Project might contain hundreds of thousands of files. A Python list keeps a string object per path.
+:class:`FileList` keeps all paths in one string, every path is followed by a line feed,
+and an array of the start offsets. Paths are created on access.
+
+Lower case paths are built once per list and shared by all users of the list.
+
+:class:`FileNameIndex` finds paths in the list by the file name or the file name without the suffix.
+
+The module doesn't use Qt
+"""
+
+import bisect
+import itertools
+import os
+from array import array
+from collections.abc import Sequence
+
+
+# Count of paths, which are split at once, when iterating the list
+_ITER_CHUNK_SIZE = 4096
+
+
+class FileList(Sequence):
+    """Immutable sequence of file paths.
+
+    Paths must not contain line feeds
+    """
+
+    def __init__(self, paths=()):
+        paths = paths if isinstance(paths, (list, tuple)) else list(paths)
+        self._text = '\n'.join(paths) + '\n' if paths else ''
+        self._offsets = array('q', [0])
+        self._offsets.extend(itertools.accumulate([len(path) + 1 for path in paths]))
+        self._lower = None
+
+    @classmethod
+    def _fromText(cls, text, offsets):
+        fileList = cls.__new__(cls)
+        fileList._text = text
+        fileList._offsets = offsets
+        fileList._lower = None
+        return fileList
+
+    @classmethod
+    def concatenate(cls, fileLists):
+        """Make one FileList of the FileLists. The only list is returned as is
+        """
+        if len(fileLists) == 1:
+            return fileLists[0]
+
+        offsets = array('q', [0])
+        for fileList in fileLists:
+            shift = offsets[-1]
+            offsets.extend([offset + shift for offset in fileList._offsets[1:]])
+        return cls._fromText(''.join([fileList._text for fileList in fileLists]), offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+            if index < 0:
+                raise IndexError('FileList index out of range')
+        return self._text[self._offsets[index]:self._offsets[index + 1] - 1]
+
+    def __iter__(self):
+        for first in range(0, len(self), _ITER_CHUNK_SIZE):
+            last = min(first + _ITER_CHUNK_SIZE, len(self))
+            yield from self._text[self._offsets[first]:self._offsets[last] - 1].split('\n')
+
+    def __eq__(self, other):
+        if isinstance(other, FileList):
+            return self._text == other._text
+        elif isinstance(other, (list, tuple)):  # the project file list used to be a list
+            return len(self) == len(other) and all(path == otherPath for path, otherPath in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'FileList({!r})'.format(list(self))
+
+    def text(self):
+        """All paths in one string. Every path is followed by a line feed
+        """
+        return self._text
+
+    def offsets(self):
+        """Array of the offsets of the paths in text(). The last item is the length of the text
+        """
+        return self._offsets
+
+    def lower(self):
+        """FileList of the lower case paths. Built once
+        """
+        if self._lower is None:
+            lowerText = self._text.lower()
+            if len(lowerText) == len(self._text):
+                self._lower = FileList._fromText(lowerText, self._offsets)
+            else:  # a few characters become longer in lower case
+                self._lower = FileList([path.lower() for path in self])
+            self._lower._lower = self._lower
+        return self._lower
+
+
+
+def _fileName(path):
+    return path.rpartition(os.sep)[2]
+
+
+def _stem(fileName):
+    dotIndex = fileName.rfind('.')
+    return fileName[:dotIndex] if dotIndex > 0 else fileName
+
+
+def _sortByHash(hashes):
+    """Make (sorted array of the hashes, array of the indexes of the sorted hashes in the list)
+    """
+    order = sorted(range(len(hashes)), key=hashes.__getitem__)
+    return array('q', map(hashes.__getitem__, order)), array('q', order)
+
+
+class FileNameIndex:
+    """Index of the file names of a FileList or a list of paths.
+
+    The stem is the file name without the last suffix, 'main' for 'src/main.cpp'.
+    File names, which have no suffix or start with the only dot, are stems themselves.
+
+    Only hashes of the names and the stems are kept, sorted, in arrays, together with the path indexes.
+    Paths with the searched hash are found with a binary search and compared with the searched name.
+    Found paths are returned in the order of the list
+    """
+
+    def __init__(self, files):
+        self._files = files
+        fileNames = [path.rpartition(os.sep)[2] for path in files]
+        self._names = _sortByHash(list(map(hash, fileNames)))
+        self._stems = _sortByHash([hash(_stem(fileName)) for fileName in fileNames])
+
+    def files(self):
+        """Indexed list of paths
+        """
+        return self._files
+
+    def _find(self, index, key, keyFunc):
+        hashes, indexes = index
+        keyHash = hash(key)
+        result = []
+        for position in range(bisect.bisect_left(hashes, keyHash), len(hashes)):
+            if hashes[position] != keyHash:
+                break
+            path = self._files[indexes[position]]
+            if keyFunc(path) == key:
+                result.append(path)
+        return result
+
+    def findByName(self, name):
+        """List of paths, which file name is name
+        """
+        return self._find(self._names, name, _fileName)
+
+    def findByStem(self, stem):
+        """List of paths, which file name without the last suffix is stem
+        """
+        return self._find(self._stems, stem, lambda path: _stem(_fileName(path)))
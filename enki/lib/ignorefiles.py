@@ -0,0 +1,245 @@
+"""
+ignorefiles --- Rules of .gitignore and .ignore files
+=====================================================
+
+Project scanner and search in directory skip files and directories, which are ignored by
+``.gitignore`` and ``.ignore`` files. Ignored directories are not entered at all.
+
+The syntax of the git ignore files is supported: comments, ``!`` negation, ``/`` anchoring,
+trailing ``/`` for directories, ``*``, ``?``, ``[...]`` and ``**``.
+Patterns of a file in a subdirectory override patterns of the parent directories,
+patterns of ``.ignore`` override patterns of ``.gitignore`` in the same directory.
+
+Patterns of every ignore file are compiled once. If a file doesn't contain negations,
+all its patterns are joined to one regular expression.
+
+The module doesn't use Qt
+"""
+
+import os
+import re
+
+
+# The latter file has higher priority
+IGNORE_FILE_NAMES = ('.gitignore', '.ignore')
+
+
+def _translateSegment(segment):
+    """Translate a glob pattern without / to a regular expression
+    """
+    result = []
+    index = 0
+    while index < len(segment):
+        char = segment[index]
+        index += 1
+        if char == '*':
+            result.append('[^/]*')
+        elif char == '?':
+            result.append('[^/]')
+        elif char == '\\' and index < len(segment):
+            result.append(re.escape(segment[index]))
+            index += 1
+        elif char == '[':
+            end = segment.find(']', index + 1 if segment[index:index + 1] in ('!', '^') else index)
+            if end == -1:
+                result.append(re.escape(char))
+            else:
+                charClass = segment[index:end].replace('\\', '\\\\')
+                if charClass[:1] in ('!', '^'):
+                    charClass = '^' + charClass[1:]
+                result.append('[' + charClass + ']')
+                index = end + 1
+        else:
+            result.append(re.escape(char))
+    return ''.join(result)
+
+
+def _translate(pattern):
+    """Translate a pattern without ! and trailing / to a regular expression,
+    which matches paths relative to the directory of the ignore file
+    """
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+
+    parts = []
+    segments = pattern.split('/')
+    for index, segment in enumerate(segments):
+        isLast = index == len(segments) - 1
+        if segment == '**':
+            parts.append('.*' if isLast else '(?:[^/]*/)*')
+        else:
+            parts.append(_translateSegment(segment))
+            if not isLast:
+                parts.append('/')
+
+    regExp = ''.join(parts)
+    if not anchored:
+        regExp = '(?:.*/)?' + regExp
+    return regExp + r'\Z'
+
+
+def parseIgnoreFile(text):
+    """Parse contents of an ignore file.
+    Returns list of tuples (regular expression, negated, directories only)
+    """
+    patterns = []
+    for line in text.splitlines():
+        if not line.endswith('\\ '):
+            line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+
+        negated = line.startswith('!')
+        if negated:
+            line = line[1:]
+        elif line.startswith('\\'):  # \# or \!
+            line = line[1:]
+
+        dirOnly = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            continue
+
+        patterns.append((_translate(line), negated, dirOnly))
+    return patterns
+
+
+class _IgnoreFile:
+    """Compiled patterns of the ignore files of one directory
+    """
+
+    def __init__(self, patterns):
+        if any(negated for regExp, negated, dirOnly in patterns):
+            self._patterns = [(re.compile(regExp), negated, dirOnly)
+                              for regExp, negated, dirOnly in reversed(patterns)]  # the last pattern wins
+            self._dirRegExp = self._fileRegExp = None
+        else:
+            self._patterns = None
+            self._dirRegExp = self._join([regExp for regExp, negated, dirOnly in patterns])
+            self._fileRegExp = self._join([regExp for regExp, negated, dirOnly in patterns if not dirOnly])
+
+    @staticmethod
+    def _join(regExps):
+        if not regExps:
+            return None
+        return re.compile('|'.join('(?:{})'.format(regExp) for regExp in regExps))
+
+    def match(self, relPath, isDir):
+        """Returns True, if the path is ignored, False, if it is explicitly not ignored,
+        None, if no pattern matches
+        """
+        if self._patterns is None:
+            regExp = self._dirRegExp if isDir else self._fileRegExp
+            if regExp is not None and regExp.match(relPath):
+                return True
+            return None
+
+        for regExp, negated, dirOnly in self._patterns:
+            if (isDir or not dirOnly) and regExp.match(relPath):
+                return not negated
+        return None
+
+
+class IgnoreRules:
+    """Rules of the ignore files of a directory and all its parent directories.
+    Rules are immutable and are shared by the subdirectories without ignore files.
+
+    Paths are relative to the root directory of the rules.
+    Ignore files of the directories above the root are applied with ``offset``,
+    the path of the root relative to the directory of the ignore file
+    """
+
+    def __init__(self, parent=None, relDir='', ignoreFile=None, offset=''):
+        self._parent = parent
+        self._prefix = relDir + '/' if relDir else ''
+        self._offset = offset
+        self._ignoreFile = ignoreFile
+        self._isEmpty = ignoreFile is None and (parent is None or parent.isEmpty())
+
+    def isEmpty(self):
+        """Check if there are no ignore files and nothing is ignored
+        """
+        return self._isEmpty
+
+    def forDirectory(self, relDir, fullPath, fileNames):
+        """Get rules for the subdirectory. fileNames are names of the files in it.
+        relDir is relative to the root of the rules and uses os.sep
+        """
+        patterns = _readIgnoreFiles(fullPath, fileNames)
+        if not patterns:
+            return self
+        return IgnoreRules(self, relDir.replace(os.sep, '/'), _IgnoreFile(patterns))
+
+    def isIgnored(self, relPath, isDir):
+        """Check if the path is ignored. relPath is relative to the root of the rules and uses os.sep
+        """
+        if os.sep != '/':
+            relPath = relPath.replace(os.sep, '/')
+
+        rules = self
+        while rules is not None:
+            if rules._ignoreFile is not None and relPath.startswith(rules._prefix):
+                result = rules._ignoreFile.match(rules._offset + relPath[len(rules._prefix):], isDir)
+                if result is not None:
+                    return result
+            rules = rules._parent
+        return False
+
+
+def _readIgnoreFiles(dirPath, fileNames):
+    patterns = []
+    for fileName in IGNORE_FILE_NAMES:
+        if fileName in fileNames:
+            try:
+                with open(os.path.join(dirPath, fileName), encoding='utf8', errors='replace') as ignoreFile:
+                    patterns += parseIgnoreFile(ignoreFile.read())
+            except (IOError, OSError):
+                pass
+    return patterns
+
+
+def _existingIgnoreFiles(dirPath):
+    return [fileName
+            for fileName in IGNORE_FILE_NAMES
+            if os.path.isfile(os.path.join(dirPath, fileName))]
+
+
+def isPathIgnored(rules, rootPath, relPath):
+    """Check if the file is ignored, applying ignore files of all directories on its path.
+    rules are the rules for the tree at rootPath, see rulesForTree()
+    """
+    parts = relPath.split(os.sep)
+    relDir = ''
+    for index, part in enumerate(parts):
+        dirPath = os.path.join(rootPath, relDir)
+        rules = rules.forDirectory(relDir, dirPath, _existingIgnoreFiles(dirPath))
+        relDir = os.path.join(relDir, part)
+        if rules.isIgnored(relDir, index < len(parts) - 1):
+            return True
+    return False
+
+
+def rulesForTree(path):
+    """Get rules for the directory tree, which are defined above it.
+    Ignore files of the parent directories are applied up to the root of the git repository.
+    Ignore files of the directory itself are not read, use forDirectory('', path, fileNames)
+    """
+    ancestors = []
+    dirPath = path
+    while True:
+        parentPath = os.path.dirname(dirPath)
+        if os.path.exists(os.path.join(dirPath, '.git')) or parentPath == dirPath:
+            break
+        dirPath = parentPath
+        ancestors.append(dirPath)
+
+    if not os.path.exists(os.path.join(dirPath, '.git')):  # not in a repository
+        return IgnoreRules()
+
+    rules = IgnoreRules()
+    for dirPath in reversed(ancestors):
+        patterns = _readIgnoreFiles(dirPath, _existingIgnoreFiles(dirPath))
+        if patterns:
+            offset = os.path.relpath(path, dirPath).replace(os.sep, '/') + '/'
+            rules = IgnoreRules(rules, ignoreFile=_IgnoreFile(patterns), offset=offset)
+    return rules
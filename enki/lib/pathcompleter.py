@@ -1,15 +1,23 @@
 """
 pathcompleter --- Path completer for Locator
 ============================================
+
+Completers are loaded on every keystroke. Directory listings are cached and validated by
+modification time of the directory, therefore typing in the same directory only filters the cached entries.
+Listings are made with os.scandir(), which knows if an entry is a directory without stat() on the most of platforms
 """
 
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication, QFileSystemModel, QStyle
 from PyQt5.QtGui import QPalette
 
+import collections
+import fnmatch
 import os
 import os.path
 import glob
+import threading
+import time
 
 from enki.lib.htmldelegate import htmlEscape
 from enki.core.locator import AbstractCompleter
@@ -17,6 +25,83 @@ from enki.core.core import core
 from functools import reduce
 
 
+# Count of cached directory listings
+_DIRECTORY_CACHE_SIZE = 64
+# Directory modification time might not change, if the directory is modified
+# shortly after listing it. Listings of such directories are not cached
+_RACY_MTIME_NS = 2 * 1000 * 1000 * 1000
+
+
+class _DirectoryCache:
+    """Cache of the recently listed directories. Shared by all completers.
+    """
+
+    def __init__(self, maxSize):
+        self._maxSize = maxSize
+        self._listings = collections.OrderedDict()  # path: (mtime, {name: isDir})
+        self._lock = threading.Lock()
+
+    def listing(self, path):
+        """Get dictionary {name: isDir} of the directory items. Raises OSError
+        """
+        path = os.path.normpath(path)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._listings.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._listings.move_to_end(path)
+                return cached[1]
+
+        items = {}
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    items[entry.name] = entry.is_dir()  # follows symlinks as os.path.isdir()
+                except OSError:
+                    items[entry.name] = False
+
+        if time.time_ns() - mtime > _RACY_MTIME_NS:
+            with self._lock:
+                self._listings[path] = (mtime, items)
+                self._listings.move_to_end(path)
+                while len(self._listings) > self._maxSize:
+                    self._listings.popitem(last=False)
+        return items
+
+
+_directoryCache = _DirectoryCache(_DIRECTORY_CACHE_SIZE)
+
+
+def _glob(pattern):
+    """glob.glob() with the cached directory listings.
+    Returns list of tuples (path, isDir)
+    """
+    dirName, baseName = os.path.split(pattern)
+    if glob.has_magic(dirName):
+        parents = [path for path, isDir in _glob(dirName) if isDir]
+    else:
+        parents = [dirName]
+
+    results = []
+    for parent in parents:
+        try:
+            items = _directoryCache.listing(parent or os.curdir)
+        except OSError:
+            continue
+
+        if glob.has_magic(baseName):
+            names = fnmatch.filter(items.keys(), baseName)
+            if not baseName.startswith('.'):  # glob doesn't match hidden files with wildcards
+                names = [name for name in names if not name.startswith('.')]
+        elif baseName in items:
+            names = [baseName]
+        else:
+            names = []
+
+        results += [(os.path.join(parent, name), items[name]) for name in names]
+    return results
+
+
 def makeSuitableCompleter(text):
     """Returns PathCompleter if text is normal path or GlobCompleter for glob
     """
@@ -60,7 +145,7 @@ class AbstractPathCompleter(AbstractCompleter):
         """
         return [path for path in paths
                 if not os.path.basename(path).startswith('.') and
-                not core.fileFilter().regExp().match(path)]
+                not core.fileFilter().matcher().match(path)]
 
     def _classifyRowIndex(self, row):
         """Get list item type and index by it's row
@@ -194,16 +279,17 @@ class PathCompleter(AbstractPathCompleter):
         if self._path != '/':
             self._path += '/'
 
-        if not os.path.isdir(self._path):
+        try:
+            items = _directoryCache.listing(self._path)
+        except (FileNotFoundError, NotADirectoryError):
             self._status = 'No directory %s' % self._path
             return
-
-        try:
-            filesAndDirs = os.listdir(self._path)
         except OSError as ex:
             self._error = str(ex)
             return
 
+        filesAndDirs = list(items.keys())
+
         if not filesAndDirs:
             self._status = 'Empty directory'
             return
@@ -224,7 +310,7 @@ class PathCompleter(AbstractPathCompleter):
 
         for variant in variants:
             absPath = os.path.join(self._path, variant)
-            if os.path.isdir(absPath):
+            if items[variant]:
                 self._dirs.append(absPath)
             else:
                 self._files.append(absPath)
@@ -291,11 +377,10 @@ class GlobCompleter(AbstractPathCompleter):
         AbstractPathCompleter.__init__(self, text)
 
     def load(self, stopEvent):
-        variants = glob.iglob(os.path.expanduser(self._originalText) + '*')
-        variants = sorted(self._filterHidden(variants))
+        variants = dict(_glob(os.path.expanduser(self._originalText) + '*'))
 
-        for path in sorted(variants):
-            if os.path.isdir(path):
+        for path in sorted(self._filterHidden(variants.keys())):
+            if variants[path]:
                 self._dirs.append(path)
             else:
                 self._files.append(path)
@@ -22,12 +22,14 @@ class Plugin(QObject):
         self._action = None
         core.workspace().currentDocumentChanged.connect(self._updateAction)
         core.workspace().languageChanged.connect(self._updateAction)
+        core.project().filesReady.connect(self._updateAction)
 
     def terminate(self):
         """Uninstall the plugin
         """
         core.workspace().currentDocumentChanged.disconnect(self._updateAction)
         core.workspace().languageChanged.disconnect(self._updateAction)
+        core.project().filesReady.disconnect(self._updateAction)
         if self._action is not None:
             core.actionManager().removeAction(self._action)
             del self._action
@@ -85,6 +87,48 @@ class Plugin(QObject):
         else:
             return None
 
+    def _tryFindFileInProject(self):
+        """Try to find file with the same name but different suffix among the project files.
+        Works, when header and implementation are in different directories, i.e. include/ and src/.
+        If there are a few such files, the file with the most similar directory path is chosen
+        """
+        fileIndex = core.project().fileNameIndex()
+        projectPath = core.project().path()
+        filePath = core.workspace().currentDocument().filePath()
+        if fileIndex is None or \
+           not filePath.startswith(tuple([os.path.join(rootPath, '') for rootPath in core.project().roots()])):
+            return None
+
+        fileName = os.path.basename(filePath)
+        if self._isHeader(fileName):
+            suffixes = _IMPLEMENTATION_SUFFIXES
+        elif self._isImplementation(fileName):
+            suffixes = _HEADER_SUFFIXES
+        else:  # oops, unknown file. Suffixes DB is not up to date
+            return None
+
+        candidates = [path
+                      for path in fileIndex.findByStem(fileName[:fileName.rindex('.')])
+                      if os.path.splitext(path)[1] in suffixes]
+        if not candidates:
+            return None
+
+        dirParts = os.path.dirname(os.path.relpath(filePath, projectPath)).split(os.sep)
+
+        def similarity(path):
+            """(count of the same last directories, count of the same first directories,
+            count of the same directory names)
+            """
+            parts = os.path.dirname(path).split(os.sep)
+            sameLast = 0
+            while sameLast < min(len(parts), len(dirParts)) and \
+                  parts[-1 - sameLast] == dirParts[-1 - sameLast]:
+                sameLast += 1
+            sameFirst = len(os.path.commonprefix([parts, dirParts]))
+            return (sameLast, sameFirst, len(set(parts) & set(dirParts)))
+
+        return os.path.join(projectPath, max(candidates, key=similarity))
+
     def _tryFindFileAmongOpened(self):
         """Try to find file with the same name but different suffix among opened files
         Works, when header and implementation are in different directories, but both opened
@@ -113,6 +157,10 @@ class Plugin(QObject):
         """Try to find implementation for header, header for implementation
         """
         res = self._tryFindFileOnFileSystem()
+        if res:
+            return res
+
+        res = self._tryFindFileInProject()
         if res:
             return res
         else:
@@ -79,7 +79,7 @@ class FileBrowserFilteredModel(QSortFilterProxyModel):
         """
         if sourceParent == QModelIndex():
             return True
-        return not core.fileFilter().regExp().match(sourceParent.child(sourceRow, 0).data())
+        return not core.fileFilter().matcher().match(sourceParent.child(sourceRow, 0).data())
 
 
 class SmartRecents(QObject):
@@ -1,13 +1,15 @@
 from enki.core.core import core
-from enki.plugins.fuzzyopen.fuzzyopen import FuzzyOpenCommand, ScanCommand
+from enki.plugins.fuzzyopen.fuzzyopen import FileNameCommand, FuzzyOpenCommand, ScanCommand
 
 
 class Plugin:
 
     def __init__(self):
         core.locator().addCommandClass(FuzzyOpenCommand)
+        core.locator().addCommandClass(FileNameCommand)
         core.locator().addCommandClass(ScanCommand)
 
     def terminate(self):
         core.locator().removeCommandClass(FuzzyOpenCommand)
+        core.locator().removeCommandClass(FileNameCommand)
         core.locator().addCommandClass(ScanCommand)
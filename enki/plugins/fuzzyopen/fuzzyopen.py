@@ -1,3 +1,5 @@
+import heapq
+import itertools
 import os
 import os.path
 
@@ -5,43 +7,7 @@ from enki.core.core import core
 
 from enki.core.locator import AbstractCommand, AbstractCompleter, StatusCompleter, InvalidCmdArgs
 
-
-def fuzzyMatch(reversed_pattern, text):
-    """Match text with pattern and return
-        (score, list of matching indexes)
-        or None
-
-    Score is a summa or distances of continuos matched peaces from the end of the text.
-    Less peaces -> better mathing
-    Peaces close to the end -> better matching
-
-    Reverse matching is used because symbols at the end of the path are usually more impotant.
-
-    pattern shall be already reversed for performance reasons
-    """
-    indexes = []
-    score = 0
-    text_len = len(text)
-
-    index = text_len + 1
-    prev_match = index
-    for char in reversed_pattern:
-        index = text.rfind(char, 0, index)
-        if index == -1:
-            return None, None
-
-        indexes.append(index)
-        if index + 1 != prev_match:
-            score += text_len - index
-
-        prev_match = index
-
-    # find next /. Closer - better
-    slash_index = text.rfind(os.sep, 0, index)
-    if slash_index != -1:
-        score += index - slash_index
-
-    return score, indexes
+from enki.plugins.fuzzyopen.matcher import fuzzyMatch, makeMatcher
 
 
 _MAX_COUNT = 32
@@ -51,14 +17,14 @@ class FuzzyOpenCompleter(AbstractCompleter):
 
     mustBeLoaded = True
 
-    def __init__(self, pattern, files):
+    def __init__(self, pattern, matcher):
         smallerFont = core.mainWindow().font().pointSizeF() * 2 / 1.5
         self._itemTemplate = (
             '{{}}'
             '<div style="margin: 15px; font-size:{smallerFont}pt">{{}}</div>'.format(smallerFont=smallerFont))
 
         self._pattern = pattern
-        self._files = files
+        self._matcher = matcher
         self._items = []
 
     def _openFiles(self):
@@ -67,61 +33,43 @@ class FuzzyOpenCompleter(AbstractCompleter):
                  if d.filePath() is not None]
         projPath = core.project().path()
         if projPath:
+            rootPrefixes = tuple([os.path.join(rootPath, '') for rootPath in core.project().roots()])
             for i, path in enumerate(files):
-                if files[i].startswith(projPath):
+                if files[i].startswith(rootPrefixes):  # files of other roots are relative to the main root too
                     files[i] = os.path.relpath(path, projPath)
 
         return files
 
 
     def load(self, stopEvent):
-        origCaseOpenFiles = self._openFiles()
-
-        origCaseFiles = self._files
-
-        caseSensitive = any([c.isupper() for c in self._pattern])
-
-        if not caseSensitive:
-            self._pattern = self._pattern.lower()
+        openFiles = self._openFiles()
+        openFilesSet = set(openFiles)
 
         if self._pattern:
-            if caseSensitive:
-                pattern = self._pattern
-                openFiles = origCaseOpenFiles
-                files = origCaseFiles
-            else:
-                pattern = self._pattern.lower()
-                openFiles = [f.lower() for f in origCaseOpenFiles]
-                files = [f.lower() for f in origCaseFiles]
-
-            reversed_pattern = pattern[::-1]
+            caseSensitive = any([c.isupper() for c in self._pattern])
+            reversed_pattern = (self._pattern if caseSensitive else self._pattern.lower())[::-1]
 
-            matching = []
-
-            for i, path in enumerate(openFiles):
-                score, indexes = fuzzyMatch(reversed_pattern, path)
+            openMatching = []
+            for path in openFiles:
+                score, indexes = fuzzyMatch(reversed_pattern, path if caseSensitive else path.lower())
                 if indexes:
                     score /= 100  # bonus for opened files
-                    # Using original case path here
-                    matching.append((origCaseOpenFiles[i], score, indexes))
-
-            for i, path in enumerate(files):
-                if path not in openFiles:
-                    score, indexes = fuzzyMatch(reversed_pattern, path)
-                    if indexes:
-                        matching.append((origCaseFiles[i], score, indexes))
+                    openMatching.append((path, score, indexes))
 
-                    if not (i % 100):
-                        if stopEvent.is_set():
-                            return
+            matching = self._matcher.match(self._pattern, _MAX_COUNT, openFilesSet, stopEvent)
+            if matching is None:
+                return
 
-            matching.sort(key=lambda item: item[1])  # sort starting from minimal score
-            self._items = matching[:_MAX_COUNT]
+            # Items with equal score keep their order. Opened files go first
+            self._items = heapq.nsmallest(_MAX_COUNT,
+                                          itertools.chain(openMatching, matching),
+                                          key=lambda item: item[1])
         else:
-            allFiles = origCaseOpenFiles + [f
-                                            for f in origCaseFiles
-                                            if f not in origCaseOpenFiles]
-            self._items = [(item, 0, []) for item in allFiles[:_MAX_COUNT]]
+            notOpenFiles = (f
+                            for f in self._matcher.files()
+                            if f not in openFilesSet)
+            allFiles = itertools.islice(itertools.chain(openFiles, notOpenFiles), _MAX_COUNT)
+            self._items = [(item, 0, []) for item in allFiles]
 
     def rowCount(self):
         return len(self._items)
@@ -148,6 +96,26 @@ class FuzzyOpenCompleter(AbstractCompleter):
             return None
 
 
+class FileNameCompleter(FuzzyOpenCompleter):
+    """Shows project files with exactly the typed file name.
+    If the typed name has no suffix, files with any suffix are shown too
+    """
+
+    mustBeLoaded = False
+
+    def __init__(self, fileName, fileNameIndex):
+        FuzzyOpenCompleter.__init__(self, fileName, None)
+
+        paths = fileNameIndex.findByName(fileName)
+        if fileName and '.' not in fileName:
+            paths += [path for path in fileNameIndex.findByStem(fileName) if path not in paths]
+
+        self._items = []
+        for path in paths[:_MAX_COUNT]:
+            baseNameStart = len(path) - len(os.path.basename(path))
+            self._items.append((path, 0, range(baseNameStart, baseNameStart + len(fileName))))
+
+
 class FuzzyOpenCommand(AbstractCommand):
     command = 'f'
     signature = '[f] PATH [LINE]'
@@ -158,6 +126,9 @@ class FuzzyOpenCommand(AbstractCommand):
     def isAvailable():
         return core.project().path() is not None
 
+    _matcher = None  # cached matcher for the current project file list
+    _matcherBackend = None
+
     def __init__(self):
         AbstractCommand.__init__(self)
         self._completer = None
@@ -189,8 +160,15 @@ class FuzzyOpenCommand(AbstractCommand):
         self._pattern = os.sep.join(args) if args else ''
 
     def completer(self):
-        if core.project().files() is not None:
-            return FuzzyOpenCompleter(self._pattern, core.project().files())
+        files = core.project().files()
+        if files is not None:
+            backend = core.config()['FuzzyOpen']['Backend']
+            if FuzzyOpenCommand._matcher is None or \
+               FuzzyOpenCommand._matcher.files() is not files or \
+               FuzzyOpenCommand._matcherBackend != backend:
+                FuzzyOpenCommand._matcher = makeMatcher(files, backend)
+                FuzzyOpenCommand._matcherBackend = backend
+            return FuzzyOpenCompleter(self._pattern, FuzzyOpenCommand._matcher)
         else:
             return StatusCompleter("<i>{}</i>".format(core.project().scanStatus()))
 
@@ -235,3 +213,24 @@ class ScanCommand(AbstractCommand):
 
     def execute(self):
         core.project().startBackgroundScan()
+
+
+class FileNameCommand(FuzzyOpenCommand):
+    """Open project file by the exact file name. Files are found with the project file name index
+    """
+    command = 'n'
+    signature = 'n NAME [LINE]'
+    description = 'Open file in project. Exact file name or name without suffix'
+    isDefaultCommand = False
+
+    def setArgs(self, args):
+        FuzzyOpenCommand.setArgs(self, args)
+        if os.sep in self._pattern:
+            raise InvalidCmdArgs()
+
+    def completer(self):
+        fileNameIndex = core.project().fileNameIndex()
+        if fileNameIndex is not None:
+            return FileNameCompleter(self._pattern, fileNameIndex)
+        else:
+            return StatusCompleter("<i>{}</i>".format(core.project().scanStatus()))
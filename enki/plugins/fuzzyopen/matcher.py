@@ -0,0 +1,349 @@
+"""
+matcher --- Fuzzy matching of the project file paths
+=====================================================
+
+The module doesn't use Qt. Matchers are used in the locator completer loading thread.
+
+:class:`FuzzyMatcher` matches paths one by one with :func:`fuzzyMatch`.
+:class:`NumpyFuzzyMatcher` scores the whole file list in batch with NumPy arrays.
+Both matchers give the same results.
+
+The file list might be a list of strings or :class:`enki.lib.filelist.FileList`.
+Lower case paths and the concatenated paths of a FileList are taken from it and are not built again.
+"""
+
+import heapq
+import os
+
+from enki.lib.filelist import FileList
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def fuzzyMatch(reversed_pattern, text):
+    """Match text with pattern and return
+        (score, list of matching indexes)
+        or None
+
+    Score is a summa or distances of continuos matched peaces from the end of the text.
+    Less peaces -> better mathing
+    Peaces close to the end -> better matching
+
+    Reverse matching is used because symbols at the end of the path are usually more impotant.
+
+    pattern shall be already reversed for performance reasons
+    """
+    indexes = []
+    score = 0
+    text_len = len(text)
+
+    index = text_len + 1
+    prev_match = index
+    for char in reversed_pattern:
+        index = text.rfind(char, 0, index)
+        if index == -1:
+            return None, None
+
+        indexes.append(index)
+        if index + 1 != prev_match:
+            score += text_len - index
+
+        prev_match = index
+
+    # find next /. Closer - better
+    slash_index = text.rfind(os.sep, 0, index)
+    if slash_index != -1:
+        score += index - slash_index
+
+    return score, indexes
+
+
+class FuzzyMatcher:
+    """Matches paths of the project file list with patterns.
+
+    Lower case paths are built once per file list.
+    Indexes of the paths, which matched the previous patterns, are remembered.
+    If the new pattern extends a previous one, only these paths are matched again,
+    because a path can't match the pattern without matching its beginning.
+    History of the extended patterns is kept, so erasing the last characters is fast too.
+
+    The matcher is used by one completer loading thread at a time
+    """
+
+    def __init__(self, files):
+        self._files = files
+        self._lowerFiles = None
+
+        # list of (pattern, indexes of the matching files). Every pattern extends the previous one
+        self._history = []
+
+    def files(self):
+        """File list, which is matched
+        """
+        return self._files
+
+    def _previousCandidates(self, pattern):
+        """Get indexes of the files, which matched the longest previous pattern, which the pattern extends.
+        None, if there is no such pattern. History is truncated to this pattern
+        """
+        while self._history:
+            lastPattern, lastCandidates = self._history[-1]
+            if pattern.startswith(lastPattern):
+                if lastPattern == pattern:
+                    self._history.pop()  # will be appended again
+                return lastCandidates
+            self._history.pop()
+        return None
+
+    def match(self, pattern, count, excludedFiles, stopEvent):
+        """Match not empty pattern with the files.
+        Pattern is case sensitive, if it contains upper case characters.
+
+        Returns list of not more than count best matching (path, score, indexes) sorted by score,
+        or None, if stopEvent has been set.
+        Files from excludedFiles set are not returned.
+        """
+        caseSensitive = any([c.isupper() for c in pattern])
+        if caseSensitive:
+            texts = self._files
+            reversedPattern = pattern[::-1]
+        else:
+            if self._lowerFiles is None:
+                self._lowerFiles = _lowerFiles(self._files)
+            texts = self._lowerFiles
+            reversedPattern = pattern.lower()[::-1]
+
+        candidates = self._previousCandidates(pattern)
+        if candidates is None:
+            candidates = range(len(texts))
+
+        matchedIndexes, result = self._matchEach(texts, reversedPattern, candidates,
+                                                 count, excludedFiles, stopEvent)
+        if matchedIndexes is None:
+            return None
+
+        self._history.append((pattern, matchedIndexes))
+        return result
+
+    def _matchEach(self, texts, reversedPattern, candidates, count, excludedFiles, stopEvent):
+        """Match the candidates one by one.
+        Returns (list of indexes of the matching files, best items) or (None, None), if stopped
+        """
+        files = self._files
+        matchedIndexes = []
+        # Bounded heap of the best items (-score, -index, indexes). The worst item is on the top
+        best = []
+        for candidateIndex, (i, text) in enumerate(_candidateTexts(texts, candidates)):
+            score, indexes = fuzzyMatch(reversedPattern, text)
+            if indexes:
+                matchedIndexes.append(i)
+                item = (-score, -i, indexes)
+                if len(best) < count:
+                    if files[i] not in excludedFiles:
+                        heapq.heappush(best, item)
+                elif item > best[0] and files[i] not in excludedFiles:
+                    heapq.heapreplace(best, item)
+
+            if not (candidateIndex % 100):
+                if stopEvent.is_set():
+                    return None, None
+
+        return matchedIndexes, [(files[-negIndex], -negScore, indexes)
+                                for negScore, negIndex, indexes in sorted(best, reverse=True)]
+
+
+def _lowerFiles(files):
+    if isinstance(files, FileList):
+        return files.lower()
+    return [f.lower() for f in files]
+
+
+def _candidateTexts(texts, candidates):
+    """Iterate (index, text) of the candidates
+    """
+    if isinstance(candidates, range) and candidates == range(len(texts)):
+        return enumerate(texts)
+    elif isinstance(texts, FileList):
+        joined = texts.text()
+        offsets = texts.offsets()
+        return ((i, joined[offsets[i]:offsets[i + 1] - 1]) for i in candidates)
+    else:
+        return ((i, texts[i]) for i in candidates)
+
+
+class _FlatTexts:
+    """Texts concatenated to one NumPy array of character codes.
+    Every text is followed by a separator
+    """
+
+    def __init__(self, texts):
+        self.texts = texts
+
+        if isinstance(texts, FileList):
+            offsets = numpy.frombuffer(texts.offsets(), dtype=numpy.int64)
+            self.starts = offsets[:-1]
+            self.ends = offsets[1:] - 1  # positions of the separators
+            joined = texts.text()
+        else:
+            lengths = numpy.fromiter(map(len, texts), dtype=numpy.int64, count=len(texts))
+            self.ends = numpy.cumsum(lengths + 1) - 1  # positions of the separators
+            self.starts = self.ends - lengths
+            joined = '\n'.join(texts) + '\n'
+
+        codes = numpy.frombuffer(joined.encode('utf-32-le', 'surrogatepass'), dtype=numpy.uint32)
+        maxCode = codes.max() if len(codes) else 0
+        for dtype in (numpy.uint8, numpy.uint16):
+            if maxCode <= numpy.iinfo(dtype).max:
+                codes = codes.astype(dtype)
+                break
+        self._codes = codes
+        self._positions = {}
+
+    def positions(self, char):
+        """Sorted array of positions of the character
+        """
+        positions = self._positions.get(char)
+        if positions is None:
+            code = ord(char)
+            if code <= numpy.iinfo(self._codes.dtype).max:
+                positions = numpy.flatnonzero(self._codes == code)
+            else:
+                positions = numpy.empty(0, dtype=numpy.int64)
+            self._positions[char] = positions
+        return positions
+
+
+# Smaller candidate sets are matched one by one
+_MIN_BATCH_SIZE = 20000
+
+
+class NumpyFuzzyMatcher(FuzzyMatcher):
+    """Matcher, which scores all the candidates at once with NumPy arrays.
+
+    :func:`fuzzyMatch` finds the last occurrence of every pattern character before the previous one.
+    This matcher does the same for all paths at once with a binary search
+    in the sorted positions of the character in the concatenated paths.
+    Matching indexes are found with :func:`fuzzyMatch` only for the best paths
+    """
+
+    def __init__(self, files):
+        FuzzyMatcher.__init__(self, files)
+        self._flatTexts = {}  # caseSensitive: _FlatTexts
+
+    def _getFlatTexts(self, caseSensitive):
+        flatTexts = self._flatTexts.get(caseSensitive)
+        if flatTexts is None:
+            if caseSensitive:
+                texts = self._files
+            else:
+                texts = _lowerFiles(self._files)
+            flatTexts = _FlatTexts(texts)
+            self._flatTexts[caseSensitive] = flatTexts
+        return flatTexts
+
+    def _score(self, flatTexts, reversedPattern, candidates, stopEvent):
+        """Score the candidates. Returns (matching candidates, scores) or (None, None), if stopped
+        """
+        starts = flatTexts.starts[candidates]
+        ends = flatTexts.ends[candidates]
+        scores = numpy.zeros(len(candidates), dtype=numpy.int64)
+
+        index = ends
+        prevMatch = ends + 1
+        for char in reversedPattern:
+            if stopEvent.is_set():
+                return None, None
+
+            positions = flatTexts.positions(char)
+            if not len(positions):
+                return candidates[:0], scores[:0]
+
+            # the last position before the index
+            positionIndex = numpy.searchsorted(positions, index) - 1
+            index = positions[numpy.maximum(positionIndex, 0)]
+            found = (positionIndex >= 0) & (index >= starts)
+
+            candidates, starts, ends, scores, index, prevMatch = \
+                [array[found] for array in (candidates, starts, ends, scores, index, prevMatch)]
+
+            scores += numpy.where(index + 1 != prevMatch, ends - index, 0)
+            prevMatch = index
+
+        # find next /. Closer - better
+        slashPositions = flatTexts.positions(os.sep)
+        if len(slashPositions):
+            positionIndex = numpy.searchsorted(slashPositions, index) - 1
+            slashIndex = slashPositions[numpy.maximum(positionIndex, 0)]
+            found = (positionIndex >= 0) & (slashIndex >= starts)
+            scores += numpy.where(found, index - slashIndex, 0)
+
+        return candidates, scores
+
+    def match(self, pattern, count, excludedFiles, stopEvent):
+        """See :meth:`FuzzyMatcher.match`
+        """
+        caseSensitive = any([c.isupper() for c in pattern])
+        flatTexts = self._getFlatTexts(caseSensitive)
+        reversedPattern = (pattern if caseSensitive else pattern.lower())[::-1]
+
+        candidates = self._previousCandidates(pattern)
+        if candidates is None:
+            candidates = numpy.arange(len(self._files))
+        elif len(candidates) < _MIN_BATCH_SIZE:
+            # Not worth scanning the whole list for positions of the new characters
+            matchedIndexes, result = self._matchEach(flatTexts.texts, reversedPattern, candidates.tolist(),
+                                                     count, excludedFiles, stopEvent)
+            if matchedIndexes is None:
+                return None
+            self._history.append((pattern, numpy.array(matchedIndexes, dtype=numpy.int64)))
+            return result
+
+        candidates, scores = self._score(flatTexts, reversedPattern, candidates, stopEvent)
+        if candidates is None:
+            return None
+
+        self._history.append((pattern, candidates))
+
+        # Select the best items. Excluded files might be among them
+        selectedCount = count + len(excludedFiles)
+        while True:
+            if len(scores) > selectedCount:
+                maxScore = numpy.partition(scores, selectedCount - 1)[selectedCount - 1]
+                selected = numpy.flatnonzero(scores <= maxScore)
+            else:
+                selected = numpy.arange(len(scores))
+            # Sort by score. Items with equal score keep the file list order
+            selected = selected[numpy.lexsort((candidates[selected], scores[selected]))]
+
+            result = []
+            for i in candidates[selected]:
+                path = self._files[i]
+                if path not in excludedFiles:
+                    score, indexes = fuzzyMatch(reversedPattern, flatTexts.texts[i])
+                    result.append((path, score, indexes))
+                    if len(result) == count:
+                        return result
+
+            if len(selected) == len(scores):
+                return result
+            selectedCount *= 2  # the list contains excluded paths more than once
+
+
+# File lists of this size and bigger are matched with NumpyFuzzyMatcher by the 'auto' backend
+NUMPY_MIN_FILE_COUNT = 20000
+
+
+def makeMatcher(files, backend):
+    """Create matcher for the backend from the settings: 'python', 'numpy' or 'auto'.
+
+    'auto' uses NumPy for big file lists. :class:`FuzzyMatcher` is used, if NumPy is not installed
+    """
+    if numpy is not None and \
+       (backend == 'numpy' or
+        (backend == 'auto' and len(files) >= NUMPY_MIN_FILE_COUNT)):
+        return NumpyFuzzyMatcher(files)
+    else:
+        return FuzzyMatcher(files)
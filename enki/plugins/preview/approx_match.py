@@ -21,23 +21,6 @@ import codecs
 import html
 import os
 #
-# Third-party imports
-# -------------------
-import pkg_resources
-
-# The `regex <https://pypi.python.org/pypi/regex>`_ module supports approximate
-# matching. Make sure it is recent enough to be usable.
-import regex
-try:
-  # Get the version of regex. See https://pythonhosted.org/setuptools/pkg_resources.html#distribution-attributes.
-  regexVersion = pkg_resources.get_distribution('regex').parsed_version
-  # Issues I filed before this make regex unusable. See #166, #167, andd #169 at
-  # https://bitbucket.org/mrabarnett/mrab-regex/issues. For version parse, see
-  # https://pythonhosted.org/setuptools/pkg_resources.html#parsing-utilities.
-  assert regexVersion >= pkg_resources.parse_version('2015.11.07')
-except AssertionError as ValueError:
-  raise ImportError
-#
 # For debug
 # =========
 # Write the results of a match to an HTML file if enabled.
@@ -110,66 +93,242 @@ def writeHtmlLog(htmlText):
     with codecs.open('approx_match_log.html', 'w', encoding='utf-8') as f:
         f.write(htmlText)
 #
-# findApproxText
-# ==============
-# This function performs a single approximate match using the regex_ library.
+# Approximate search
+# ==================
+# The search for the block of target text which best matches the source
+# characters is based on the bit-parallel edit distance algorithm from Gene
+# Myers, "A fast bit-vector algorithm for approximate string matching based on
+# dynamic programming", Journal of the ACM 46(3), 1999. It processes a whole
+# column of the edit distance table with a few integer operations per target
+# character, instead of a fuzzy regular expression search which backtracks
+# through every possible combination of errors.
 #
-# Return value:
-#   - If there is no unique value, (None, 0, 0)
-#   - Otherwise, it returns (match, beginInTarget, endInTarget) where:
+# Most of the target text is far from any good match. So, the search is limited
+# to the ranges of target text around exact occurrences of pieces of the search
+# text (see _candidateRanges_), and the whole target text is only scanned if
+# these ranges don't contain a match which is good and unique enough.
 #
-#     match
-#       A regex_ match object.
+# Seeds shorter than this occur too often to limit the search.
+_MIN_SEED_LENGTH = 4
+#
+# The first search allows one error per this number of search text characters.
+# The number of allowed errors is doubled on every next attempt.
+_INITIAL_ERROR_RATIO = 8
+#
+# ApproxMatch
+# -----------
+# A result of findApproxText_. It provides the same ``start()`` and ``end()``
+# methods as a regex match object.
+class ApproxMatch:
+    def __init__(self, start, end, errors):
+        self._start = start
+        self._end = end
+        # The number of insertions, deletions and substitutions needed to turn
+        # the matched target text into the search text.
+        self.errors = errors
+
+    def start(self):
+        return self._start
+
+    def end(self):
+        return self._end
+
+    def __repr__(self):
+        return 'ApproxMatch(%d, %d, %d)' % (self._start, self._end, self.errors)
 #
-#     beginInTarget
-#       The index into the target string at which the approximate match begins.
+# findApproxText
+# --------------
+# This function performs a single approximate match of the searchText. A match
+# is the substring of the targetText with the smallest edit distance to the
+# searchText. If several substrings have the same distance, the one which begins
+# first is taken; of these, the longest one.
 #
-#     endInTarget
-#       The index into the target string at which the approximate match ends.
+# Return value:
+#   - If there is no unique match, None.
+#   - Otherwise, an ApproxMatch_.
 def findApproxText(
   # Text to search for
   searchText,
   # Text in which to find the searchText
   targetText):
 
-    mo = regexFuzzySearch(searchText, targetText)
-    if mo:
-        # See if this match is unique enough by looking for the next best match
-        # by searching in the string before then the string after the match.
-        moPre = regexFuzzySearch(searchText, targetText[:mo.start()])
-        moPost = regexFuzzySearch(searchText, targetText[mo.end():])
-
-        # Compute an error based on the fuzzyness. If there wasn't a match, use
-        # maximum error of moError + 6, so that the test below passes.
-        moError = sum(mo.fuzzy_counts)
-        moPreError = sum(moPre.fuzzy_counts) if moPre else moError*2
-        moPostError = sum(moPost.fuzzy_counts) if moPost else moError*2
-
-        # Make sure the difference between the match and any other match is high
-        # enough to consider this match unique.
-        if moError*1.1 <= moPreError and moError*1.1 <= moPostError:
+    # An exact match is always the best one, and it is always unique enough:
+    # the check below never rejects a match without errors.
+    start = targetText.find(searchText)
+    if start != -1:
+        return ApproxMatch(start, start + len(searchText), 0)
+
+    masks = _patternMasks(searchText)
+    reversedMasks = _patternMasks(searchText[::-1])
+    maxErrors = max(1, len(searchText) // _INITIAL_ERROR_RATIO)
+    while True:
+        ranges = _candidateRanges(searchText, targetText, maxErrors)
+        if ranges is None:
+            # Search in the whole target text. The edit distance never exceeds
+            # the length of the searchText (delete all of it), so all computed
+            # distances are exact.
+            ranges = [(0, len(targetText))]
+            maxErrors = len(searchText)
+        isDone, mo = _findInRanges(searchText, masks, reversedMasks,
+                                   targetText, ranges, maxErrors)
+        if isDone:
             return mo
+        maxErrors *= 2
 
-    # If a match couldn't be found or wasn't good enough, return a failure.
-    return None
+# Find the match within the given ranges of the targetText, assuming that any
+# match with maxErrors or fewer errors lies inside one of these ranges.
+#
+# Return value: (isDone, mo). If isDone is False, the best match or the next
+# best match could lie outside of the ranges, so the search must be repeated
+# with a larger maxErrors. Otherwise, mo is the result of findApproxText_.
+def _findInRanges(searchText, masks, reversedMasks, targetText, ranges,
+                  maxErrors):
+    searchLength = len(searchText)
+    # Compute the distance of the best match beginning at every index of the
+    # ranges by searching in the reversed text. ``scores[q]`` holds the
+    # distance for the index ``end - q``.
+    startScores = [_editDistances(reversedMasks, searchLength,
+                                  targetText[begin:end][::-1])
+                   for begin, end in ranges]
+    errors = min((min(scores) for scores in startScores),
+                 default=maxErrors + 1)
+    if errors > maxErrors:
+        return False, None
 
-# This helper function uses regex_ to perform a fuzzy search.
-def regexFuzzySearch(
-  # Text to search for. It is NOT treated as a regex.
-  searchText,
-  # Text in which to find the searchText
-  targetText):
+    # Find the first index where a best match begins.
+    for (begin, end), scores in zip(ranges, startScores):
+        if errors in scores:
+            start = end - (len(scores) - 1 - scores[::-1].index(errors))
+            break
+    # Find the longest of the best matches beginning at this index. Its length
+    # can't exceed the length of the searchText plus the number of errors.
+    endScores = _editDistances(masks, searchLength,
+                               targetText[start:start + searchLength + errors],
+                               True)
+    end = start + len(endScores) - 1 - endScores[::-1].index(errors)
 
-    # Escape any characters in searchText that would be treated as a regexp.
-    searchText = regex.escape(searchText)
-    # The regex_ library supports fuzzy matching. Quoting from the manual:
-    #
-    # - ``(item){e}`` means perform a fuzzy match of the given ``item``,
-    #   allowing insertions, deletions, or substitutions.
-    # - The BESTMATCH flag searches for the best possible match, rather than the
-    #   match found first.
-    return regex.search('(' + searchText + '){e}', targetText, regex.BESTMATCH)
+    # See if this match is unique enough by looking for the next best match
+    # in the text before the match and in the text after the match. A value of
+    # maxErrors + 1 means that the next best match has more than maxErrors
+    # errors.
+    preErrors = maxErrors + 1
+    postErrors = maxErrors + 1
+    for (rangeBegin, rangeEnd), scores in zip(ranges, startScores):
+        if rangeBegin <= start:
+            preErrors = min(preErrors, min(_editDistances(
+              masks, searchLength, targetText[rangeBegin:min(rangeEnd, start)])))
+        if rangeEnd >= end:
+            postErrors = min(postErrors, min(scores[:rangeEnd - end + 1]))
+
+    # Make sure the difference between the match and any other match is high
+    # enough to consider this match unique.
+    isDone = True
+    for otherErrors in (preErrors, postErrors):
+        if errors*1.1 > otherErrors:
+            if otherErrors <= maxErrors:
+                return True, None
+            # The other match lies outside of the ranges, and it could be
+            # close enough to this one.
+            isDone = False
+    if not isDone:
+        return False, None
+    return True, ApproxMatch(start, end, errors)
 
+# Find the ranges of the targetText which contain all substrings with maxErrors
+# or fewer errors. The searchText is split into maxErrors + 1 pieces. Every
+# error changes at most one piece, so each of these substrings contains at least
+# one piece unchanged.
+#
+# Return value: a sorted list of non-overlapping (begin, end) ranges, or None if
+# the ranges would cover too much of the targetText to save time.
+def _candidateRanges(searchText, targetText, maxErrors):
+    searchLength = len(searchText)
+    targetLength = len(targetText)
+    pieceCount = maxErrors + 1
+    if searchLength // pieceCount < _MIN_SEED_LENGTH:
+        return None
+
+    ranges = []
+    for index in range(pieceCount):
+        pieceBegin = searchLength*index // pieceCount
+        piece = searchText[pieceBegin:searchLength*(index + 1) // pieceCount]
+        position = targetText.find(piece)
+        while position != -1:
+            # The range of the substring which contains this piece, assuming
+            # that all errors are insertions before or after the piece.
+            matchBegin = position - pieceBegin
+            ranges.append((max(0, matchBegin - maxErrors),
+                           min(targetLength, matchBegin + searchLength + maxErrors)))
+            if len(ranges) > targetLength // searchLength:
+                return None
+            position = targetText.find(piece, position + 1)
+
+    ranges.sort()
+    merged = []
+    for begin, end in ranges:
+        if merged and begin <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((begin, end))
+    if sum(end - begin for begin, end in merged)*2 > targetLength:
+        return None
+    return merged
+
+# Bit ``i`` of the mask of a character is set if ``pattern[i]`` is this
+# character.
+def _patternMasks(pattern):
+    masks = {}
+    bit = 1
+    for char in pattern:
+        masks[char] = masks.get(char, 0) | bit
+        bit <<= 1
+    return masks
+
+# Compute edit distances between a pattern and substrings of the text using
+# Myers' algorithm.
+#
+# Return value: a list of ``len(text) + 1`` distances. Item ``j`` is the
+# smallest edit distance between the pattern and a substring of the text which
+# ends at index ``j``. If ``anchored`` is True, the substring must begin at the
+# start of the text.
+def _editDistances(
+  # The masks of the pattern, computed by _patternMasks_.
+  masks,
+  # The length of the pattern.
+  patternLength,
+  text,
+  anchored=False):
+
+    # The vertical differences of the current column of the edit distance
+    # table are encoded in the bit vectors ``pv`` (+1) and ``mv`` (-1). The last
+    # row of the table, which is the result, is tracked in ``score``.
+    allBits = (1 << patternLength) - 1
+    lastBit = 1 << (patternLength - 1)
+    # In the anchored case, the first row of the table grows by one for every
+    # text character; otherwise it is all zeros.
+    firstRowBit = 1 if anchored else 0
+    pv = allBits
+    mv = 0
+    score = patternLength
+    scores = [score]
+    append = scores.append
+    getMask = masks.get
+    for char in text:
+        eq = getMask(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (allBits & ~(xh | pv))
+        mh = pv & xh
+        if ph & lastBit:
+            score += 1
+        elif mh & lastBit:
+            score -= 1
+        ph = ((ph << 1) | firstRowBit) & allBits
+        mh = (mh << 1) & allBits
+        pv = mh | (allBits & ~(xv | ph))
+        mv = ph & xv
+        append(score)
+    return scores
 #
 # findApproxTextInTarget
 # ======================
@@ -227,9 +386,8 @@ def findApproxTextInTarget(
     # Get a search and target substring from the match.
     searchPattern = searchText[begin:end]
     targetSubstring = targetText[mo.start():mo.end()]
-    # Use the LCS_ algorithm to perform a more exact match. This algorithm
-    # runs in O(NM) time, compared to regex's compiled (and hopefully faster)
-    # performance.
+    # Use the LCS_ algorithm to perform a more exact match. The substrings are
+    # short, so its O(NM) time is small.
     relativeSearchAnchor = searchAnchor - begin
     offset, lcsString = refineSearchResult(searchPattern, relativeSearchAnchor,
                                            targetSubstring, ENABLE_LOG)
@@ -238,7 +396,7 @@ def findApproxTextInTarget(
 
     if ENABLE_LOG:
         si = htmlFormatSearchInput(searchText, begin, searchAnchor, end)
-        if offset is not -1:
+        if offset != -1:
             sr = htmlFormatSearchInput(targetText, mo.start(), offset,
                                        mo.end())
             fs += htmlFormatSearch(si, sr, "Match was '%s'" % lcsString)
@@ -283,25 +441,34 @@ def refineSearchResult(
     # So, a given x or y value refers to a table index or, equivalently, an
     # anchor to their right.
     #
-    # Initialize the substring length table entries to 0.
-    lengths = [[0 for j in range(len(targetText) + 1)]
-               for i in range(len(searchText) + 1)]
-
-    # Determine the length of the longest common subsequence and store this in
-    # the table.
-    for i, x in enumerate(searchText):
-        for j, y in enumerate(targetText):
-            # When characters match, increase the substring length. Otherwise,
-            # the use maximum substring length found thus far.
-            if x == y:
-                lengths[i + 1][j + 1] = lengths[i][j] + 1
-            else:
-                lengths[i + 1][j + 1] = max(lengths[i + 1][j], lengths[i][j + 1])
+    # The table of substring lengths is computed with the bit-parallel
+    # algorithm from Maxime Crochemore et al., "A fast and practical bit-vector
+    # algorithm for the longest common subsequence problem", Information
+    # Processing Letters 80(6), 2001. Instead of a list of lists, each row of
+    # the table is stored as one integer, and the whole row is computed with a
+    # few integer operations: bit ``y`` of ``rows[x]`` is 0 if
+    # ``lengths[x][y + 1] == lengths[x][y] + 1`` and 1 if they are equal.
+    targetLength = len(targetText)
+    allBits = (1 << targetLength) - 1
+    masks = {}
+    for y, char in enumerate(targetText):
+        masks[char] = masks.get(char, 0) | (1 << y)
+    row = allBits
+    rows = [row]
+    for char in searchText:
+        matches = row & masks.get(char, 0)
+        row = ((row + matches) | (row - matches)) & allBits
+        rows.append(row)
+
+    # Given x and y, return lengths[x][y], the number of zero bits among the
+    # lowest y bits of the row.
+    def lengths(x, y):
+        return y - bin(rows[x] & ((1 << y) - 1)).count('1')
 
     # If LCS fails to find a common subsequence, then set the offset to -1 and
     # inform ``findApproxTextInTarget`` that no match is found. This rarely
-    # happens since regex has preprocessed input string.
-    if lengths[-1][-1] == 0:
+    # happens since the approximate search has preprocessed input string.
+    if lengths(len(searchText), targetLength) == 0:
         return -1, ''
 
     # Walk through the table, read the LCS string out from the table and
@@ -364,9 +531,10 @@ def refineSearchResult(
     # No anchor placement ambiguioty yet exists.
     matchIndices = None
     while x != 0 and y != 0:
-        if lengths[x][y] == lengths[x - 1][y]:
+        length = lengths(x, y)
+        if length == lengths(x - 1, y):
             x -= 1
-        elif lengths[x][y] == lengths[x][y - 1]:
+        elif length == lengths(x, y - 1):
             y -= 1
         else:
             assert searchText[x - 1] == targetText[y - 1]
@@ -30,8 +30,7 @@ from PyQt5.QtTest import QTest
 from enki.core.core import core
 from enki.lib.future import RunLatest
 
-# If regex isn't installed or is too old, this import will fail. In this case,
-# disable the sync feature.
+# If this import fails, disable the sync feature.
 try:
     from .approx_match import findApproxTextInTarget
 except ImportError as e:
@@ -603,24 +602,10 @@ class PreviewSync(QObject):
         mf = self._dock._widget.webView.page().mainFrame()
         qp = core.workspace().currentDocument().qutepart
         txt = mf.toPlainText()
-        # Performance notes: findApproxTextInTarget is REALLY slow. Scrolling
-        # through preview.py with profiling enabled produced::
-        #
-        #  Output from Enki:
-        #         41130 function calls in 3.642 seconds
-        #
-        #   Ordered by: standard name
-        #
-        #   ncalls  tottime  percall  cumtime  percall filename:lineno(function)
-        #       13    0.000    0.000    0.000    0.000 __init__.py:406(text)
-        #       13    0.000    0.000    3.398    0.261 approx_match.py:138(findApproxText)
-        #       13    0.000    0.000    3.432    0.264 approx_match.py:175(findApproxTextInTarget)
-        #       13    0.029    0.002    0.034    0.003 approx_match.py:252(refineSearchResult)
-        #       26    0.000    0.000    0.000    0.000 core.py:177(workspace)
-        #       ...snip lots more 0.000 or very small times...
-        #
-        # Therefore, finding ways to make this faster or run it in another
-        # thread should significantly improve the GUI's responsiveness.
+        # Performance notes: findApproxTextInTarget takes a few milliseconds
+        # for a typical document (see tests/benchmarks/bench_approx_match.py),
+        # but it grows with the size of the document. So, run it in another
+        # thread to keep the GUI responsive.
         self._runLatest.start(self._movePreviewPaneToIndex,
                               findApproxTextInTarget, qp.text, qp.textCursor().position(), txt)
         if cProfile:
@@ -4,16 +4,21 @@ controller --- Main module. Business logic
 
 This module implements S&R plugin functionality. It joins together all other modules
 """
+import os.path
 import re
 import sys
 
-from PyQt5.QtCore import QObject, Qt
+from PyQt5.QtCore import QObject, QPoint, Qt
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QIcon
 
 
 from enki.core.core import core
+from enki.core.defines import CONFIG_DIR
+from . import projectcache
 from . import substitutions
+from . import trigramindex
+from .matchindex import MatchIndex
 
 MODE_FLAG_SEARCH = 0x1
 MODE_FLAG_REPLACE = 0x2
@@ -28,8 +33,12 @@ MODE_REPLACE_DIRECTORY = MODE_FLAG_REPLACE | MODE_FLAG_DIRECTORY
 MODE_SEARCH_OPENED_FILES = MODE_FLAG_SEARCH | MODE_FLAG_FILES
 MODE_REPLACE_OPENED_FILES = MODE_FLAG_REPLACE | MODE_FLAG_FILES
 
-# Too many extra se
-MAX_EXTRA_SELECTIONS_COUNT = 256
+# Only matches in the visible part of the document are highlighted.
+# Too many extra selections make editing slow, therefore the count is limited
+MAX_EXTRA_SELECTIONS_COUNT = 1024
+
+_SEARCH_INDEX_DIR = os.path.join(CONFIG_DIR, 'search_index')
+_FILE_METADATA_DIR = os.path.join(CONFIG_DIR, 'file_metadata')
 
 
 class Controller(QObject):
@@ -40,22 +49,34 @@ class Controller(QObject):
         QObject.__init__(self)
         self._mode = None
         self._searchThread = None
+        self._searchRegExp = None
         self._replaceThread = None
+        self._replaceAllThread = None
+        self._replaceAllRunId = None  # id of the current run of the thread, None if not running
+        self._replaceAllDocument = None
+        self._replaceAllRevision = None
+        self._indexUpdateThread = None
+        self._searchIndex = None
+        self._checkedSearchIndex = None  # all project files have been checked for this index
+        self._metadataCache = None
         self._widget = None
         self._dock = None
         self._searchInFileStartPoint = None
         self._searchInFileLastCursorPos = None
 
-        # all matches cache
-        self._cachedRegExp = None
-        self._cachedText = None
-        self._catchedMatches = None
+        # index of all matches in the current document
+        self._matchIndex = None
+        self._matchIndexDocument = None
+        self._highlightedRegExp = None
 
         self._createActions()
 
         core.workspace().currentDocumentChanged.connect(self._onCurrentDocumentChanged)
         core.workspace().currentDocumentChanged.connect(self._resetSearchInFileStartPoint)
+        core.workspace().documentClosed.connect(self._onDocumentClosed)
         QApplication.instance().focusChanged.connect(self._resetSearchInFileStartPoint)
+        core.project().filesReady.connect(self._updateSearchIndex)
+        core.project().filesChanged.connect(self._onProjectFilesChanged)
 
     def terminate(self):
         """Explicitly called destructor
@@ -64,6 +85,11 @@ class Controller(QObject):
             self._searchThread.stop()
         if self._replaceThread is not None:
             self._replaceThread.stop()
+        if self._replaceAllThread is not None:
+            self._replaceAllThread.stop()
+        if self._indexUpdateThread is not None:
+            self._indexUpdateThread.stop()
+        self._setMatchIndexDocument(None)
 
         for action in self._createdActions:
             core.actionManager().removeAction(action)
@@ -81,7 +107,10 @@ class Controller(QObject):
 
         core.workspace().currentDocumentChanged.disconnect(self._onCurrentDocumentChanged)
         core.workspace().currentDocumentChanged.disconnect(self._resetSearchInFileStartPoint)
+        core.workspace().documentClosed.disconnect(self._onDocumentClosed)
         QApplication.instance().focusChanged.disconnect(self._resetSearchInFileStartPoint)
+        core.project().filesReady.disconnect(self._updateSearchIndex)
+        core.project().filesChanged.disconnect(self._onProjectFilesChanged)
 
     def _createActions(self):
         """Create main menu actions
@@ -176,6 +205,7 @@ class Controller(QObject):
 
         self._widget.replaceFileOne.connect(self._onReplaceFileOne)
         self._widget.replaceFileAll.connect(self._onReplaceFileAll)
+        self._widget.replaceFileAllStopPressed.connect(self._onReplaceFileAllStopPressed)
 
         core.workspace().currentDocumentChanged.connect(self._updateFileActionsState)  # always disabled, if no widget
         core.workspace().textChanged.connect(self._updateSearchWidgetFoundItemsHighlighting)
@@ -224,17 +254,57 @@ class Controller(QObject):
     #
     # Highlight found items with yellow
     #
-    def _findAllMatches(self, text, regExp):
-        """Find all matces of regExp in text
-        This method caches found items for last text and regExp
+    def _documentMatchIndex(self, document, regExp):
+        """Get up to date index of all matches of regExp in the document.
+        The index is kept for the last document and regExp, and is updated incrementally when the text is edited
+        """
+        if self._matchIndexDocument is not document or \
+           self._matchIndex.regExp() != regExp:
+            self._setMatchIndexDocument(document)
+            self._matchIndex = MatchIndex(regExp, document.qutepart.text)
+        elif not self._matchIndex.isUpToDate():
+            self._matchIndex.update(document.qutepart.text)
+
+        return self._matchIndex
+
+    def _setMatchIndexDocument(self, document):
+        """Track changes and scrolling of the indexed document
+        """
+        for connect, qpart in ((False, self._matchIndexDocument), (True, document)):
+            if qpart is None:
+                continue
+            qpart = qpart.qutepart
+            signals = ((qpart.document().contentsChange, self._onIndexedTextChanged),
+                       (qpart.verticalScrollBar().valueChanged, self._onIndexedDocumentScrolled),
+                       (qpart.horizontalScrollBar().valueChanged, self._onIndexedDocumentScrolled))
+            for signal, slot in signals:
+                if connect:
+                    signal.connect(slot)
+                else:
+                    signal.disconnect(slot)
+
+        self._matchIndexDocument = document
+        self._matchIndex = None
+
+    def _onIndexedTextChanged(self, position, charsRemoved, charsAdded):
+        """Text of the indexed document changed. The index is updated on the next request
+        """
+        if self._matchIndex is not None:
+            self._matchIndex.invalidate(position, charsRemoved, charsAdded)
+
+    def _onIndexedDocumentScrolled(self):
+        """Highlight matches, which became visible
         """
-        if self._cachedText != text or \
-           self._cachedRegExp != regExp:
-            self._catchedMatches = [match for match in regExp.finditer(text)]
-            self._cachedText = text
-            self._cachedRegExp = regExp
+        if self._highlightedRegExp is not None and \
+           self._matchIndexDocument is core.workspace().currentDocument():
+            self._updateFoundItemsHighlighting(self._highlightedRegExp)
 
-        return self._catchedMatches
+    def _onDocumentClosed(self, document):
+        """Forget the index of the closed document
+        """
+        if document is self._matchIndexDocument:
+            self._setMatchIndexDocument(None)
+            self._highlightedRegExp = None
 
     def _updateSearchWidgetFoundItemsHighlighting(self):
         document = core.workspace().currentDocument()
@@ -245,25 +315,34 @@ class Controller(QObject):
            not self._widget.isSearchRegExpValid()[0] or \
            not self._widget.getRegExp().pattern:
             document.qutepart.setExtraSelections([])
+            self._highlightedRegExp = None
             return
 
         return self._updateFoundItemsHighlighting(self._widget.getRegExp())
 
     def _updateFoundItemsHighlighting(self, regExp):
         """(Re)highlight found items with yellow color
-        Called by _updateSearchWidgetFoundItemsHighlighting and by word search highlighting
+        Called by _updateSearchWidgetFoundItemsHighlighting, by word search highlighting and on scrolling.
+
+        Only matches in the visible part of the document and in a margin around it are highlighted.
+        The margin is as long as the visible part, so that scrolling and resizing don't show unhighlighted matches
         """
         document = core.workspace().currentDocument()
+        qpart = document.qutepart
 
-        matches = self._findAllMatches(document.qutepart.text, regExp)
+        matchIndex = self._documentMatchIndex(document, regExp)
 
-        if len(matches) <= MAX_EXTRA_SELECTIONS_COUNT:
-            selections = [(match.start(), len(match.group(0)))
-                          for match in matches]
-        else:
-            selections = []
+        viewport = qpart.viewport()
+        visibleStart = qpart.cursorForPosition(QPoint(0, 0)).position()
+        visibleEnd = qpart.cursorForPosition(QPoint(viewport.width() - 1, viewport.height() - 1)).position()
+
+        margin = visibleEnd - visibleStart
+        matches = matchIndex.matchesInRange(visibleStart - margin, visibleEnd + margin)
+        if len(matches) > MAX_EXTRA_SELECTIONS_COUNT:
+            matches = matchIndex.matchesInRange(visibleStart, visibleEnd)[:MAX_EXTRA_SELECTIONS_COUNT]
 
-        document.qutepart.setExtraSelections(selections)
+        qpart.setExtraSelections([(start, end - start) for start, end in matches])
+        self._highlightedRegExp = regExp
 
     def _onCurrentDocumentChanged(self, old, new):
         """Current document changed. Clear highlighted items
@@ -277,29 +356,25 @@ class Controller(QObject):
         if self._widget is not None:
             if old is not None:
                 old.qutepart.setExtraSelections([])
+                self._highlightedRegExp = None
 
-    def _searchInText(self, regExp, text, startPoint, forward):
-        """Search in text and return tuple (nearest match, all matches)
+    def _searchInDocument(self, document, regExp, startPoint, forward):
+        """Search in the document and return tuple (index of the nearest match, match index)
         (None, None) if not found
         """
-        matches = self._findAllMatches(text, regExp)
-        if matches:
-            if forward:
-                for match in matches:
-                    if match.start() >= startPoint:
-                        break
-                else:  # wrap, search from start
-                    match = matches[0]
-            else:  # reverse search
-                for match in matches[::-1]:
-                    if match.start() < startPoint:
-                        break
-                else:  # wrap, search from end
-                    match = matches[-1]
-            return match, matches
-        else:
+        matchIndex = self._documentMatchIndex(document, regExp)
+        count = matchIndex.count()
+        if not count:
             return None, None
 
+        index = matchIndex.indexAt(startPoint)
+        if forward:
+            if index == count:  # wrap, search from start
+                index = 0
+        else:  # reverse search. Wrap, if there are no matches before the start point
+            index = (index - 1) % count
+        return index, matchIndex
+
     #
     # Search word under cursor
     #
@@ -341,11 +416,11 @@ class Controller(QObject):
 
         self._updateFoundItemsHighlighting(regExp)
 
-        match, matches = self._searchInText(regExp, document.qutepart.text, startPoint, forward)
-        if match is not None:
-            document.qutepart.absSelectedPosition = (match.start(), match.start() + len(match.group(0)))
+        index, matchIndex = self._searchInDocument(document, regExp, startPoint, forward)
+        if index is not None:
+            document.qutepart.absSelectedPosition = matchIndex.match(index)
             core.mainWindow().statusBar().showMessage('Match %d of %d' %
-                                                      (matches.index(match) + 1, len(matches)), 3000)
+                                                      (index + 1, matchIndex.count()), 3000)
         else:
             core.workspace().currentDocument().qutepart.resetSelection()
 
@@ -401,7 +476,8 @@ class Controller(QObject):
     def _searchFile(self, forward=True, incremental=False):
         """Do search in file operation. Will select next found item
         """
-        qutepart = core.workspace().currentDocument().qutepart
+        document = core.workspace().currentDocument()
+        qutepart = document.qutepart
 
         regExp = self._widget.getRegExp()
 
@@ -420,14 +496,14 @@ class Controller(QObject):
             else:
                 self._searchInFileStartPoint = cursor.selectionStart()
 
-        match, matches = self._searchInText(regExp, qutepart.text, self._searchInFileStartPoint, forward)
-        if match:
-            selectionStart, selectionEnd = match.start(), match.start() + len(match.group(0))
+        index, matchIndex = self._searchInDocument(document, regExp, self._searchInFileStartPoint, forward)
+        if index is not None:
+            selectionStart, selectionEnd = matchIndex.match(index)
             qutepart.absSelectedPosition = (selectionStart, selectionEnd)
             self._searchInFileLastCursorPos = selectionEnd
             self._widget.setState(self._widget.Good)  # change background acording to result
             core.mainWindow().statusBar().showMessage('Match %d of %d' %
-                                                      (matches.index(match) + 1, len(matches)), 3000)
+                                                      (index + 1, matchIndex.count()), 3000)
         else:
             self._widget.setState(self._widget.Bad)
             qutepart.resetSelection()
@@ -458,20 +534,64 @@ class Controller(QObject):
             self._widget.setState(self._widget.Bad)
 
     def _onReplaceFileAll(self, replaceText):
-        """Do all replacements in the file
+        """Do all replacements in the file.
+        The new text is computed by a thread, and then applied to the document as one undo step
         """
         self._widget.updateComboBoxes()
 
-        qpart = core.workspace().currentDocument().qutepart
+        document = core.workspace().currentDocument()
         regExp = self._widget.getRegExp()
 
-        matches = self._findAllMatches(qpart.text, regExp)
+        if self._replaceAllThread is None:
+            from .threads import ReplaceAllThread
+            self._replaceAllThread = ReplaceAllThread()
+            self._replaceAllThread.progressChanged.connect(self._widget.onSearchProgressChanged)
+            self._replaceAllThread.replacementsReady.connect(self._onReplaceFileAllReady)
+            self._replaceAllThread.runFinished.connect(self._onReplaceFileAllFinished)
+
+        self._replaceAllDocument = document
+        self._replaceAllRevision = document.qutepart.document().revision()
+        self._widget.setReplaceFileAllInProgress(True)
+        self._replaceAllRunId = self._replaceAllThread.replaceAll(regExp, replaceText, document.qutepart.text)
+
+    def _onReplaceFileAllStopPressed(self):
+        """Handler for 'stop replacing all' action.
+        Results of the stopped run, which may be already queued, are ignored
+        """
+        if self._replaceAllThread is not None:
+            self._replaceAllThread.stop()
+        self._onReplaceFileAllFinished(self._replaceAllRunId)
+
+    def _onReplaceFileAllReady(self, runId, hunks, count):
+        """Apply changes, computed by the thread, to the document.
+        Only changed line ranges are replaced
+        """
+        if runId != self._replaceAllRunId:  # the run has been stopped or superseded
+            return
+
+        document = self._replaceAllDocument
+        if document not in core.workspace().documents() or \
+           document.qutepart.document().revision() != self._replaceAllRevision:
+            core.mainWindow().statusBar().showMessage(self.tr("Document has been modified. Nothing replaced"),
+                                                      3000)
+            return
+
+        qpart = document.qutepart
         with qpart:
-            for match in matches[::-1]:  # reverse order, because replacement may move indexes
-                replaceTextSubed = substitutions.makeSubstitutions(replaceText, match)
-                qpart.replaceText(match.start(), len(match.group(0)), replaceTextSubed)
+            for start, end, text in reversed(hunks):  # reverse order, because replacement may move indexes
+                qpart.replaceText(start, end - start, text)
+
+        core.mainWindow().statusBar().showMessage(self.tr("%d match(es) replaced." % count), 3000)
 
-        core.mainWindow().statusBar().showMessage(self.tr("%d match(es) replaced." % len(matches)), 3000)
+    def _onReplaceFileAllFinished(self, runId):
+        """Replace all thread finished or has been stopped
+        """
+        if runId is None or runId != self._replaceAllRunId:
+            return
+
+        self._replaceAllRunId = None
+        self._replaceAllDocument = None
+        self._widget.setReplaceFileAllInProgress(False)
 
     #
     # Search in directory (with thread)
@@ -494,12 +614,23 @@ class Controller(QObject):
 
         inOpenedFiles = self._mode in (MODE_SEARCH_OPENED_FILES, MODE_REPLACE_OPENED_FILES,)
 
+        searchIndex = None
+        metadataCache = None
+        if not inOpenedFiles:
+            searchIndex = self._projectSearchIndex()
+            if searchIndex is not None and not searchIndex.isLoaded():
+                self._updateSearchIndex()  # for the next searches
+            metadataCache = self._projectMetadataCache()
+
         self._widget.setSearchInProgress(True)
         self._dock.clear()
+        self._searchRegExp = regExp
         self._searchThread.search(regExp,
                                   mask,
                                   inOpenedFiles,
-                                  path)
+                                  path,
+                                  searchIndex,
+                                  metadataCache)
 
     def _onSearchInDirectoryStopPressed(self):
         """Handler for 'search in directory' action
@@ -511,12 +642,78 @@ class Controller(QObject):
         """Handler for search in directory finished signal
         """
         self._widget.setSearchInProgress(False)
+        self._dock.sortResults()
         matchesCount = self._dock.matchesCount()
         if matchesCount:
             core.mainWindow().statusBar().showMessage('%d matches ' % matchesCount, 3000)
         else:
             core.mainWindow().statusBar().showMessage('Nothing found', 3000)
 
+    #
+    # Search index
+    #
+
+    def _projectSearchIndex(self):
+        """Get the search index of the current project.
+        None, if the index is disabled or no project is opened
+        """
+        projectPath = core.project().path()
+        if not core.config()['SearchReplace']['UseIndex'] or \
+           projectPath is None:
+            return None
+
+        rootPaths = core.project().roots()
+        if self._searchIndex is None or \
+           self._searchIndex.rootPaths() != rootPaths:
+            self._searchIndex = trigramindex.TrigramIndex(projectPath, _SEARCH_INDEX_DIR, rootPaths)
+        return self._searchIndex
+
+    def _projectMetadataCache(self):
+        """Get the file metadata cache of the current project.
+        None, if no project is opened
+        """
+        projectPath = core.project().path()
+        if projectPath is None:
+            return None
+
+        rootPaths = core.project().roots()
+        if self._metadataCache is None or \
+           self._metadataCache.rootPaths() != rootPaths:
+            self._metadataCache = projectcache.FileMetadataCache(projectPath, _FILE_METADATA_DIR, rootPaths)
+        return self._metadataCache
+
+    def _indexUpdateThreadInstance(self):
+        if self._indexUpdateThread is None:
+            from .threads import IndexUpdateThread
+            self._indexUpdateThread = IndexUpdateThread()
+        return self._indexUpdateThread
+
+    def _updateSearchIndex(self):
+        """Index new and modified project files in the background.
+        Start loading the list of project files, if it is not loaded yet.
+
+        All files are checked once per index, later changes of the list are applied by _onProjectFilesChanged()
+        """
+        searchIndex = self._projectSearchIndex()
+        if searchIndex is None or searchIndex is self._checkedSearchIndex:
+            return
+
+        if core.project().files() is None:
+            core.project().startLoadingFiles()  # self will be called again on filesReady
+            return
+
+        self._checkedSearchIndex = searchIndex
+        self._indexUpdateThreadInstance().update(searchIndex, core.project().files())
+
+    def _onProjectFilesChanged(self, added, removed):
+        """Index the added project files, forget the removed ones
+        """
+        searchIndex = self._projectSearchIndex()
+        if searchIndex is None:
+            self._checkedSearchIndex = None  # the index is disabled, changes are not applied
+        elif searchIndex is self._checkedSearchIndex:
+            self._indexUpdateThreadInstance().updateFiles(searchIndex, added, removed)
+
     #
     # Replace in directory (with thread)
     #
@@ -536,6 +733,7 @@ class Controller(QObject):
         self._replaceThread.finalStatus.connect(self._onReplaceThreadFinalStatus)
 
         self._replaceThread.replace(self._dock.getCheckedItems(),
+                                    self._searchRegExp,
                                     replaceText)
 
     def _onReplaceCheckedStopPressed(self):
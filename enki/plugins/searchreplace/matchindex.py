@@ -0,0 +1,225 @@
+"""
+matchindex --- Index of the matches in the current document
+===========================================================
+
+The index keeps sorted positions of all matches of a regular expression in a text.
+It is used to highlight the found items and to show 'Match N of M' on the status bar.
+
+When the text is edited, only the changed lines and a margin around them are searched again.
+The scan continues after the margin, until it finds a match, which has been found before the edit.
+Positions of the following matches are shifted lazily. Usually the next edit is near to the previous one,
+therefore typing doesn't touch most of the index.
+
+It works only for patterns, which match within one line. If the pattern can match a line feed
+(i.e. \\n, \\s, [^...] or . with DOTALL), a match might start or end anywhere before or after the edit,
+and the whole text is searched again after every edit.
+The margin is limited in characters only for patterns of limited length without lookahead assertions,
+otherwise the whole changed lines are searched.
+
+The module doesn't use Qt, the controller connects it to the document
+"""
+
+import bisect
+from array import array
+
+from . import searchengine
+
+
+# Count of lines before and after the changed lines, which are searched again.
+# Patterns, which look a few lines around the match (i.e. \n in a lookbehind assertion), are handled correctly
+_MARGIN_LINES = 2
+# Limit of the margin, in characters, for patterns of limited length. Long lines are not searched completely
+_MAX_MARGIN = 1000
+
+class MatchIndex:
+    """Sorted index of the matches of a regExp in a text.
+
+    Call invalidate() when the text is changed, and update() with the new text before the next query
+    """
+
+    def __init__(self, regExp, text):
+        self._regExp = regExp
+        properties = searchengine.patternProperties(regExp)
+        self._matchesNewline = properties.matchesNewline
+        self._maxMargin = None
+        if properties.maxLength is not None:
+            self._maxMargin = max(_MAX_MARGIN, properties.maxLength)
+        self._starts = array('q')
+        self._ends = array('q')
+
+        # Positions with indexes starting from _shiftIndex must be shifted by _shiftDelta
+        self._shiftIndex = 0
+        self._shiftDelta = 0
+
+        # Changed range of the text, which hasn't been searched yet. (start, end, delta of length) or None.
+        # start and end are positions in the new text
+        self._dirty = None
+
+        self._scan(text)
+
+    def regExp(self):
+        """The indexed regular expression
+        """
+        return self._regExp
+
+    def isUpToDate(self):
+        """Check if the index doesn't need update()
+        """
+        return self._dirty is None
+
+    def invalidate(self, position, charsRemoved, charsAdded):
+        """The text has been changed. charsRemoved characters on the position were replaced with charsAdded characters
+        """
+        end = position + charsAdded
+        delta = charsAdded - charsRemoved
+        if self._dirty is not None:
+            dirtyStart, dirtyEnd, dirtyDelta = self._dirty
+            if dirtyEnd >= position + charsRemoved:
+                dirtyEnd += delta
+            elif dirtyEnd > position:
+                dirtyEnd = end
+            position = min(position, dirtyStart)
+            end = max(end, dirtyEnd)
+            delta += dirtyDelta
+
+        self._dirty = (position, end, delta)
+
+    def update(self, text):
+        """Search the changed part of the text. text is the whole new text
+        """
+        if self._dirty is None:
+            return
+
+        dirtyStart, dirtyEnd, delta = self._dirty
+        self._dirty = None
+
+        if self._matchesNewline or \
+           dirtyEnd - dirtyStart > len(text) // 2:  # rescan is required or not slower
+            self._scan(text)
+            return
+
+        scanStart = _lineStart(text, dirtyStart, _MARGIN_LINES)
+        scanEnd = _lineEnd(text, dirtyEnd, _MARGIN_LINES)
+        if self._maxMargin is not None:
+            scanStart = max(scanStart, dirtyStart - self._maxMargin)
+            scanEnd = min(scanEnd, dirtyEnd + self._maxMargin)
+
+        # Remove the matches, which intersect the scanned range. Positions before dirtyStart are not changed
+        firstIndex = self.indexAt(scanStart)
+        if firstIndex > 0 and self._end(firstIndex - 1) > scanStart:
+            firstIndex -= 1
+            scanStart = self._start(firstIndex)
+
+        self._moveShift(firstIndex)
+        count = len(self._starts)
+        lastIndex = firstIndex  # first old match after the scanned range
+        newStarts = array('q')
+        newEnds = array('q')
+        for match in self._regExp.finditer(text, scanStart):
+            start, end = match.span()
+            if start >= scanEnd:
+                # Old matches, which are before this one, have disappeared
+                shift = self._shiftDelta + delta
+                while lastIndex < count and self._starts[lastIndex] + shift < start:
+                    lastIndex += 1
+                if lastIndex < count and \
+                   self._starts[lastIndex] + shift == start and \
+                   self._ends[lastIndex] + shift == end:
+                    break  # The rest of the matches are the same as before
+            newStarts.append(start)
+            newEnds.append(end)
+        else:
+            lastIndex = count
+
+        self._starts[firstIndex:lastIndex] = newStarts
+        self._ends[firstIndex:lastIndex] = newEnds
+        self._shiftIndex = firstIndex + len(newStarts)
+        self._shiftDelta += delta
+
+    def count(self):
+        """Count of matches
+        """
+        return len(self._starts)
+
+    def match(self, index):
+        """Get tuple (start, end) of the match with the index
+        """
+        return self._start(index), self._end(index)
+
+    def indexAt(self, position):
+        """Get index of the first match, which starts on or after the position.
+        count(), if there are no such matches
+        """
+        index = bisect.bisect_left(self._starts, position, 0, self._shiftIndex)
+        if index < self._shiftIndex:
+            return index
+        return bisect.bisect_left(self._starts, position - self._shiftDelta, self._shiftIndex)
+
+    def matchesInRange(self, start, end):
+        """Get list of tuples (start, end) of the matches, which intersect the range or are empty and lie in it
+        """
+        firstIndex = self.indexAt(start)
+        if firstIndex > 0 and self._end(firstIndex - 1) > start:
+            firstIndex -= 1
+        lastIndex = self.indexAt(end)
+        return [self.match(index) for index in range(firstIndex, lastIndex)]
+
+    def _start(self, index):
+        if index < self._shiftIndex:
+            return self._starts[index]
+        return self._starts[index] + self._shiftDelta
+
+    def _end(self, index):
+        if index < self._shiftIndex:
+            return self._ends[index]
+        return self._ends[index] + self._shiftDelta
+
+    def _moveShift(self, index):
+        """Move the lazy shift boundary to the index.
+        Only the positions between the old and the new boundary are modified
+        """
+        if index > self._shiftIndex:
+            shiftFrom, shiftTo, delta = self._shiftIndex, index, self._shiftDelta
+        elif index < self._shiftIndex:
+            shiftFrom, shiftTo, delta = index, self._shiftIndex, -self._shiftDelta
+        else:
+            return
+
+        if delta:
+            for positions in (self._starts, self._ends):
+                positions[shiftFrom:shiftTo] = array('q', [pos + delta for pos in positions[shiftFrom:shiftTo]])
+        self._shiftIndex = index
+
+    def _scan(self, text):
+        """Search the whole text
+        """
+        self._starts = array('q')
+        self._ends = array('q')
+        for match in self._regExp.finditer(text):
+            start, end = match.span()
+            self._starts.append(start)
+            self._ends.append(end)
+        self._shiftIndex = len(self._starts)
+        self._shiftDelta = 0
+
+
+def _lineStart(text, position, extraLines):
+    """Get start of the line with the position, moved extraLines lines back
+    """
+    position = min(position, len(text))
+    for _ in range(extraLines + 1):
+        position = text.rfind('\n', 0, position)
+        if position == -1:
+            return 0
+    return position + 1
+
+
+def _lineEnd(text, position, extraLines):
+    """Get end of the line with the position, moved extraLines lines forward
+    """
+    for _ in range(extraLines + 1):
+        position = text.find('\n', position)
+        if position == -1:
+            return len(text)
+        position += 1
+    return position - 1
@@ -0,0 +1,152 @@
+"""
+projectcache --- Persistent caches of the project files
+=======================================================
+
+A cache is a dictionary of entries, which is stored in a file per project.
+Entries are loaded and updated by the threads. The dictionary is never modified, but replaced.
+Therefore threads don't need locking
+
+FileMetadataCache remembers the kind of the contents of every searched file.
+Binary files are skipped by the search without reading it,
+and plain ASCII files are searched without checking the contents again.
+Entries are stored together with inode, size and modification time of the file,
+entries of modified files are ignored
+
+Project might have a few root directories. A cache is stored for the main root,
+and it caches files of all the roots
+
+The module doesn't use Qt and the Enki core
+"""
+
+import hashlib
+import os
+import os.path
+import pickle
+import sys
+
+
+class ProjectCache:
+    """Base class of the caches. FORMAT_VERSION must be changed, when the entries format changes
+    """
+    FORMAT_VERSION = 1
+
+    def __init__(self, projectPath, cacheDir, rootPaths=None):
+        """rootPaths is list of the project roots. The first one is the project path
+        """
+        self._projectPath = projectPath
+        self._rootPaths = rootPaths or [projectPath]
+        pathHash = hashlib.sha1(projectPath.encode('utf8', errors='replace')).hexdigest()
+        self._cacheFilePath = os.path.join(cacheDir, pathHash + '.pickle')
+        self._entries = None
+
+        self._rootPrefixes = tuple([os.path.join(rootPath, '') for rootPath in self._rootPaths])
+        # (full path prefix, prefix relative to the project path) of the other roots
+        self._otherRootPrefixes = []
+        for rootPath in self._rootPaths[1:]:
+            try:
+                relRootPath = os.path.relpath(rootPath, projectPath)
+            except ValueError:  # another drive on Windows
+                relRootPath = rootPath
+            self._otherRootPrefixes.append((os.path.join(rootPath, ''), os.path.join(relRootPath, '')))
+
+    def projectPath(self):
+        """Project path, which is cached
+        """
+        return self._projectPath
+
+    def rootPaths(self):
+        """Project roots, which are cached
+        """
+        return self._rootPaths
+
+    def relativePath(self, fileName):
+        """Path relative to the project path, as in the project file list.
+        None, if the file is outside of the project roots
+        """
+        prefix = os.path.join(self._projectPath, '')
+        if fileName.startswith(prefix):
+            return fileName[len(prefix):]
+        for rootPrefix, relRootPrefix in self._otherRootPrefixes:
+            if fileName.startswith(rootPrefix):
+                return relRootPrefix + fileName[len(rootPrefix):]
+        return None
+
+    def isLoaded(self):
+        """Check if the cache has been loaded or built
+        """
+        return self._entries is not None
+
+    def entries(self):
+        """Dictionary of cache entries. Don't modify it
+        """
+        return self._entries
+
+    def setEntries(self, entries):
+        """Replace cache entries
+        """
+        self._entries = entries
+
+    def load(self):
+        """Load the cache from the disk. Empty cache is created, if failed to load
+        """
+        entries = {}
+        try:
+            with open(self._cacheFilePath, 'rb') as cacheFile:
+                data = pickle.load(cacheFile)
+            if data['version'] == self.FORMAT_VERSION and \
+               data['projectPath'] == self._projectPath:
+                entries = data['entries']
+        except FileNotFoundError:
+            pass
+        except Exception as ex:  # broken file
+            print('Failed to load cache {}: {}'.format(self._cacheFilePath, ex), file=sys.stderr)
+
+        self._entries = entries
+
+    def save(self):
+        """Save the cache to the disk
+        """
+        data = {'version': self.FORMAT_VERSION,
+                'projectPath': self._projectPath,
+                'entries': self._entries}
+        tmpPath = self._cacheFilePath + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self._cacheFilePath), exist_ok=True)
+            with open(tmpPath, 'wb') as cacheFile:
+                pickle.dump(data, cacheFile, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpPath, self._cacheFilePath)
+        except (IOError, OSError) as ex:
+            print('Failed to save cache {}: {}'.format(self._cacheFilePath, ex), file=sys.stderr)
+
+
+class FileMetadataCache(ProjectCache):
+    """Metadata of the project files.
+
+    Entries are {absolute path: (file key, kind)}.
+    See searchengine.fileKey() and searchengine.dataKind()
+    """
+
+    def isProjectFile(self, fileName):
+        """Check if the file shall be cached. Files outside of the project roots are not cached
+        """
+        return fileName.startswith(self._rootPrefixes)
+
+    def updatedEntries(self, metadata):
+        """Get new entries dictionary, updated with list of tuples (fileName, entry).
+        None entry removes the file.
+        Returns None, if nothing changed
+        """
+        entries = self._entries
+        changed = [(fileName, entry)
+                   for fileName, entry in metadata
+                   if self.isProjectFile(fileName) and entries.get(fileName) != entry]
+        if not changed:
+            return None
+
+        entries = dict(entries)
+        for fileName, entry in changed:
+            if entry is None:
+                entries.pop(fileName, None)
+            else:
+                entries[fileName] = entry
+        return entries
@@ -0,0 +1,224 @@
+"""
+replaceengine --- Replace in files
+==================================
+
+Functions, which do the replace job for the replace thread.
+The module doesn't use Qt and the Enki core, therefore its functions can be executed
+in the worker processes
+
+New text of a file is assembled in one pass from a list of pieces.
+It is written to a temporary file, which then atomically replaces the original file.
+Therefore a crash never leaves a half-written file.
+Files with hard links and files in not writable directories can't be replaced, these are written in place
+"""
+
+import os
+import os.path
+import stat
+import tempfile
+
+from . import searchengine
+from . import substitutions
+
+
+# replaceAllInText() checks if it is stopped and reports progress after this count of matches
+_PROGRESS_STEP = 1000
+
+# If replaceAllInText() finds more changed line ranges, they are joined to one range.
+# Applying many small changes to a document is slower, than applying one big change
+MAX_HUNK_COUNT = 64
+
+
+def replaceInText(regExp, replaceText, content, matches):
+    """Replace the matches in the text.
+
+    matches is a list of tuples (line, column, length), which have been found by the search.
+    Match objects are reconstructed with the regExp. A match is skipped, if it is not found
+    on the same place, i.e. if the text has been modified after the search.
+
+    Returns tuple (new text, count of replaced matches, count of skipped matches)
+    """
+    lineStarts = searchengine.lineStartOffsets(content)
+    # \1, \n and other sequences are substituted for every match. Otherwise the text is constant
+    hasSubstitutions = '\\' in replaceText
+
+    pieces = []
+    copiedPos = 0  # text before this position is already in the pieces
+    replacedCount = 0
+    for line, column, length in sorted(matches):
+        if line >= len(lineStarts):
+            continue
+
+        match = regExp.match(content, lineStarts[line] + column)
+        if match is None or \
+           match.end() - match.start() != length or \
+           match.start() < copiedPos:  # overlaps the previous match
+            continue
+
+        pieces.append(content[copiedPos:match.start()])
+        if hasSubstitutions:
+            pieces.append(substitutions.makeSubstitutions(replaceText, match))
+        else:
+            pieces.append(replaceText)
+        copiedPos = match.end()
+        replacedCount += 1
+
+    if not replacedCount:
+        return content, 0, len(matches)
+
+    pieces.append(content[copiedPos:])
+    return ''.join(pieces), replacedCount, len(matches) - replacedCount
+
+
+def replaceAllInText(regExp, replaceText, content, isStopped=None, reportProgress=None):
+    """Replace all matches of the regExp in the text.
+
+    The result is a minimal diff: a list of hunks (start, end, newText), sorted by position.
+    start and end are offsets of a range of whole lines of the old text, and newText replaces the range.
+    Unchanged lines between the hunks are not included.
+
+    isStopped is a function, which is checked periodically. reportProgress(position, total) is called periodically.
+    Returns tuple (hunks, count of replaced matches) or None, if stopped
+    """
+    hasSubstitutions = '\\' in replaceText
+
+    hunks = []
+    hunkStart = 0
+    hunkEnd = -1  # end of the last line of the current hunk
+    pieces = []  # new text of the current hunk
+    copiedPos = 0  # old text before this position is already in the pieces
+
+    def finishHunk():
+        pieces.append(content[copiedPos:hunkEnd])
+        newText = ''.join(pieces)
+        if newText != content[hunkStart:hunkEnd]:
+            hunks.append((hunkStart, hunkEnd, newText))
+
+    count = 0
+    for count, match in enumerate(regExp.finditer(content), 1):
+        start, end = match.span()
+        if start > hunkEnd:  # the match is on the next lines. Start a new hunk
+            if pieces:
+                finishHunk()
+            hunkStart = content.rfind('\n', 0, start) + 1
+            copiedPos = hunkStart
+            pieces = []
+
+        pieces.append(content[copiedPos:start])
+        if hasSubstitutions:
+            pieces.append(substitutions.makeSubstitutions(replaceText, match))
+        else:
+            pieces.append(replaceText)
+        copiedPos = end
+
+        hunkEnd = content.find('\n', end)
+        if hunkEnd == -1:
+            hunkEnd = len(content)
+
+        if not count % _PROGRESS_STEP:
+            if isStopped is not None and isStopped():
+                return None
+            if reportProgress is not None:
+                reportProgress(start, len(content))
+
+    if pieces:
+        finishHunk()
+
+    if len(hunks) > MAX_HUNK_COUNT:
+        pieces = [hunks[0][2]]
+        for previousHunk, hunk in zip(hunks, hunks[1:]):
+            pieces.append(content[previousHunk[1]:hunk[0]])
+            pieces.append(hunk[2])
+        hunks = [(hunks[0][0], hunks[-1][1], ''.join(pieces))]
+
+    return hunks, count
+
+
+def writeFile(fileName, data):
+    """Write bytes to the file atomically.
+
+    The data is written to a temporary file in the same directory, which then replaces the file.
+    Permissions and, if allowed, the owner of the file are kept. If the path is a symbolic link,
+    the file it points to is replaced.
+    The file is written in place, if it has hard links, which replacing would break,
+    or if the directory is not writable
+    """
+    fileName = os.path.realpath(fileName)
+    dirPath, baseName = os.path.split(fileName)
+    try:
+        fileStat = os.stat(fileName)
+    except FileNotFoundError:
+        fileStat = None
+
+    if (fileStat is not None and fileStat.st_nlink > 1) or \
+       not os.access(dirPath, os.W_OK):
+        with open(fileName, 'wb') as openedFile:
+            openedFile.write(data)
+        return
+
+    fd, tmpPath = tempfile.mkstemp(prefix='.' + baseName + '.', suffix='.tmp', dir=dirPath)
+    try:
+        with os.fdopen(fd, 'wb') as tmpFile:
+            tmpFile.write(data)
+        if fileStat is not None:
+            if hasattr(os, 'chown'):  # not available on Windows
+                try:
+                    os.chown(tmpPath, fileStat.st_uid, fileStat.st_gid)
+                except OSError:  # only root can give the file to another user
+                    pass
+            os.chmod(tmpPath, stat.S_IMODE(fileStat.st_mode))  # after chown(), which resets setuid bits
+        os.replace(tmpPath, fileName)
+    except BaseException:
+        try:
+            os.unlink(tmpPath)
+        except OSError:
+            pass
+        raise
+
+
+def replaceInFile(regExp, replaceText, fileName, matches):
+    """Replace the matches in the file on the disk. See replaceInText() for the matches format.
+
+    The file is not written, if nothing has been replaced.
+    Returns tuple (count of replaced matches, count of written bytes, list of error messages)
+    """
+    try:
+        with searchengine.openFileData(fileName) as data:
+            content = searchengine.decodeData(data)
+    except UnicodeDecodeError as ex:
+        return 0, 0, ["File %s not read: unicode error '%s'. File may be corrupted" % (fileName, str(ex))]
+    except (IOError, OSError, ValueError) as ex:  # ValueError if failed to map the file
+        return 0, 0, ["Error opening file: %s" % str(ex)]
+
+    content, replacedCount, skippedCount = replaceInText(regExp, replaceText, content, matches)
+
+    errors = []
+    if skippedCount:
+        errors.append("%d match(es) not replaced in %s: file has been modified after search" %
+                      (skippedCount, fileName))
+    if not replacedCount:
+        return 0, 0, errors
+
+    try:
+        data = content.encode('utf8')
+    except UnicodeEncodeError as ex:
+        errors.append("Failed to encode file to utf8: %s" % str(ex))
+        return 0, 0, errors
+
+    try:
+        writeFile(fileName, data)
+    except (IOError, OSError) as ex:
+        errors.append("Error while saving replaced content: %s" % str(ex))
+        return 0, 0, errors
+
+    return replacedCount, len(data), errors
+
+
+def replaceInFiles(regExp, replaceText, items):
+    """Replace in the chunk of files. Entry point of a worker process.
+
+    items is a list of tuples (fileName, matches). See replaceInText() for the matches format.
+    Returns list of tuples (fileName, replacedCount, writtenBytes, errors). See replaceInFile()
+    """
+    return [(fileName,) + replaceInFile(regExp, replaceText, fileName, matches)
+            for fileName, matches in items]
@@ -0,0 +1,550 @@
+"""
+searchengine --- Search in files
+================================
+
+Functions, which do the search job for the search thread.
+The module doesn't use Qt and the Enki core, therefore its functions can be executed
+in the worker processes
+
+Big files are memory mapped instead of reading it to a bytes object.
+If both the pattern and the file contents are plain ASCII, the file is searched
+with a bytes regular expression directly in the mapping, and only the lines with matches are decoded.
+Otherwise the mapping is decoded and searched by line aligned chunks, if no match of the pattern can
+contain a line feed or depend on the start or the end of the whole text. Plain ASCII chunks are
+searched with the bytes regular expression. Mapped files are decoded completely only for other patterns
+
+Most searches are plain words. If the pattern is a string, an alternation of strings or a whole word,
+the file is first checked for the strings with a substring search. Files without them are skipped
+without running the regular expression. Case insensitive strings are searched in the lower case text
+with a case sensitive expression of the found strings, which is several times faster
+"""
+
+import codecs
+import collections
+import contextlib
+import functools
+import itertools
+import mmap
+import os
+import re
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+    from re._constants import MAXREPEAT
+except ImportError:
+    import sre_parse
+    from sre_constants import MAXREPEAT
+
+
+# Files of this size and bigger are memory mapped
+MMAP_MIN_FILE_SIZE = 256 * 1024
+
+# Memory mapped file is processed by chunks of this size to avoid copying a big part of it to memory
+_CHUNK_SIZE = 1024 * 1024
+
+# ASCII control characters, which Unicode treats as white space.
+# str and bytes regular expressions work differently for it and for non-ASCII characters
+_UNICODE_SPACES = (b'\x1c', b'\x1d', b'\x1e', b'\x1f')
+
+# Characters, which have special meaning in a regular expression, if not escaped
+_SPECIAL_CHARS = frozenset('.^$*+?{}[]\\|()')
+
+# Longer alternations of strings are searched with the regular expression only
+_MAX_LITERAL_COUNT = 64
+
+_NEWLINE = ord('\n')
+# Character classes, which don't contain the line feed
+_NOT_NEWLINE_CATEGORIES = {sre_parse.CATEGORY_DIGIT, sre_parse.CATEGORY_NOT_SPACE,
+                           sre_parse.CATEGORY_WORD, sre_parse.CATEGORY_NOT_LINEBREAK}
+# Assertions, which check the start or the end of the whole text
+_STRING_ANCHORS = {sre_parse.AT_BEGINNING_STRING, sre_parse.AT_END_STRING}
+_LINE_OR_STRING_ANCHORS = {sre_parse.AT_BEGINNING, sre_parse.AT_END}  # depends on re.MULTILINE
+
+# Kinds of the file contents, see dataKind()
+KIND_BINARY = 'binary'
+KIND_ASCII = 'ascii'  # plain ASCII text, which is searched with bytes regular expressions
+KIND_TEXT = 'text'
+
+
+def isBinaryData(data):
+    """Check if the file contents is binary. data is bytes or a memory mapped file
+    """
+    return data.find(b'\0', 0, 4096) != -1
+
+
+@contextlib.contextmanager
+def openFileData(fileName):
+    """Context manager, which gives file contents as a bytes-like object.
+
+    Big files are memory mapped, and the mapping is closed on exit.
+    Data must not be used after the exit
+    """
+    with open(fileName, 'rb') as openedFile:
+        if os.fstat(openedFile.fileno()).st_size >= MMAP_MIN_FILE_SIZE:
+            with mmap.mmap(openedFile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+        else:
+            yield openedFile.read()
+
+
+def fileKey(fileName):
+    """Get tuple (inode, size, modification time) of the file. The key changes, when the file is modified
+    """
+    stat = os.stat(fileName)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def decodeData(data, errors='strict'):
+    """Decode UTF-8 file contents without copying it to a bytes object
+    """
+    return codecs.utf_8_decode(data, errors, True)[0]
+
+
+# Properties of a regular expression, see patternProperties()
+PatternProperties = collections.namedtuple('PatternProperties', ['matchesNewline', 'maxLength', 'stringAnchors'])
+
+
+def _setContainsNewline(items):
+    """Check if the parsed character set [...] matches the line feed
+    """
+    negate = False
+    contains = False
+    for op, av in items:
+        if op == sre_parse.NEGATE:
+            negate = True
+        elif op == sre_parse.LITERAL:
+            contains = contains or av == _NEWLINE
+        elif op == sre_parse.RANGE:
+            contains = contains or av[0] <= _NEWLINE <= av[1]
+        elif op == sre_parse.CATEGORY:
+            contains = contains or av not in _NOT_NEWLINE_CATEGORIES
+        else:  # unknown item
+            return True
+    return contains != negate
+
+
+def _analyze(items, flags):
+    """Analyze the parsed pattern.
+    Returns (can match line feed, length is not limited or depends on the lookahead, uses string anchors)
+    """
+    newline = False
+    unlimited = False
+    anchors = False
+
+    def merge(result):
+        nonlocal newline, unlimited, anchors
+        newline = newline or result[0]
+        unlimited = unlimited or result[1]
+        anchors = anchors or result[2]
+
+    for op, av in items:
+        if op == sre_parse.LITERAL:
+            newline = newline or av == _NEWLINE
+        elif op == sre_parse.NOT_LITERAL:
+            newline = newline or av != _NEWLINE
+        elif op == sre_parse.ANY:
+            newline = newline or bool(flags & re.DOTALL)
+        elif op == sre_parse.IN:
+            newline = newline or _setContainsNewline(av)
+        elif op == sre_parse.AT:
+            anchors = anchors or av in _STRING_ANCHORS or \
+                (av in _LINE_OR_STRING_ANCHORS and not flags & re.MULTILINE)
+        elif op == sre_parse.BRANCH:
+            for branch in av[1]:
+                merge(_analyze(branch, flags))
+        elif op == sre_parse.SUBPATTERN:
+            groupFlags = flags
+            if len(av) == 4:  # (group, addFlags, delFlags, pattern) on Python 3.6+
+                groupFlags = (flags | av[1]) & ~av[2]
+            merge(_analyze(av[-1], groupFlags))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) or \
+                op.name == 'POSSESSIVE_REPEAT':
+            unlimited = unlimited or av[1] == MAXREPEAT
+            merge(_analyze(av[2], flags))
+        elif op.name == 'ATOMIC_GROUP':
+            merge(_analyze(av, flags))
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            unlimited = True
+            merge(_analyze(av[1], flags))
+        elif op == sre_parse.GROUPREF_EXISTS:
+            unlimited = True
+            merge(_analyze(av[1], flags))
+            if av[2] is not None:
+                merge(_analyze(av[2], flags))
+        elif op == sre_parse.GROUPREF:  # repeats text of the group, which is analyzed
+            unlimited = True
+        else:  # unknown operation
+            return True, True, True
+
+    return newline, unlimited, anchors
+
+
+@functools.lru_cache(maxsize=16)
+def _patternProperties(pattern, flags):
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except Exception:  # this parser is not public API. Assume the worst, if something goes wrong
+        return PatternProperties(True, None, True)
+
+    newline, unlimited, anchors = _analyze(parsed, parsed.state.flags)
+    return PatternProperties(newline, None if unlimited else parsed.getwidth()[1], anchors)
+
+
+def patternProperties(regExp):
+    """Get PatternProperties of the regExp:
+
+    * matchesNewline - a match can contain the line feed. True for \\n, \\s, [^...] and . with DOTALL
+    * maxLength - maximal length of a match or None, if it is not limited or depends on a lookahead assertion
+    * stringAnchors - the pattern checks the start or the end of the whole text, i.e. \\A or $ without MULTILINE
+
+    The analysis is conservative: if a property can't be detected, the worst case is assumed
+    """
+    return _patternProperties(regExp.pattern, regExp.flags)
+
+
+def lineStartOffsets(content):
+    """Get list of offsets of the line starts in the text
+    """
+    offsets = [0]
+    offsets.extend(itertools.accumulate(len(line) + 1 for line in content.split('\n')))
+    offsets.pop()  # the offset after the end of the text
+    return offsets
+
+
+def _parseLiterals(pattern):
+    """Get list of strings, if the pattern is a string or an alternation of strings, i.e. 'foo' or 'foo|bar\\.baz'.
+    None, if the pattern is something else
+    """
+    literals = []
+    current = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            if char.isascii() and char.isalnum():  # \d, \n, \1 and other special sequences
+                return None
+            current.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '|':
+            literals.append(''.join(current))
+            current = []
+        elif char in _SPECIAL_CHARS:
+            return None
+        else:
+            current.append(char)
+
+    literals.append(''.join(current))
+    if escaped or not all(literals) or len(literals) > _MAX_LITERAL_COUNT:
+        return None
+    return literals
+
+
+@functools.lru_cache(maxsize=16)
+def _literalSearchParams(pattern, flags):
+    """Check if the literal search is applicable for the pattern.
+    Returns tuple (literals, wholeWord, ignoreCase) or None.
+    Literals have the type of the pattern, and are in lower case, if ignoreCase
+    """
+    if flags & (re.VERBOSE | re.LOCALE):
+        return None
+
+    isBytes = isinstance(pattern, bytes)
+    if isBytes:
+        pattern = pattern.decode('ascii')
+
+    wholeWord = False
+    if len(pattern) > 4 and pattern.startswith(r'\b') and pattern.endswith(r'\b') and not pattern.endswith(r'\\b'):
+        pattern = pattern[2:-2]
+        wholeWord = True
+
+    literals = _parseLiterals(pattern)
+    if literals is None or \
+       (wholeWord and len(literals) > 1):  # \b applies to the first and the last alternatives only
+        return None
+
+    ignoreCase = bool(flags & re.IGNORECASE)
+    if ignoreCase:
+        if not all(literal.isascii() for literal in literals):  # non-ASCII letters may match ASCII letters
+            return None
+        literals = [literal.lower() for literal in literals]
+
+    if isBytes:
+        literals = [literal.encode('ascii') for literal in literals]
+    return tuple(literals), wholeWord, ignoreCase
+
+
+@functools.lru_cache(maxsize=16)
+def _compileLiterals(literals):
+    separator = b'|' if isinstance(literals[0], bytes) else '|'
+    return re.compile(separator.join(re.escape(literal) for literal in literals))
+
+
+def _literalSpans(regExp, content):
+    """Find matches of the regExp, if it is a string, an alternation of strings or a whole word.
+    Returns iterable of tuples (start, end) or None, if the regExp must be used
+    """
+    params = _literalSearchParams(regExp.pattern, regExp.flags)
+    if params is None:
+        return None
+
+    literals, wholeWord, ignoreCase = params
+    searchedContent = content
+    if ignoreCase:
+        if isinstance(content, mmap.mmap) or \
+           (isinstance(content, str) and not content.isascii()):
+            return None  # don't copy a big file, don't change offsets of non-ASCII text
+        searchedContent = content.lower()
+
+    presentLiterals = tuple(literal for literal in literals if searchedContent.find(literal) != -1)
+    if not presentLiterals:
+        return ()
+
+    if wholeWord or (presentLiterals == literals and not ignoreCase):
+        return None  # the regExp is not slower
+
+    # Absent strings never match, therefore removing them from the alternation doesn't change the result
+    return (match.span() for match in _compileLiterals(presentLiterals).finditer(searchedContent))
+
+
+def _matchSpans(regExp, content):
+    """Iterate tuples (start, end) of the matches of the regExp in the content
+    """
+    spans = _literalSpans(regExp, content)
+    if spans is None:
+        spans = (match.span() for match in regExp.finditer(content))
+    return spans
+
+
+def _search(regExp, content, eol, count, decode, isStopped):
+    """Implementation of searchInText() for str and for bytes-like data.
+    count(sub, start, end) counts line ends, decode(data) converts the matched line to str
+    """
+    results = []
+
+    line = 0
+    lineStart = 0
+    countedPos = 0  # line ends before this position are already counted
+
+    wholeLine = None
+    wholeLineStart = -1
+    wholeLineEnd = -1
+
+    # Process result for all occurrences
+    for start, end in _matchSpans(regExp, content):
+        eolCount = count(eol, countedPos, start)
+        if eolCount:
+            line += eolCount
+            lineStart = content.rfind(eol, countedPos, start) + 1
+        countedPos = start
+
+        if lineStart != wholeLineStart or end > wholeLineEnd:
+            wholeLineEnd = content.find(eol, end)
+            if wholeLineEnd == -1:
+                wholeLineEnd = len(content)
+            wholeLineStart = lineStart
+            wholeLine = content[wholeLineStart:wholeLineEnd]
+            if decode is not None:
+                wholeLine = decode(wholeLine)
+
+        results.append((wholeLine, line, start - lineStart, end - start))
+
+        if isStopped is not None and isStopped():
+            break
+    return results
+
+
+def searchInText(regExp, content, isStopped=None):
+    """Search in the text and return list of tuples (wholeLine, line, column, length)
+
+    Line numbers are computed incrementally while iterating the matches,
+    every part of the text is scanned for line ends only once.
+    Matches on the same line share the same wholeLine string.
+
+    isStopped is a function, which is checked after every match
+    """
+    return _search(regExp, content, '\n', content.count, None, isStopped)
+
+
+@functools.lru_cache(maxsize=16)
+def _compileBytesRegExp(pattern, flags):
+    return re.compile(pattern.encode('ascii'), flags & ~re.UNICODE)
+
+
+def _isPlainAscii(data):
+    """Check if the data contains only ASCII characters, for which
+    str and bytes regular expressions work equally
+    """
+    for chunkStart in range(0, len(data), _CHUNK_SIZE):
+        chunk = data[chunkStart:chunkStart + _CHUNK_SIZE]
+        if not chunk.isascii() or \
+           any(space in chunk for space in _UNICODE_SPACES):
+            return False
+    return True
+
+
+def _bytesRegExp(regExp):
+    """Get bytes version of the regExp, or None, if the pattern is not plain ASCII.
+    The bytes version works exactly like the regExp on plain ASCII data
+    """
+    pattern = regExp.pattern
+    if not _isPlainAscii(pattern.encode('utf8')):
+        return None
+    try:
+        return _compileBytesRegExp(pattern, regExp.flags)
+    except re.error:
+        return None
+
+
+def _countInData(data, sub, start, end):
+    """data.count(sub, start, end) for memory mapped file, which doesn't have count()
+    """
+    result = 0
+    for chunkStart in range(start, end, _CHUNK_SIZE):
+        result += data[chunkStart:min(chunkStart + _CHUNK_SIZE, end)].count(sub)
+    return result
+
+
+def dataKind(data):
+    """Get kind of the file contents: KIND_BINARY, KIND_ASCII or KIND_TEXT
+    """
+    if isBinaryData(data):
+        return KIND_BINARY
+    elif _isPlainAscii(data):
+        return KIND_ASCII
+    else:
+        return KIND_TEXT
+
+
+def _isLineBounded(regExp):
+    """Check if a match of the regExp depends only on its line, so the text can be searched by lines
+    """
+    properties = patternProperties(regExp)
+    return not (properties.matchesNewline or properties.stringAnchors)
+
+
+def _searchInChunks(regExp, data, isStopped):
+    """Search in line aligned chunks of the memory mapped file without decoding it completely.
+    The regExp must be _isLineBounded().
+    Invalid UTF-8 sequences never contain the line feed, so decoded chunks are the same as the decoded file.
+
+    Returns tuple (matches, dataKind() of the data). Kind is None, if the search has been stopped
+    """
+    bytesRegExp = _bytesRegExp(regExp)
+    results = []
+    kind = KIND_ASCII
+    line = 0
+    chunkStart = 0
+    while chunkStart < len(data):
+        chunkEnd = data.find(b'\n', chunkStart + _CHUNK_SIZE)
+        chunkEnd = len(data) if chunkEnd == -1 else chunkEnd + 1
+        chunk = data[chunkStart:chunkEnd]
+        chunkStart = chunkEnd
+
+        isAscii = _isPlainAscii(chunk)
+        if not isAscii:
+            kind = KIND_TEXT
+        if isAscii and bytesRegExp is not None:
+            matches = _search(bytesRegExp, chunk, b'\n', chunk.count, bytes.decode, isStopped)
+        else:
+            matches = searchInText(regExp, decodeData(chunk, 'ignore'), isStopped)
+
+        chunkLineCount = chunk.count(b'\n')
+        if chunkEnd < len(data) and matches and \
+           matches[-1][1] == chunkLineCount and matches[-1][3] == 0:
+            matches.pop()  # empty match at the end of the chunk is found again at the start of the next one
+
+        results.extend((wholeLine, line + matchLine, column, length)
+                       for wholeLine, matchLine, column, length in matches)
+        line += chunkLineCount
+
+        if isStopped is not None and isStopped():
+            return results, None
+
+    return results, kind
+
+
+def _searchInDataWithKind(regExp, data, isStopped, kind):
+    """searchInData(), which also returns dataKind() of the data. Kind is None, if it hasn't been detected
+    """
+    if kind is None:
+        if isBinaryData(data):
+            return [], KIND_BINARY
+        if isinstance(data, mmap.mmap) and _isLineBounded(regExp):
+            return _searchInChunks(regExp, data, isStopped)  # detects the kind in the same pass
+        kind = dataKind(data)
+
+    if kind == KIND_BINARY:
+        return [], kind
+
+    bytesRegExp = _bytesRegExp(regExp)
+    if bytesRegExp is not None and kind == KIND_ASCII:
+        # In plain ASCII data byte offsets are equal to character offsets
+        if isinstance(data, bytes):
+            count = data.count
+        else:
+            count = functools.partial(_countInData, data)
+        return _search(bytesRegExp, data, b'\n', count, bytes.decode, isStopped), kind
+
+    if isinstance(data, mmap.mmap) and _isLineBounded(regExp):
+        return _searchInChunks(regExp, data, isStopped)[0], kind
+
+    return searchInText(regExp, decodeData(data, 'ignore'), isStopped), kind
+
+
+def searchInData(regExp, data, isStopped=None, kind=None):
+    """Search in the file contents (bytes or a memory mapped file).
+    kind is dataKind() of the data. It is detected, if None.
+    Returns empty list for binary data. See searchInText() for the results format
+    """
+    return _searchInDataWithKind(regExp, data, isStopped, kind)[0]
+
+
+def searchInFileWithMetadata(regExp, fileName, metadata, isStopped=None):
+    """Search in the file on the disk.
+    metadata is tuple (fileKey(), dataKind()) from the previous search in the file, or None.
+    If the file hasn't been modified, its kind is not detected again, and binary files are not read.
+
+    Returns tuple (matches, metadata of the file). Metadata is None, if the file is not readable,
+    or if the search has been stopped before the kind of the file was detected.
+    See searchInText() for the matches format
+    """
+    try:
+        key = fileKey(fileName)
+        kind = None
+        if metadata is not None and metadata[0] == key:
+            kind = metadata[1]
+            if kind == KIND_BINARY:
+                return [], metadata
+
+        with openFileData(fileName) as data:
+            matches, kind = _searchInDataWithKind(regExp, data, isStopped, kind)
+            return matches, ((key, kind) if kind is not None else None)
+    except (IOError, OSError, ValueError) as ex:  # ValueError if failed to map the file
+        print(ex)
+        return [], None
+
+
+def searchInFile(regExp, fileName, isStopped=None):
+    """Search in the file on the disk. Returns empty list for binary and not readable files.
+    See searchInText() for the results format
+    """
+    return searchInFileWithMetadata(regExp, fileName, None, isStopped)[0]
+
+
+def searchInFiles(regExp, items):
+    """Search in the chunk of files. Entry point of a worker process.
+    items is a list of tuples (fileName, metadata). See searchInFileWithMetadata()
+
+    Returns tuple (list of tuples (fileName, matches) for files, which contain matches,
+                   list of tuples (fileName, metadata) for all files)
+    See searchInText() for matches format
+    """
+    found = []
+    metadataList = []
+    for fileName, metadata in items:
+        matches, metadata = searchInFileWithMetadata(regExp, fileName, metadata)
+        if matches:
+            found.append((fileName, matches))
+        metadataList.append((fileName, metadata))
+    return found, metadataList
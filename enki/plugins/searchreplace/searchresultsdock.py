@@ -159,16 +159,16 @@ class SearchResultsDock(DockWidget):
     def _onResultActivated(self, index):
         """Item doubleclicked in the model, opening file
         """
-        result = index.internalPointer()
-        if isinstance(result, searchresultsmodel.Result):
-            fileResults = index.parent().internalPointer()
-            core.workspace().goTo(result.fileName,
-                                  line=result.line,
-                                  column=result.column,
-                                  selectionLength=len(result.match.group(0)))
+        fileResults = index.internalPointer()
+        if fileResults is not None:  # it is a match
+            line, column, length = fileResults.position(index.row())
+            core.workspace().goTo(fileResults.fileName,
+                                  line=line,
+                                  column=column,
+                                  selectionLength=length)
             core.mainWindow().statusBar().showMessage('Match %d of %d' %
-                                                      (fileResults.results.index(result) + 1,
-                                                       len(fileResults.results)), 3000)
+                                                      (index.row() + 1,
+                                                       len(fileResults)), 3000)
             self.setFocus()
 
     def clear(self):
@@ -181,18 +181,15 @@ class SearchResultsDock(DockWidget):
         """
         self._model.appendResults(fileResultList)
 
+    def sortResults(self):
+        """Sort results by file path. Called, when the search is finished
+        """
+        self._model.sortResults()
+
     def getCheckedItems(self):
-        """Get items, which must be replaced, as dictionary {file name : list of items}
+        """Get items, which must be replaced, as dictionary {file name : list of tuples (line, column, length)}
         """
-        items = {}
-
-        for fileRes in self._model.fileResults:
-            for row, result in enumerate(fileRes.results):
-                if result.checkState == Qt.Checked:
-                    if result.fileName not in items:
-                        items[result.fileName] = []
-                    items[result.fileName].append(result)
-        return items
+        return self._model.checkedPositions()
 
     def setReplaceMode(self, enabled):
         """When replace mode is enabled, dock shows checkbox near every item
@@ -1,106 +1,205 @@
 """
 searchresultsmodel --- Model for search results
 ===============================================
+
+Matches are stored compactly. Every file keeps arrays of line, column and length of its matches
+and the texts of the lines with matches. Displayable strings are built only for the items, which are shown,
+and are cached.
+
+Files get permanent slots in the order of appending. A binary indexed tree maps slots of not removed files
+to rows and back, therefore a file is removed and its row is found in O(log n).
+
+The search thread appends files in order of the search. sortResults() sorts them by path, when the search is finished
 """
 
+from array import array
+
 from PyQt5.QtCore import pyqtSignal, QAbstractItemModel, QDir, QModelIndex, Qt
 from PyQt5.QtWidgets import QApplication
 
 from enki.lib.htmldelegate import htmlEscape
 
 
-class Result:  # pylint: disable=R0902
-    """One found by search thread item. Consists coordinates and capture. Used by SearchResultsModel
+# Count of cached displayable strings of the matches. The cache is cleared, when it is full
+_DISPLAY_CACHE_SIZE = 4096
+
+
+class FileResults:
+    """Object stores all items, found in the file
     """
 
-    def __init__(self, fileName, wholeLine, line, column, match):  # pylint: disable=R0913
+    def __init__(self, baseDir, fileName, matches):
+        """matches is a list of tuples (wholeLine, line, column, length), see searchengine.searchInText()
+        """
+        self.baseDir = baseDir
         self.fileName = fileName
-        self.wholeLine = wholeLine
-        self.line = line
-        self.column = column
-        self.match = match
-        self.checkState = Qt.Checked
+        self.slot = None  # set by SearchResultsModel
+        self._relativePath = None
+
+        self.lines = array('l')
+        self.columns = array('l')
+        self.lengths = array('l')
+        self.lineTexts = {}  # line number: whole line
+        for wholeLine, line, column, length in matches:
+            self.lines.append(line)
+            self.columns.append(column)
+            self.lengths.append(length)
+            self.lineTexts[line] = wholeLine
+
+        self.checkStates = bytearray([Qt.Checked]) * len(self.lines)
+        self._checkedCount = len(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __str__(self):
+        """Convertor to string. Used for debugging
+        """
+        return '%s (%d)' % (self.fileName, len(self))
+
+    def position(self, row):
+        """Tuple (line, column, length) of the match
+        """
+        return self.lines[row], self.columns[row], self.lengths[row]
 
-    def text(self):  # pylint: disable=W0613
-        """Displayable text of search result. Shown as line in the search results dock
+    def positions(self, checkState=None):
+        """List of tuples (line, column, length) of all matches or of the matches with the checkState
         """
-        beforeMatch = self.wholeLine[:self.column].lstrip()
-        afterMatch = self.wholeLine[self.column + len(self.match.group(0)):].rstrip()
+        return [(line, column, length)
+                for line, column, length, state in zip(self.lines, self.columns, self.lengths, self.checkStates)
+                if checkState is None or state == checkState]
 
-        if QApplication.instance().palette().base().color().lightnessF() > 0.5:
-            backgroundColor = 'yellow'
-            foregroundColor = 'black'
+    def checkState(self):
+        """Checked state of the file. Depends on checked states of the matches
+        """
+        if self._checkedCount == len(self):
+            return Qt.Checked
+        elif self._checkedCount:
+            return Qt.PartiallyChecked
         else:
-            backgroundColor = 'maroon'
-            foregroundColor = 'white'
+            return Qt.Unchecked
+
+    def setCheckState(self, row, state):
+        """Set checked state of the match
+        """
+        self._checkedCount += (state == Qt.Checked) - (self.checkStates[row] == Qt.Checked)
+        self.checkStates[row] = state
+
+    def setCheckStateForAll(self, state):
+        """Set checked state of all matches
+        """
+        self.checkStates[:] = bytearray([state]) * len(self)
+        self._checkedCount = len(self) if state == Qt.Checked else 0
+
+    def removeRows(self, first, last):
+        """Remove matches from the first to the last row inclusive
+        """
+        self._checkedCount -= self.checkStates[first:last + 1].count(Qt.Checked)
+        for values in (self.lines, self.columns, self.lengths, self.checkStates):
+            del values[first:last + 1]
+
+    def text(self):
+        """Displayable text of the file results. Shown as line in the search results dock
+        baseDir is base directory of current search operation
+        """
+        if self._relativePath is None:
+            self._relativePath = QDir(self.baseDir).relativeFilePath(self.fileName)
+        return '%s (%d)' % (self._relativePath, len(self))
+
+    def resultText(self, row, backgroundColor, foregroundColor):
+        """Displayable text of the match. Shown as line in the search results dock
+        """
+        line, column, length = self.position(row)
+        wholeLine = self.lineTexts[line]
+        beforeMatch = wholeLine[:column].lstrip()
+        afterMatch = wholeLine[column + length:].rstrip()
 
         return '<html>' \
             'Line: %d, Column: %d: %s' \
             '<font style=\'background-color: %s; color: %s\'>%s</font>' \
             '%s' \
                '</html>' % \
-            (self.line + 1,
-             self.column,
+            (line + 1,
+             column,
              htmlEscape(beforeMatch),
              backgroundColor,
              foregroundColor,
-             htmlEscape(self.match.group(0)),
+             htmlEscape(wholeLine[column:column + length]),
              htmlEscape(afterMatch))
 
-    def tooltip(self):
-        """Tooltip of the search result"""
-        return self.wholeLine.strip()
-
-    def hasChildren(self):
-        """Check if QAbstractItem has children"""
-        return False
+    def resultTooltip(self, row):
+        """Tooltip of the match
+        """
+        return self.lineTexts[self.lines[row]].strip()
 
 
-class FileResults:
-    """Object stores all items, found in the file
+class _RowIndex:
+    """Binary indexed tree, which counts not removed slots.
+    Converts slots to rows and rows to slots in O(log n)
     """
 
-    def __init__(self, baseDir, fileName, results):
-        self.baseDir = baseDir
-        self.fileName = fileName
-        self.results = results
-        self.checkState = Qt.Checked
+    def __init__(self):
+        self._tree = [0]  # 1-based
+        self._count = 0
 
-    def __str__(self):
-        """Convertor to string. Used for debugging
+    def count(self):
+        """Count of not removed slots
         """
-        return '%s (%d)' % (self.fileName, len(self.results))
+        return self._count
 
-    def updateCheckState(self):
-        """Update own checked state after checked state of child result changed or
-        child result removed
+    def append(self):
+        """Add a slot. Returns the slot
         """
-        if all([res.checkState == Qt.Checked for res in self.results]):  # if all checked
-            self.checkState = Qt.Checked
-        elif any([res.checkState == Qt.Checked for res in self.results]):  # if any checked
-            self.checkState = Qt.PartiallyChecked
-        else:
-            self.checkState = Qt.Unchecked
-
-    def text(self):
-        """Displayable text of the file results. Shown as line in the search results dock
-        baseDir is base directory of current search operation
+        index = len(self._tree)
+        lowBit = index & -index
+        # the new node counts slots (index - lowBit, index]
+        self._tree.append(1 + self._prefix(index - 1) - self._prefix(index - lowBit))
+        self._count += 1
+        return index - 1
+
+    def remove(self, slot):
+        """Mark the slot removed
         """
-        return '%s (%d)' % (QDir(self.baseDir).relativeFilePath(self.fileName), len(self.results))
-
-    def tooltip(self):
-        """Tooltip of the item in the results dock
+        index = slot + 1
+        while index < len(self._tree):
+            self._tree[index] -= 1
+            index += index & -index
+        self._count -= 1
+
+    def row(self, slot):
+        """Row of the not removed slot
         """
-        return self.fileName
+        return self._prefix(slot)
 
-    def hasChildren(self):
-        """Check if item has children
+    def slot(self, row):
+        """Slot of the row
         """
-        return 0 != len(self.results)
+        index = 0
+        remaining = row + 1
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nextIndex = index + step
+            if nextIndex < len(self._tree) and self._tree[nextIndex] < remaining:
+                index = nextIndex
+                remaining -= self._tree[nextIndex]
+            step >>= 1
+        return index
+
+    def _prefix(self, count):
+        """Count of not removed slots among the first count slots
+        """
+        result = 0
+        while count > 0:
+            result += self._tree[count]
+            count -= count & -count
+        return result
 
 
 class SearchResultsModel(QAbstractItemModel):
     """AbstractItemodel used for display search results in 'Search in directory' and 'Replace in directory' mode
+
+    Top level items are files. Their internal pointer is None.
+    Internal pointer of a match item is FileResults of its file
     """
     firstResultsAvailable = pyqtSignal()
 
@@ -109,30 +208,38 @@ class SearchResultsModel(QAbstractItemModel):
         """
         QAbstractItemModel.__init__(self, parent)
         self._replaceMode = False
-
-        self.fileResults = []  # list of FileResults
+        self._reset()
+
+    def _reset(self):
+        self._fileResults = []  # FileResults by slots. None, if removed
+        self._fileSlots = {}  # file name: slot
+        self._rows = _RowIndex()
+        self._matchesCount = 0
+        self._displayCache = {}  # (slot, line, column): displayable text
+        self._matchColors = None
+
+    def fileResultsAt(self, row):
+        """FileResults of the top level row
+        """
+        return self._fileResults[self._rows.slot(row)]
 
     def setReplaceMode(self, enabled):
         """When replace mode is enabled, all items are checkState
         """
         self._replaceMode = enabled
-        if self.fileResults:
-            self.dataChanged.emit(self.index(0, 0, QModelIndex()),
-                                  self.index(len(self.fileResults) - 1,
-                                             len(self.fileResults[-1].results) - 1,
-                                             QModelIndex()))
+        if self._rows.count():
+            self.layoutChanged.emit()  # repaint checkboxes of the matches
 
     def index(self, row, column, parent):
         """See QAbstractItemModel docs
         """
-        if row >= self.rowCount(parent) or column > self.columnCount(parent):
+        if row < 0 or row >= self.rowCount(parent) or column != 0:
             return QModelIndex()
 
         if parent.isValid():  # index for result
-            result = parent.internalPointer().results[row]
-            return self.createIndex(row, column, result)
+            return self.createIndex(row, column, self.fileResultsAt(parent.row()))
         else:  # need index for fileRes
-            return self.createIndex(row, column, self.fileResults[row])
+            return self.createIndex(row, column, None)
 
     def parent(self, index):
         """See QAbstractItemModel docs
@@ -140,24 +247,19 @@ class SearchResultsModel(QAbstractItemModel):
         if not index.isValid():
             return QModelIndex()
 
-        if not isinstance(index.internalPointer(), Result):  # it is an top level item
+        fileRes = index.internalPointer()
+        if fileRes is None:  # it is an top level item
             return QModelIndex()
 
-        result = index.internalPointer()
-        for row, fileRes in enumerate(self.fileResults):
-            if fileRes.fileName == result.fileName:
-                return self.createIndex(row, 0, fileRes)
-        else:
-            assert(0)
+        return self.createIndex(self._rows.row(fileRes.slot), 0, None)
 
     def hasChildren(self, item):
         """See QAbstractItemModel docs
         """
-        # root parents
         if item.isValid():
-            return item.internalPointer().hasChildren()
+            return item.internalPointer() is None  # files always have matches
         else:
-            return len(self.fileResults) != 0
+            return self._rows.count() != 0
 
     def columnCount(self, parent):  # pylint: disable=W0613
         """See QAbstractItemModel docs
@@ -168,20 +270,18 @@ class SearchResultsModel(QAbstractItemModel):
         """See QAbstractItemModel docs
         """
         if not parent.isValid():  # root elements
-            return len(self.fileResults)
-        elif isinstance(parent.internalPointer(), Result):  # result
+            return self._rows.count()
+        elif parent.internalPointer() is None:  # file
+            return len(self.fileResultsAt(parent.row()))
+        else:  # result
             return 0
-        elif isinstance(parent.internalPointer(), FileResults):  # file
-            return len(parent.internalPointer().results)
-        else:
-            assert(0)
 
     def flags(self, index):
         """See QAbstractItemModel docs
         """
         flags = QAbstractItemModel.flags(self, index)
 
-        if self._replaceMode:
+        if self._replaceMode and index.isValid():
             flags |= Qt.ItemIsUserCheckable
 
         return flags
@@ -192,115 +292,194 @@ class SearchResultsModel(QAbstractItemModel):
         if not index.isValid():
             return None
 
-        # Common code for file and result
-        result = index.internalPointer()
-        if role == Qt.DisplayRole:
-            return result.text()
-        elif role == Qt.ToolTipRole:
-            return result.tooltip()
-        elif role == Qt.CheckStateRole:
-            if self.flags(index) & Qt.ItemIsUserCheckable:
-                return result.checkState
+        fileRes = index.internalPointer()
+        if fileRes is None:  # file
+            fileRes = self.fileResultsAt(index.row())
+            if role == Qt.DisplayRole:
+                return fileRes.text()
+            elif role == Qt.ToolTipRole:
+                return fileRes.fileName
+            elif role == Qt.CheckStateRole:
+                if self.flags(index) & Qt.ItemIsUserCheckable:
+                    return fileRes.checkState()
+        else:  # result
+            if role == Qt.DisplayRole:
+                return self._resultText(fileRes, index.row())
+            elif role == Qt.ToolTipRole:
+                return fileRes.resultTooltip(index.row())
+            elif role == Qt.CheckStateRole:
+                if self.flags(index) & Qt.ItemIsUserCheckable:
+                    return fileRes.checkStates[index.row()]
 
         return None
 
+    def _resultText(self, fileRes, row):
+        """Get displayable text of the match from the cache or build it
+        """
+        line, column, length = fileRes.position(row)
+        key = (fileRes.slot, line, column)
+        text = self._displayCache.get(key)
+        if text is None:
+            if self._matchColors is None:
+                if QApplication.instance().palette().base().color().lightnessF() > 0.5:
+                    self._matchColors = ('yellow', 'black')
+                else:
+                    self._matchColors = ('maroon', 'white')
+
+            if len(self._displayCache) >= _DISPLAY_CACHE_SIZE:
+                self._displayCache.clear()
+            text = fileRes.resultText(row, *self._matchColors)
+            self._displayCache[key] = text
+        return text
+
     def setData(self, index, value, role):
         """See QAbstractItemModel docs
         This method changes checked state of the item.
         If file unchecked - we need uncheck all items,
         if item unchecked...
         """
-        if isinstance(index.internalPointer(), Result):  # it is a Result
-            if role == Qt.CheckStateRole:
-                # update own state
-                index.internalPointer().checkState = value
-                self.dataChanged.emit(index, index)  # own checked state changed
-                # update parent state
-                fileRes = index.parent().internalPointer()
-                assert(isinstance(fileRes, FileResults))
-                fileRes.updateCheckState()
-                self.dataChanged.emit(index.parent(), index.parent())  # parent checked state might be changed
-        elif isinstance(index.internalPointer(), FileResults):  # it is a FileResults
-            if role == Qt.CheckStateRole:
-                fileRes = index.internalPointer()
-                fileRes.checkState = value
-                for res in fileRes.results:
-                    res.checkState = value
-                firstChildIndex = self.index(0, 0, index)
-                lastChildIndex = self.index(len(fileRes.results) - 1, 0, index)
-                self.dataChanged.emit(firstChildIndex, lastChildIndex)
-        else:
-            assert(0)
+        if role != Qt.CheckStateRole:
+            return False
+
+        fileRes = index.internalPointer()
+        if fileRes is not None:  # it is a result
+            fileRes.setCheckState(index.row(), value)
+            self.dataChanged.emit(index, index)  # own checked state changed
+            self.dataChanged.emit(index.parent(), index.parent())  # parent checked state might be changed
+        else:  # it is a file
+            fileRes = self.fileResultsAt(index.row())
+            fileRes.setCheckStateForAll(value)
+            firstChildIndex = self.index(0, 0, index)
+            lastChildIndex = self.index(len(fileRes) - 1, 0, index)
+            self.dataChanged.emit(index, index)
+            self.dataChanged.emit(firstChildIndex, lastChildIndex)
         return True
 
     def setCheckStateForAll(self, state):
         """Check all items
         """
-        for fileRes in self.fileResults:
-            fileRes.checkState = state
-            for match in fileRes.results:
-                match.checkState = state
-        self.dataChanged.emit(self.createIndex(0, 0, self.fileResults[0]),
-                              self.createIndex(len(self.fileResults) - 1, 0, self.fileResults[-1]))
+        for fileRes in self._fileResults:
+            if fileRes is not None:
+                fileRes.setCheckStateForAll(state)
+        self.dataChanged.emit(self.index(0, 0, QModelIndex()),
+                              self.index(self._rows.count() - 1, 0, QModelIndex()))
 
     def isFirstMatchChecked(self):
-        """Check if first file in the search results is expanded
+        """Check if first match in the search results is checked
+        """
+        return self.fileResultsAt(0).checkStates[0] == Qt.Checked
+
+    def checkedPositions(self):
+        """Get checked matches as dictionary {file name : list of tuples (line, column, length)}
         """
-        file = self.index(0, 0, QModelIndex())
-        match = file.child(0, 0)
-        return match.data(Qt.CheckStateRole) == Qt.Checked
+        items = {}
+        for fileRes in self._fileResults:
+            if fileRes is not None:
+                positions = fileRes.positions(Qt.Checked)
+                if positions:
+                    items[fileRes.fileName] = positions
+        return items
 
     def clear(self):
         """Clear all results
         """
-        self.beginRemoveRows(QModelIndex(), 0, len(self.fileResults) - 1)
-        self.fileResults = []
-        self.endRemoveRows()
+        self.beginResetModel()
+        self._reset()
+        self.endResetModel()
 
     def appendResults(self, fileResultList):
         """Handler of signal from the search thread.
         New result is available, add it to the model
         """
-        if not self.fileResults:  # appending first
+        if not fileResultList:
+            return
+
+        if not self._rows.count():  # appending first
             self.firstResultsAvailable.emit()
-        self.beginInsertRows(QModelIndex(),
-                             len(self.fileResults),
-                             len(self.fileResults) + len(fileResultList) - 1)
-        self.fileResults.extend(fileResultList)
+        count = self._rows.count()
+        self.beginInsertRows(QModelIndex(), count, count + len(fileResultList) - 1)
+        for fileRes in fileResultList:
+            fileRes.slot = self._rows.append()
+            self._fileResults.append(fileRes)
+            self._fileSlots[fileRes.fileName] = fileRes.slot
+            self._matchesCount += len(fileRes)
         self.endInsertRows()
 
-    def onResultsHandledByReplaceThread(self, fileName, results):
-        """Replace thread has processed result, need to it from the model
+    def sortResults(self):
+        """Sort files by path. Slots are assigned again in the sorted order
         """
-        for index, fileRes in enumerate(self.fileResults):  # try to find FileResults
-            if fileRes.fileName == fileName:  # found
-                fileResIndex = self.createIndex(index, 0, fileRes)
-                if len(results) == len(fileRes.results):  # removing all
-                    self.beginRemoveRows(QModelIndex(), index, index)
-                    self.fileResults.pop(index)
-                    self.endRemoveRows()
-                else:
-                    for res in results:
-                        resIndex = fileRes.results.index(res)
-                        self.beginRemoveRows(fileResIndex, resIndex, resIndex)
-                        fileRes.results.pop(resIndex)
-                        self.endRemoveRows()
-                    if not fileRes.results:  # no results left
-                        self.beginRemoveRows(QModelIndex(), index, index)
-                        self.fileResults.pop(index)
-                        self.endRemoveRows()
-                    else:
-                        fileRes.updateCheckState()
-                return
-        else:  # not found
-            assert(0)
+        fileResults = [fileRes for fileRes in self._fileResults if fileRes is not None]  # in order of rows
+        sortedFileResults = sorted(fileResults, key=lambda fileRes: fileRes.fileName)
+        if sortedFileResults == fileResults:
+            return
+
+        self.layoutAboutToBeChanged.emit()
+
+        self._fileResults = sortedFileResults
+        self._fileSlots = {}
+        self._rows = _RowIndex()
+        self._displayCache = {}  # keys contain slots
+        for fileRes in sortedFileResults:
+            fileRes.slot = self._rows.append()
+            self._fileSlots[fileRes.fileName] = fileRes.slot
+
+        oldIndexes = self.persistentIndexList()
+        newIndexes = []
+        for index in oldIndexes:
+            if index.internalPointer() is None:  # file. Rows of the matches are not changed
+                newRow = fileResults[index.row()].slot
+                newIndexes.append(self.createIndex(newRow, index.column(), None))
+            else:
+                newIndexes.append(index)
+        self.changePersistentIndexList(oldIndexes, newIndexes)
+
+        self.layoutChanged.emit()
+
+    def onResultsHandledByReplaceThread(self, fileName, positions):
+        """Replace thread has processed the matches, need to remove them from the model.
+        positions is a list of tuples (line, column, length)
+        """
+        slot = self._fileSlots.get(fileName)
+        if slot is None:
+            return
+
+        fileRes = self._fileResults[slot]
+        fileRow = self._rows.row(slot)
+        positions = set(positions)
+        removedRows = [row for row in range(len(fileRes)) if fileRes.position(row) in positions]
+
+        if len(removedRows) == len(fileRes):  # removing all
+            self.beginRemoveRows(QModelIndex(), fileRow, fileRow)
+            self._rows.remove(slot)
+            self._fileResults[slot] = None
+            del self._fileSlots[fileName]
+            self._matchesCount -= len(fileRes)
+            self.endRemoveRows()
+            return
+
+        # Remove ranges of neighbour rows, starting from the end, so that the rows of the ranges are not changed
+        fileResIndex = self.createIndex(fileRow, 0, None)
+        ranges = []
+        for row in removedRows:
+            if ranges and ranges[-1][1] == row - 1:
+                ranges[-1][1] = row
+            else:
+                ranges.append([row, row])
+
+        for first, last in reversed(ranges):
+            self.beginRemoveRows(fileResIndex, first, last)
+            fileRes.removeRows(first, last)
+            self._matchesCount -= last - first + 1
+            self.endRemoveRows()
+
+        self.dataChanged.emit(fileResIndex, fileResIndex)  # count and checked state changed
 
     def matchesCount(self):
         """Get count of matches, stored by the model
         """
-        return sum([len(fileRes.results) for fileRes in self.fileResults])
+        return self._matchesCount
 
     def empty(self):
         """Check if have some items
         """
-        return len(self.fileResults) == 0
+        return self._rows.count() == 0
@@ -109,9 +109,18 @@ class SearchWidget(QFrame):
     **Signal** emitted, when 'Replace All' had been pressed
     """  # pylint: disable=W0105
 
+    replaceFileAllStopPressed = pyqtSignal()
+    """
+    replaceFileAllStopPressed()
+
+    **Signal** emitted, when 'Replace All' had been pressed while replacing all
+    """  # pylint: disable=W0105
+
     def __init__(self, plugin):
         QFrame.__init__(self, core.workspace())
         self._mode = None
+        self._replaceFileAllInProgress = False
+        self._searchInFileActionsEnabled = True
         self.plugin = plugin
         uic.loadUi(os.path.join(os.path.dirname(__file__), 'SearchWidget.ui'), self)
 
@@ -521,11 +530,34 @@ class SearchWidget(QFrame):
         self.pbReplaceChecked.setVisible(not inProgress)
         self._updateWidgets()
 
+    def setReplaceFileAllInProgress(self, inProgress):
+        """Replace all in the file started or stopped.
+        While replacing, the progress is shown, and the 'Replace All' button stops replacing
+        """
+        if inProgress == self._replaceFileAllInProgress:
+            return
+
+        self._replaceFileAllInProgress = inProgress
+        self.pbReplaceAll.setEnabled(self._searchInFileActionsEnabled or inProgress)
+        if inProgress:
+            self._replaceAllText = self.pbReplaceAll.text()
+            self.pbReplaceAll.setText(self.tr("Stop"))
+            self._progress.setToolTip(self.tr("Replace in progress..."))
+            self._progress.setValue(0)
+            self._progress.setMaximum(0)
+        else:
+            self.pbReplaceAll.setText(self._replaceAllText)
+            self._progress.setToolTip(self.tr("Search in progress..."))
+        self._progress.setVisible(inProgress)
+
     def setSearchInFileActionsEnabled(self, enabled):
-        """Set enabled state for Next, Prev, Replace, ReplaceAll
+        """Set enabled state for Next, Prev, Replace, ReplaceAll.
+        ReplaceAll is kept enabled while replacing, because it stops replacing
         """
-        for button in (self.pbNext, self.pbPrevious, self.pbReplace, self.pbReplaceAll):
+        self._searchInFileActionsEnabled = enabled
+        for button in (self.pbNext, self.pbPrevious, self.pbReplace):
             button.setEnabled(enabled)
+        self.pbReplaceAll.setEnabled(enabled or self._replaceFileAllInProgress)
 
     def _onSearchRegExpChanged(self):
         """User edited search text or checked/unchecked checkboxes
@@ -571,7 +603,10 @@ class SearchWidget(QFrame):
     def on_pbReplaceAll_pressed(self):
         """Handler of click on "Replace all" (in file) button
         """
-        self.replaceFileAll.emit(self.cbReplace.currentText())
+        if self._replaceFileAllInProgress:
+            self.replaceFileAllStopPressed.emit()
+        else:
+            self.replaceFileAll.emit(self.cbReplace.currentText())
 
     def on_pbReplaceChecked_pressed(self):
         """Handler of click on "Replace checked" (in directory) button
@@ -5,29 +5,37 @@ threads --- Search and Replace threads
 This threads are used for asynchronous search and replace
 """
 
+import collections
+import functools
+import multiprocessing
+import os
 import os.path
+import queue
 import re
+import threading
 import time
 import fnmatch
 
 from PyQt5.QtCore import pyqtSignal, QThread
 
 from enki.core.core import core
+from enki.lib import ignorefiles
+from . import replaceengine
+from . import searchengine
 from . import searchresultsmodel
-from . import substitutions
+from . import trigramindex
 
 
-def _isBinary(fileObject):
-    """Expects, that file position is 0, when exits, file position is 0
-    """
-    binary = b'\0' in fileObject.read(4096)
-    fileObject.seek(0)
-    return binary
+# Workers are started with a fresh interpreter. Forking the multithreaded Qt process is not safe,
+# and frozen Windows builds support only this method
+_poolContext = multiprocessing.get_context('spawn')
 
 
 class StopableThread(QThread):
     """Stoppable thread class. Used as base for search and replace thread.
     """
+    STOP_CHECK_TIMEOUT = 0.1
+
     _exit = False
 
     def __init__(self):
@@ -46,19 +54,69 @@ class StopableThread(QThread):
         self._exit = False
         QThread.start(self)
 
+    def _readPoolSettings(self):
+        """Read settings of the worker processes pool. Called in the GUI thread
+        """
+        settings = core.config()['SearchReplace']
+        self._processCount = settings['Processes'] or os.cpu_count() or 1
+        self._filesPerChunk = settings['FilesPerChunk']
+
+    def _usePool(self, files):
+        """Check if files shall be processed with a pool of worker processes
+        """
+        return self._processCount > 1 and len(files) > self._filesPerChunk
+
+    def _mapInPool(self, func, files):
+        """Generator. Split files to chunks and process it with a pool of worker processes.
+        Yields results of func(chunk) in order of chunks completion.
+        Stops promptly, when the thread is stopped
+        """
+        chunks = [files[i:i + self._filesPerChunk]
+                  for i in range(0, len(files), self._filesPerChunk)]
+
+        pool = _poolContext.Pool(min(self._processCount, len(chunks)))
+        try:
+            chunkResults = pool.imap_unordered(func, chunks)
+            for chunk in chunks:  # the order of chunks doesn't matter, just count it
+                while not self._exit:
+                    try:
+                        result = chunkResults.next(self.STOP_CHECK_TIMEOUT)
+                    except multiprocessing.TimeoutError:
+                        continue
+                    else:
+                        break
+
+                if self._exit:
+                    return
+
+                yield len(chunk), result
+        finally:
+            pool.terminate()  # stops the workers immediately, if the thread has been stopped
+            pool.join()
+
 
 class SearchThread(StopableThread):
-    """Thread builds list of files for search and than searches in this files.append
+    """Thread searches in the files, while a walker thread builds list of files.
+
+    Opened documents are searched first. Other files are searched as soon as the walker finds them.
+    If a pool of worker processes is enabled, the first files are searched by this thread
+    to show the first results quickly, the next chunks of files are searched by the pool.
+
+    Results come in order of the search. The model sorts them, when the search is finished
     """
     RESULTS_EMIT_TIMEOUT = 1.0
+    # Results are emitted more often during the first RESULTS_EMIT_TIMEOUT of the search
+    FIRST_RESULTS_EMIT_TIMEOUT = 0.05
 
     resultsAvailable = pyqtSignal(list)  # list of searchresultsmodel.FileResults
     progressChanged = pyqtSignal(int, int)  # int value, int total
     error = pyqtSignal(str)
 
-    def search(self, regExp, mask, inOpenedFiles, searchPath):
+    def search(self, regExp, mask, inOpenedFiles, searchPath, searchIndex=None, metadataCache=None):
         """Start search process.
-        context stores search text, directory and other parameters
+        context stores search text, directory and other parameters.
+        searchIndex is trigramindex.TrigramIndex, which is used to skip not matching files, or None.
+        metadataCache is projectcache.FileMetadataCache, which is used to skip binary files, or None
         """
         self.stop()
 
@@ -66,61 +124,108 @@ class SearchThread(StopableThread):
         self._mask = mask
         self._inOpenedFiles = inOpenedFiles
         self._searchPath = searchPath
+        self._searchIndex = searchIndex
+        self._metadataCache = metadataCache
 
         self._openedFiles = {}
-        for document in core.workspace().documents():
+        documents = list(core.workspace().documents())
+        currentDocument = core.workspace().currentDocument()
+        if currentDocument in documents:  # the current document is searched first
+            documents.remove(currentDocument)
+            documents.insert(0, currentDocument)
+        for document in documents:
             if document.filePath() is not None:
                 self._openedFiles[document.filePath()] = document.qutepart.text
 
+        self._readPoolSettings()
+
         self.start()
 
-    def _getFiles(self, path, maskRegExp, filterRegExp):
-        """Get recursive list of files from directory.
-        maskRegExp is regExp object for check if file matches mask
+    def _walkFiles(self, absPath, maskRegExp, filterMatcher, rootRules):
+        """Generator. Walk the directory recursively and yield lists of files of every directory.
+        maskRegExp is regExp object for check if file matches mask.
+        If rootRules is not None, files and directories, ignored by .gitignore and .ignore files, are skipped.
+        See ignorefiles.rulesForTree()
         """
-        retFiles = []
+        # Ignore rules of the directories, which will be walked
+        dirRules = {absPath: rootRules} if rootRules is not None else {}
 
-        try:
-            absPath = os.path.abspath(path)
-        except OSError:  # current dir deleted
-            return []
+        for root, dirs, files in os.walk(absPath, followlinks=True):  # pylint: disable=W0612
+            if root.startswith('.') or (os.path.sep + '.') in root:
+                continue
 
-        try:
-            for root, dirs, files in os.walk(absPath, followlinks=True):  # pylint: disable=W0612
-                if root.startswith('.') or (os.path.sep + '.') in root:
+            # remove not interesting directories
+            for dirname in dirs[:]:
+                if filterMatcher.match(dirname):
+                    dirs.remove(dirname)
+
+            rules = dirRules.pop(root, None)
+            if rules is not None:
+                relRoot = os.path.relpath(root, absPath)
+                if relRoot == os.curdir:
+                    relRoot = ''
+                rules = rules.forDirectory(relRoot, root, files)
+                if not rules.isEmpty():
+                    dirs[:] = [dirname for dirname in dirs
+                               if not rules.isIgnored(os.path.join(relRoot, dirname), True)]
+                    files = [fileName for fileName in files
+                             if not rules.isIgnored(os.path.join(relRoot, fileName), False)]
+                for dirname in dirs:
+                    dirRules[os.path.join(root, dirname)] = rules
+
+            foundFiles = []
+            for fileName in files:
+                if fileName.startswith('.'):
+                    continue
+                if maskRegExp and not maskRegExp.match(fileName):
                     continue
 
-                # remove not interesting directories
-                for dirname in dirs[:]:
-                    if filterRegExp.match(dirname):
-                        dirs.remove(dirname)
+                if filterMatcher.match(fileName):
+                    continue
 
-                for fileName in files:
-                    if fileName.startswith('.'):
-                        continue
-                    if maskRegExp and not maskRegExp.match(fileName):
-                        continue
+                fullPath = os.path.join(root, fileName)
+                if not os.path.isfile(fullPath):
+                    continue
+                foundFiles.append(fullPath)
 
-                    if filterRegExp.match(fileName):
-                        continue
+            if foundFiles:
+                yield foundFiles
 
-                    fullPath = os.path.join(root, fileName)
-                    if not os.path.isfile(fullPath):
-                        continue
-                    retFiles.append(root + os.path.sep + fileName)
+            if self._exit:
+                break
 
-                if self._exit:
-                    break
+    def _isWalkedFile(self, fileName, absPath, maskRegExp, filterMatcher, rootRules):
+        """Check if the walker lists the file. Used to search opened documents before the walker finds them
+        """
+        relPath = os.path.relpath(fileName, absPath)
+        if relPath.startswith(os.pardir) or os.path.isabs(relPath):
+            return False
+
+        parts = relPath.split(os.sep)
+        if maskRegExp and not maskRegExp.match(parts[-1]):
+            return False
+        if any(part.startswith('.') or filterMatcher.match(part) for part in parts):
+            return False
+        if not os.path.isfile(fileName):
+            return False
+        return rootRules is None or not ignorefiles.isPathIgnored(rootRules, absPath, relPath)
+
+    def _walk(self, fileQueue, absPath, maskRegExp, filterMatcher, rootRules):
+        """Walker thread. Puts lists of found files to the queue, and None, when finished
+        """
+        try:
+            for files in self._walkFiles(absPath, maskRegExp, filterMatcher, rootRules):
+                fileQueue.put(files)
         except UnicodeDecodeError:  # from os.walk()
             self.error.emit('Failed to build list of files. Unicode decode error. Is correct locale set?')
-            return []
-
-        return retFiles
+        finally:
+            fileQueue.put(None)
 
-    def _getFilesToScan(self):
-        """Get list of files for search.
+    def run(self):
+        """Start point of the code, running in thread.
+        Start the walker thread and search in the files, which it finds
         """
-        files = set()
+        self.progressChanged.emit(-1, 0)
 
         if self._mask:
             regExPatterns = [fnmatch.translate(pat) for pat in self._mask]
@@ -129,122 +234,219 @@ class SearchThread(StopableThread):
         else:
             maskRegExp = None
 
+        self._metadata = {}
+        if self._metadataCache is not None:
+            if not self._metadataCache.isLoaded():
+                self._metadataCache.load()
+            self._metadata = self._metadataCache.entries()
+        self._newMetadata = []
+
+        self._searchStartTime = time.time()
+        self._lastResultsEmitTime = 0  # the first results are emitted immediately
+        self._notEmittedFileResults = []
+        self._processedCount = 0
+        self._totalCount = 0
+
         if self._inOpenedFiles:
             files = iter(self._openedFiles.keys())
             if maskRegExp:
                 basenames = [os.path.basename(f) for f in files]
                 files = [f for f in basenames if maskRegExp.match(f)]
-            return files
+            files = list(files)
+            self._totalCount = len(files)
+            self._searchInFiles(files)
         else:
-            path = self._searchPath
-            return self._getFiles(path, maskRegExp, core.fileFilter().regExp())
+            self._searchInDirectory(maskRegExp)
+
+        if self._notEmittedFileResults:
+            self.progressChanged.emit(self._processedCount, self._totalCount)
+            self.resultsAvailable.emit(self._notEmittedFileResults)
 
-    def _fileContent(self, fileName):
-        """Read text from file
+        if self._metadataCache is not None:
+            entries = self._metadataCache.updatedEntries(self._newMetadata)
+            if entries is not None:
+                self._metadataCache.setEntries(entries)
+                self._metadataCache.save()
+
+    def _searchInDirectory(self, maskRegExp):
+        """Search opened documents, than files, which the walker thread finds
         """
-        if fileName in self._openedFiles:
-            return self._openedFiles[fileName]
+        try:
+            absPath = os.path.abspath(self._searchPath)
+        except OSError:  # current dir deleted
+            return
+
+        filterMatcher = core.fileFilter().matcher()
+        rootRules = ignorefiles.rulesForTree(absPath) if core.fileFilter().useIgnoreFiles() else None
+
+        fileQueue = queue.Queue()
+        walker = threading.Thread(target=self._walk,
+                                  args=(fileQueue, absPath, maskRegExp, filterMatcher, rootRules),
+                                  daemon=True)
+        walker.start()
 
         try:
-            with open(fileName, 'rb') as openedFile:
-                if _isBinary(openedFile):
-                    return ''
-                return str(openedFile.read(), 'utf8', errors='ignore')
-        except IOError as ex:
-            print(ex)
-            return ''
+            # opened files are searched here, because their text is available only in this process
+            openedFiles = [fileName
+                           for fileName in self._openedFiles
+                           if self._isWalkedFile(fileName, absPath, maskRegExp, filterMatcher, rootRules)]
+            self._totalCount += len(openedFiles)
+            self._searchInFiles(openedFiles)
+
+            self._searchWalkedFiles(fileQueue)
+        finally:
+            walker.join()
+
+    def _walkedFiles(self, fileQueue, timeout):
+        """Get list of the files, found by the walker, which shall be searched.
+        Returns None, when the walker has finished
+        """
+        try:
+            files = fileQueue.get(timeout=timeout)
+        except queue.Empty:
+            return []
 
-    def run(self):
-        """Start point of the code, running in thread.
-        Build list of files for search, than do search
+        if files is None:
+            return None
+
+        files = [fileName
+                 for fileName in files
+                 if fileName not in self._openedFiles]
+        if self._searchIndex is not None:
+            # opened files are always searched, because their text might be not saved yet
+            files = self._searchIndex.filterFiles(files, self._regExp, lambda: self._exit)
+
+        self._totalCount += len(files)
+        return files
+
+    def _searchWalkedFiles(self, fileQueue):
+        """Search in the files as soon as the walker finds them.
+        Not more than _filesPerChunk files are searched in this thread, if the pool is enabled
         """
-        self.progressChanged.emit(-1, 0)
+        searchFunc = functools.partial(searchengine.searchInFiles, self._regExp)
+        pool = None
+        pending = collections.deque()  # (chunk length, AsyncResult)
+        chunk = []
+        walkFinished = False
 
-        files = sorted(self._getFilesToScan())
+        try:
+            while not self._exit and (not walkFinished or chunk or pending):
+                if not walkFinished:
+                    # Don't wait for the walker, if the pool has found something
+                    timeout = self.STOP_CHECK_TIMEOUT if not (pending and pending[0][1].ready()) else 0
+                    files = self._walkedFiles(fileQueue, timeout)
+                    if files is None:
+                        walkFinished = True
+                    else:
+                        chunk += files
+
+                if chunk and \
+                   (self._processCount == 1 or self._processedCount < self._filesPerChunk):
+                    self._searchInFiles(chunk)
+                    chunk = []
+                elif chunk and (walkFinished or len(chunk) >= self._filesPerChunk):
+                    if pool is None:
+                        pool = _poolContext.Pool(self._processCount)
+                    items = [(fileName, self._metadata.get(fileName))
+                             for fileName in chunk[:self._filesPerChunk]]
+                    pending.append((len(items), pool.apply_async(searchFunc, (items,))))
+                    chunk = chunk[self._filesPerChunk:]
+
+                while pending and \
+                      (pending[0][1].ready() or (walkFinished and not chunk)):
+                    chunkLength, asyncResult = pending.popleft()
+                    while not asyncResult.ready() and not self._exit:
+                        asyncResult.wait(self.STOP_CHECK_TIMEOUT)
+                    if self._exit:
+                        break
+                    self._onFoundInPool(chunkLength, *asyncResult.get())
+        finally:
+            if pool is not None:
+                pool.terminate()  # stops the workers immediately, if the thread has been stopped
+                pool.join()
 
         if self._exit:
-            return
+            self.progressChanged.emit(self._processedCount, self._totalCount)
 
-        self.progressChanged.emit(0, len(files))
-
-        # Prepare data for search process
-        lastResultsEmitTime = time.clock()
-        notEmittedFileResults = []
-        # Search for all files
-        for fileIndex, fileName in enumerate(files):
-            results = self._searchInFile(fileName)
-            if results:
-                newFileRes = searchresultsmodel.FileResults(self._searchPath,
-                                                            fileName,
-                                                            results)
-                notEmittedFileResults.append(newFileRes)
-
-            if notEmittedFileResults and \
-               (time.clock() - lastResultsEmitTime) > self.RESULTS_EMIT_TIMEOUT:
-                self.progressChanged.emit(fileIndex, len(files))
-                self.resultsAvailable.emit(notEmittedFileResults)
-                notEmittedFileResults = []
-                lastResultsEmitTime = time.clock()
+    def _searchInFiles(self, files):
+        """Search in the files in this thread
+        """
+        for fileName in files:
+            if fileName in self._openedFiles:
+                matches = searchengine.searchInText(self._regExp,
+                                                    self._openedFiles[fileName],
+                                                    lambda: self._exit)
+            else:
+                matches, metadata = searchengine.searchInFileWithMetadata(self._regExp,
+                                                                          fileName,
+                                                                          self._metadata.get(fileName),
+                                                                          lambda: self._exit)
+                self._newMetadata.append((fileName, metadata))
+            if matches:
+                self._notEmittedFileResults.append(self._makeFileResults(fileName, matches))
+
+            self._processedCount += 1
+            self._emitResults()
 
             if self._exit:
-                self.progressChanged.emit(fileIndex, len(files))
+                self.progressChanged.emit(self._processedCount, self._totalCount)
                 break
 
-        if notEmittedFileResults:
-            self.resultsAvailable.emit(notEmittedFileResults)
+    def _onFoundInPool(self, chunkLength, found, metadata):
+        """Account results of searchengine.searchInFiles(), executed by the pool
+        """
+        for fileName, matches in found:
+            self._notEmittedFileResults.append(self._makeFileResults(fileName, matches))
+        self._newMetadata.extend(metadata)
 
-    def _searchInFile(self, fileName):
-        """Search in the file and return searchresultsmodel.Result s
+        self._processedCount += chunkLength
+        self._emitResults()
+
+    def _emitResults(self):
+        """Emit found results, if RESULTS_EMIT_TIMEOUT passed since the last emit.
+        FIRST_RESULTS_EMIT_TIMEOUT is used at the beginning of the search
         """
-        lastPos = 0
-        eolCount = 0
-        results = []
-        eol = "\n"
-
-        content = self._fileContent(fileName)
-
-        # Process result for all occurrences
-        for match in self._regExp.finditer(content):
-            start = match.start()
-
-            eolStart = content.rfind(eol, 0, start)
-            eolEnd = content.find(eol, start + len(match.group(0)))
-            eolCount += content[lastPos:start].count(eol)
-            lastPos = start
-
-            wholeLine = content[eolStart + 1: eolEnd]
-            column = start - eolStart
-            if eolStart != 0:
-                column -= 1
-
-            result = searchresultsmodel.Result(fileName=fileName,
-                                               wholeLine=wholeLine,
-                                               line=eolCount,
-                                               column=column,
-                                               match=match)
-            results.append(result)
+        now = time.time()
+        if now - self._searchStartTime < self.RESULTS_EMIT_TIMEOUT:
+            emitTimeout = self.FIRST_RESULTS_EMIT_TIMEOUT
+        else:
+            emitTimeout = self.RESULTS_EMIT_TIMEOUT
 
-            if self._exit:
-                break
-        return results
+        if self._notEmittedFileResults and \
+           (now - self._lastResultsEmitTime) > emitTimeout:
+            self.progressChanged.emit(self._processedCount, self._totalCount)
+            self.resultsAvailable.emit(self._notEmittedFileResults)
+            self._notEmittedFileResults = []
+            self._lastResultsEmitTime = now
+
+    def _makeFileResults(self, fileName, matches):
+        """Make searchresultsmodel.FileResults from the searchengine matches
+        """
+        return searchresultsmodel.FileResults(self._searchPath, fileName, matches)
 
 
 class ReplaceThread(StopableThread):
     """Thread does replacements in the directory according to checked items
 
-    Replacements in opened documents are done by GUI thread, in other - by new thread
+    Replacements in opened documents are done by GUI thread, in other - by new thread.
+    Not opened files are processed by a pool of worker processes, if the list of files is long enough
     """
     resultsHandled = pyqtSignal(str, list)
     finalStatus = pyqtSignal(str)
     error = pyqtSignal(str)
 
-    def replace(self, results, replaceText):
-        """Run replace process
+    def replace(self, results, regExp, replaceText):
+        """Run replace process.
+        results is a dictionary {file name : list of tuples (line, column, length)}.
+        regExp is the regular expression, which has been used to find the results
         """
         self.stop()
 
+        self._regExp = regExp
         self._replaceText = replaceText
-        self._totalCount = sum([len(v) for v in results.values()])
+        self._replacedCount = 0
+        self._replacedFileCount = 0
+        self._writtenBytes = 0
 
         # do replacements in opened files, prepare for replacing in not opened
         self._results = {}
@@ -256,86 +458,221 @@ class ReplaceThread(StopableThread):
             else:
                 self._results[filePath] = matches
 
+        self._readPoolSettings()
+
         self.start()
 
     def _replaceInOpenedDocument(self, document, matches):
         """Do replacements in opened document
         """
-        pos = document.qutepart.cursorPosition
-        oldText = document.qutepart.text
-        document.qutepart.text = self._doReplacements(document.qutepart.text, matches)
-        if oldText != document.qutepart.text:
+        text, replacedCount, skippedCount = replaceengine.replaceInText(self._regExp,
+                                                                         self._replaceText,
+                                                                         document.qutepart.text,
+                                                                         matches)
+        if skippedCount:
+            self.error.emit(self.tr("%d match(es) not replaced in %s: file has been modified after search" %
+                                    (skippedCount, document.filePath())))
+        if replacedCount:
+            pos = document.qutepart.cursorPosition
+            document.qutepart.text = text
             document.qutepart.document().setModified(True)
-        document.qutepart.cursorPosition = pos
+            document.qutepart.cursorPosition = pos
+            self._replacedCount += replacedCount
+            self._replacedFileCount += 1
 
-    def _saveContent(self, fileName, content):
-        """Write text to the file
+    def run(self):
+        """Start point of the code, running i thread
+        Does thread job
         """
-        try:
-            content = content.encode('utf8')
-        except UnicodeEncodeError as ex:
-            pattern = self.tr("Failed to encode file to utf8: %s")
-            text = str(ex)
-            self.error.emit(pattern % text)
-            return
+        startTime = time.perf_counter()
 
-        try:
-            with open(fileName, 'wb') as openFile:
-                openFile.write(content)
-        except IOError as ex:
-            pattern = self.tr("Error while saving replaced content: %s")
-            text = str(ex)
-            self.error.emit(pattern % text)
-
-    def _fileContent(self, fileName):
-        """Read file
+        items = list(self._results.items())
+
+        if self._usePool(items):
+            replaceFunc = functools.partial(replaceengine.replaceInFiles, self._regExp, self._replaceText)
+            for chunkLength, handled in self._mapInPool(replaceFunc, items):
+                for fileResult in handled:
+                    self._onFileHandled(*fileResult)
+        else:
+            for item in items:
+                self._onFileHandled(*replaceengine.replaceInFiles(self._regExp, self._replaceText, [item])[0])
+                if self._exit:
+                    break
+
+        seconds = time.perf_counter() - startTime
+        self.finalStatus.emit("%d replacements in %d file(s) in %.1f second(s) (%d files/s, %.1f MB/s)" %
+                              (self._replacedCount,
+                               self._replacedFileCount,
+                               seconds,
+                               self._replacedFileCount / max(seconds, 0.001),
+                               self._writtenBytes / max(seconds, 0.001) / (1024 * 1024)))
+
+    def _onFileHandled(self, fileName, replacedCount, writtenBytes, errors):
+        """Account result of replaceengine.replaceInFile()
         """
-        try:
-            with open(fileName, 'rb') as openFile:
-                content = openFile.read()
-        except IOError as ex:
-            self.error.emit(self.tr("Error opening file: %s" % str(ex)))
-            return ''
+        for error in errors:
+            self.error.emit(error)
 
-        try:
-            return str(content, 'utf8')
-        except UnicodeDecodeError as ex:
-            self.error.emit(self.tr("File %s not read: unicode error '%s'. File may be corrupted" %
-                                    (fileName, str(ex))))
-            return None
+        if replacedCount:
+            self._replacedCount += replacedCount
+            self._replacedFileCount += 1
+            self._writtenBytes += writtenBytes
+            self.resultsHandled.emit(fileName, self._results[fileName])
+
+
+class ReplaceAllThread(StopableThread):
+    """Thread computes replacement of all matches in a text, see replaceengine.replaceAllInText().
+    The changes are applied to the document by the GUI thread
+    """
+    PROGRESS_EMIT_TIMEOUT = 0.1
+
+    progressChanged = pyqtSignal(int, int)  # int value, int total
+    replacementsReady = pyqtSignal(int, list, int)  # run id, list of hunks, count of replacements
+    runFinished = pyqtSignal(int)  # run id. Emitted when the run has finished or has been stopped
+
+    _runId = 0
+
+    def replaceAll(self, regExp, replaceText, text):
+        """Start computing the replacements.
+        Returns id of the run. The signals are delivered asynchronously and may come from
+        a previous run, the id allows to ignore it
+        """
+        self.stop()
+
+        self._runId += 1
+        self._regExp = regExp
+        self._replaceText = replaceText
+        self._text = text
+
+        self.start()
+        return self._runId
 
     def run(self):
-        """Start point of the code, running i thread
-        Does thread job
+        """Start point of the code, running in thread
         """
-        startTime = time.clock()
+        runId = self._runId
+        self._lastProgressEmitTime = time.time()
+        result = replaceengine.replaceAllInText(self._regExp, self._replaceText, self._text,
+                                                lambda: self._exit, self._onProgress)
+        if result is not None and not self._exit:
+            self.replacementsReady.emit(runId, *result)
+        self.runFinished.emit(runId)
+
+    def _onProgress(self, position, total):
+        """Emit progress, if PROGRESS_EMIT_TIMEOUT passed since the last emit
+        """
+        if (time.time() - self._lastProgressEmitTime) > self.PROGRESS_EMIT_TIMEOUT:
+            self.progressChanged.emit(position, total)
+            self._lastProgressEmitTime = time.time()
 
-        for fileName in self._results.keys():
-            content = self._fileContent(fileName)
-            if content is None:  # if failed to read file
-                continue
 
-            matches = self._results[fileName]
+class IndexUpdateThread(StopableThread):
+    """Thread updates trigramindex.TrigramIndex for the list of project files.
 
-            content = self._doReplacements(content, matches)
+    Only new and modified files are indexed.
+    Updates of the same index, which are requested while the thread is running, are queued,
+    and the running thread does it after the current one
+    """
+
+    def __init__(self):
+        StopableThread.__init__(self)
+        self._lock = threading.Lock()
+        self._searchIndex = None
+        self._tasks = collections.deque()  # tuples (relPaths or None, added paths, removed paths)
+        self._running = False
+
+    def update(self, searchIndex, relPaths):
+        """Check all project files and index new and modified ones.
+        relPaths is list of project files, relative to the project path
+        """
+        self._addTask(searchIndex, (relPaths, (), ()))
 
-            self._saveContent(fileName, content)
+    def updateFiles(self, searchIndex, added, removed):
+        """Index the added files and forget the removed ones. Paths are relative to the project path
+        """
+        self._addTask(searchIndex, (None, added, removed))
 
-            self.resultsHandled.emit(fileName, matches)
+    def _addTask(self, searchIndex, task):
+        """Queue the task, if the thread is updating the same index, otherwise start the thread
+        """
+        with self._lock:
+            if self._running and searchIndex is self._searchIndex:
+                self._tasks.append(task)
+                return
 
-            if self._exit:
-                break
+        self.stop()
+
+        self._searchIndex = searchIndex
+        self._tasks = collections.deque([task])
+        self._running = True
 
-        self.finalStatus.emit("%d replacements in %d second(s)" %
-                              (self._totalCount,
-                               time.clock() - startTime))
+        self._readPoolSettings()
+
+        self.start()
 
-    def _doReplacements(self, content, matches):
-        """Do replacements for one file
+    def run(self):
+        """Start point of the code, running in thread.
+        Load the index and do the queued tasks
+        """
+        try:
+            if not self._searchIndex.isLoaded():
+                self._searchIndex.load()
+
+            changed = False
+            while not self._exit:
+                with self._lock:
+                    if not self._tasks:
+                        self._running = False
+                        break
+                    task = self._tasks.popleft()
+                changed = self._runTask(*task) or changed
+
+            if changed and not self._exit:
+                self._searchIndex.save()
+        finally:
+            with self._lock:
+                self._running = False
+
+    def _runTask(self, relPaths, added, removed):
+        """Update the index entries. Returns True, if the entries have been changed
         """
-        for result in matches[::-1]:  # count from end to begin because we are replacing by offset in content
-            replaceTextWithMatches = substitutions.makeSubstitutions(self._replaceText,
-                                                                     result.match)
-            content = content[:result.match.start()] + replaceTextWithMatches + content[result.match.end():]
+        oldEntries = self._searchIndex.entries()
+        if relPaths is not None:
+            outdatedFiles = self._searchIndex.outdatedFiles(relPaths, lambda: self._exit)
+            if self._exit:
+                return False
+
+            relPaths = set(relPaths)
+            entries = {relPath: entry
+                       for relPath, entry in oldEntries.items()
+                       if relPath in relPaths}
+            if not outdatedFiles and len(entries) == len(oldEntries):
+                return False  # up to date
+        else:
+            entries = dict(oldEntries)  # entries are shared with the search thread, replace it
+            for relPath in removed:
+                entries.pop(relPath, None)
+            outdatedFiles = list(added)
+
+        if self._usePool(outdatedFiles):
+            indexFunc = functools.partial(trigramindex.indexFiles, self._searchIndex.projectPath())
+            for chunkLength, indexed in self._mapInPool(indexFunc, outdatedFiles):
+                self._applyEntries(entries, indexed)
+        else:
+            for relPath in outdatedFiles:
+                self._applyEntries(entries,
+                                   trigramindex.indexFiles(self._searchIndex.projectPath(), [relPath]))
+                if self._exit:
+                    break
+
+        self._searchIndex.setEntries(entries)
+        return True
 
-        return content
+    def _applyEntries(self, entries, indexed):
+        """Update entries with results of trigramindex.indexFiles()
+        """
+        for relPath, entry in indexed:
+            if entry is None:
+                entries.pop(relPath, None)
+            else:
+                entries[relPath] = entry
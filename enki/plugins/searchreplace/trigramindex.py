@@ -0,0 +1,249 @@
+"""
+trigramindex --- Persistent trigram index of the project files
+==============================================================
+
+Search in directory has to read every file. The index allows to skip files,
+which can't contain a match, without reading it.
+
+For every project file the index stores a Bloom filter of the trigrams (3-byte sequences),
+which the file contains. The filter is compact, and it never gives false negatives.
+A file is searched only if its filter contains all trigrams, which any match of
+the searched regular expression must contain.
+
+The search decodes files as UTF-8 and drops invalid bytes, therefore the filter of
+a file, which is not valid UTF-8, is built from the same decoded text.
+
+Index entries are stored together with file modification time and size.
+Entries of modified files are ignored by the search and updated by the next index update.
+
+The module doesn't use Qt and the Enki core, therefore indexFiles() can be executed
+in the worker processes
+"""
+
+import os
+import os.path
+import re
+import zlib
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+from . import projectcache
+from . import searchengine
+
+
+_FORMAT_VERSION = 2
+
+# Bigger files are not indexed and always searched
+MAX_INDEXED_FILE_SIZE = 4 * 1024 * 1024
+
+_MIN_FILTER_BITS = 64
+_MAX_FILTER_BITS = 64 * 1024
+_FILTER_BITS_PER_TRIGRAM = 4  # ~22% false positives for every trigram of a query
+
+_BINARY_FILE_FILTER_BITS = 0  # marks binary files. Search never finds anything in it
+
+# Non-ASCII characters, which match ASCII letters when the search is case insensitive.
+# Replaced with the ASCII letters in the index and in the queries
+_FOLDED_CHARACTERS = [('ſ', 's'), ('ı', 'i'), ('İ', 'i'), ('K', 'k')]
+_FOLDED_SEQUENCES = [(char.encode('utf8').lower(), letter.encode('utf8'))
+                     for char, letter in _FOLDED_CHARACTERS]
+
+
+def _normalize(data):
+    """Normalize text bytes, so the index and queries are case insensitive
+    """
+    data = data.lower()
+    for sequence, letter in _FOLDED_SEQUENCES:
+        if sequence in data:
+            data = data.replace(sequence, letter)
+    return data
+
+
+def _trigramBit(trigram, filterBits):
+    return zlib.crc32(trigram) & (filterBits - 1)
+
+
+def _makeFilter(data):
+    """Make Bloom filter of trigrams of the text.
+    Returns (filter size in bits, filter as int)
+    """
+    data = _normalize(data)
+    trigrams = {data[i:i + 3] for i in range(len(data) - 2)}
+
+    filterBits = _MIN_FILTER_BITS
+    while filterBits < len(trigrams) * _FILTER_BITS_PER_TRIGRAM and \
+            filterBits < _MAX_FILTER_BITS:
+        filterBits *= 2
+
+    filterBytes = bytearray(filterBits // 8)
+    for trigram in trigrams:
+        bit = _trigramBit(trigram, filterBits)
+        filterBytes[bit >> 3] |= 1 << (bit & 7)
+
+    return filterBits, int.from_bytes(filterBytes, 'little')
+
+
+def _searchedText(data):
+    """Get UTF-8 bytes of the text, which the search sees in the file contents
+    """
+    try:
+        data.decode('utf8')
+    except UnicodeDecodeError:  # invalid bytes are dropped by the search
+        return searchengine.decodeData(data, 'ignore').encode('utf8')
+    return data
+
+
+def indexFiles(projectPath, relPaths):
+    """Build index entries for the files. Entry point of a worker process.
+
+    Returns list of tuples (relPath, entry).
+    entry is None, if failed to read the file
+    """
+    entries = []
+    for relPath in relPaths:
+        fullPath = os.path.join(projectPath, relPath)
+        try:
+            stat = os.stat(fullPath)
+            if stat.st_size > MAX_INDEXED_FILE_SIZE:
+                filterBits, filterValue = None, None
+            else:
+                with open(fullPath, 'rb') as openedFile:
+                    data = openedFile.read()
+                if searchengine.isBinaryData(data):
+                    filterBits, filterValue = _BINARY_FILE_FILTER_BITS, 0
+                else:
+                    filterBits, filterValue = _makeFilter(_searchedText(data))
+        except (IOError, OSError):
+            entries.append((relPath, None))
+            continue
+
+        entries.append((relPath, (stat.st_mtime, stat.st_size, filterBits, filterValue)))
+
+    return entries
+
+
+def _literalStrings(items, ignoreCase):
+    """Get list of (string, ignoreCase) for strings, which are contained by any match of the parsed pattern
+    """
+    literals = []
+    current = ''
+    for op, av in items:
+        if op == sre_parse.LITERAL:
+            current += chr(av)
+        elif op == sre_parse.AT:  # zero-width assertion doesn't split the literal
+            pass
+        else:
+            literals.append((current, ignoreCase))
+            current = ''
+            if op == sre_parse.SUBPATTERN:
+                groupPattern = av[-1]  # the last item is the group contents on all Python versions
+                groupIgnoreCase = ignoreCase
+                if len(av) == 4:  # (group, addFlags, delFlags, pattern) on Python 3.6+
+                    groupIgnoreCase = (ignoreCase or av[1] & re.IGNORECASE) and not av[2] & re.IGNORECASE
+                literals += _literalStrings(groupPattern, groupIgnoreCase)
+    literals.append((current, ignoreCase))
+
+    return [(literal, literalIgnoreCase)
+            for literal, literalIgnoreCase in literals
+            if literal]
+
+
+def requiredTrigrams(regExp):
+    """Get set of normalized trigrams, which any match of the regExp contains.
+
+    Empty set is returned, if the trigrams can't be detected for the regExp
+    """
+    try:
+        parsed = sre_parse.parse(regExp.pattern, regExp.flags)
+    except Exception:  # this parser is not public API. Just don't use the index, if something goes wrong
+        return set()
+
+    trigrams = set()
+    for literal, ignoreCase in _literalStrings(parsed, bool(regExp.flags & re.IGNORECASE)):
+        data = _normalize(literal.encode('utf8'))
+        literalTrigrams = [data[i:i + 3] for i in range(len(data) - 2)]
+        if ignoreCase:
+            # Case folding of non-ASCII characters is not done by the index
+            literalTrigrams = [trigram for trigram in literalTrigrams
+                               if max(trigram) < 0x80]
+        trigrams.update(literalTrigrams)
+    return trigrams
+
+
+class TrigramIndex(projectcache.ProjectCache):
+    """Index of the project files.
+
+    Entries are updated with setEntries() by the index update thread and
+    used by the search thread.
+    Entries are {relative path: (mtime, size, filterBits, filterValue)}. filterBits is None for not indexed files
+    """
+    FORMAT_VERSION = _FORMAT_VERSION
+
+    def outdatedFiles(self, relPaths, isStopped):
+        """Get list of files, which are not indexed or have been modified since indexing
+        """
+        outdated = []
+        for index, relPath in enumerate(relPaths):
+            entry = self._entries.get(relPath)
+            if entry is None or \
+               not self._isUpToDate(os.path.join(self._projectPath, relPath), entry):
+                outdated.append(relPath)
+
+            if not (index % 1000) and isStopped():
+                break
+
+        return outdated
+
+    @staticmethod
+    def _isUpToDate(fullPath, entry):
+        try:
+            stat = os.stat(fullPath)
+        except (IOError, OSError):
+            return False
+        return (stat.st_mtime, stat.st_size) == entry[:2]
+
+    def filterFiles(self, fileNames, regExp, isStopped):
+        """Remove files, which can't contain matches of the regExp, from the list of absolute paths.
+
+        Files, which are not indexed or modified since indexing, are kept
+        """
+        entries = self._entries
+        trigrams = requiredTrigrams(regExp)
+        if entries is None or not trigrams:
+            return fileNames
+
+        masks = {_BINARY_FILE_FILTER_BITS: 1}  # filter bits: mask. Binary files never pass the mask
+        prefix = os.path.join(self._projectPath, '')
+
+        candidates = []
+        for index, fileName in enumerate(fileNames):
+            entry = None
+            if fileName.startswith(prefix):
+                entry = entries.get(fileName[len(prefix):])
+            elif self._otherRootPrefixes:
+                relPath = self.relativePath(fileName)
+                if relPath is not None:
+                    entry = entries.get(relPath)
+
+            if entry is None or entry[2] is None:
+                candidates.append(fileName)
+            else:
+                filterBits, filterValue = entry[2:]
+                mask = masks.get(filterBits)
+                if mask is None:
+                    mask = 0
+                    for trigram in trigrams:
+                        mask |= 1 << _trigramBit(trigram, filterBits)
+                    masks[filterBits] = mask
+
+                if filterValue & mask == mask or \
+                   not self._isUpToDate(fileName, entry):
+                    candidates.append(fileName)
+
+            if not (index % 1000) and isStopped():
+                break
+
+        return candidates
@@ -84,6 +84,9 @@ class Plugin:
                 path = session['project']
                 if path is not None and os.path.isdir(path):
                     core.project().open(path)
+                    for rootPath in session.get('projectRoots', []):
+                        if os.path.isdir(rootPath):
+                            core.project().addRoot(rootPath)
 
     def _documentForPath(self, filePath):
         """Find document by it's file path.
@@ -117,7 +120,8 @@ class Plugin:
 
         session = {'current': currentPath,
                    'opened': fileList,
-                   'project': core.project().path()}
+                   'project': core.project().path(),
+                   'projectRoots': core.project().roots()[1:]}
 
         enki.core.json_wrapper.dump(_SESSION_FILE_PATH, 'session', session, showWarnings)
 
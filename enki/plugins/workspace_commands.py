@@ -241,6 +241,19 @@ class CommandOpenProject(AbstractCommand):
         return '{} {}'.format(self.command, self._path)
 
 
+class CommandAddProjectRoot(CommandOpenProject):
+
+    command = 'pa'
+    signature = 'pa PATH'
+    description = 'Add directory to the project as one more root'
+
+    def execute(self):
+        """Execute the command
+        """
+        if not core.project().addRoot(self._fullPath()):
+            core.mainWindow().appendMessage('{} is already in the project'.format(self._fullPath()))
+
+
 class CommandSaveAs(AbstractCommand):
     """Save As Locator command
     """
@@ -297,7 +310,7 @@ class CommandSaveAs(AbstractCommand):
         return '{} {}'.format(self.command, self._path)
 
 
-_CMD_CLASSES = (CommandGotoLine, CommandOpen, CommandOpenProject, CommandSaveAs)
+_CMD_CLASSES = (CommandGotoLine, CommandOpen, CommandOpenProject, CommandAddProjectRoot, CommandSaveAs)
 
 
 class Plugin:
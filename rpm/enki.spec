@@ -32,7 +32,6 @@ Requires:       python3-Markdown
 Requires:       libQt5Svg5
 %else
 Requires:       python3-markdown
-Requires:       python3-regex
 Requires:       qt5-qtsvg
 %endif
 
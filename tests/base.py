@@ -166,6 +166,11 @@ class TestCase(unittest.TestCase):
         except OSError as e:
             pass
 
+        try:
+            shutil.rmtree(os.path.join(enki.core.defines.CONFIG_DIR, 'project_cache'))
+        except OSError as e:
+            pass
+
     def waitUntilPassed(self, timeout, func):
         """Try to execute a function until it doesn't fail"""
         for _ in range(20):
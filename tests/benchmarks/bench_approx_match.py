@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Benchmark of the approximate matching used by the preview synchronization.
+
+Runs findApproxTextInTarget() on the cases of tests/test_plugins/test_approx_match.py
+and compares it with the previous implementation, which searched the whole target text
+with fuzzy regular expressions of the regex module. Checks, that both implementations
+give the same anchor index.
+
+The reference implementation is only measured if the regex module is installed.
+Searches, which take longer than --timeout seconds, are interrupted.
+The reference uses the current refineSearchResult(), which took about 1% of the time
+of the previous implementation.
+
+Usage: bench_approx_match.py [--repeat N] [--timeout SECONDS] [--document PATH]
+"""
+
+import argparse
+import ast
+import os.path
+import sys
+import time
+
+_TESTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(_TESTS_DIR, '..'))
+
+from enki.plugins.preview import approx_match
+
+try:
+    import regex
+except ImportError:
+    regex = None
+
+
+_CORPUS_PATH = os.path.join(_TESTS_DIR, 'test_plugins', 'test_approx_match.py')
+
+# Distance between the anchors, when a document is searched
+_DOCUMENT_ANCHOR_STEP = 500
+
+
+def loadCorpus():
+    """Get keyword arguments of findApproxTextInTarget() calls from the tests.
+    Returns list of (test name, kwargs)
+    """
+    with open(_CORPUS_PATH, encoding='utf-8') as corpusFile:
+        tree = ast.parse(corpusFile.read(), _CORPUS_PATH)
+
+    cases = []
+    for testClass in tree.body:
+        if not isinstance(testClass, ast.ClassDef):
+            continue
+        for method in testClass.body:
+            if not isinstance(method, ast.FunctionDef):
+                continue
+            for node in ast.walk(method):
+                if isinstance(node, ast.Call) and \
+                   isinstance(node.func, ast.Name) and node.func.id == 'f':
+                    kwargs = {keyword.arg: eval(compile(ast.Expression(keyword.value), _CORPUS_PATH, 'eval'))
+                              for keyword in node.keywords}
+                    cases.append(('{}.{}'.format(testClass.name, method.name), kwargs))
+    return cases
+
+
+def documentCases(path):
+    """Search the document in itself with the markup removed
+    """
+    with open(path, encoding='utf-8') as documentFile:
+        searchText = documentFile.read()
+    targetText = ''.join(char for char in searchText if char not in '#*`_[]<>|=')
+    return [('{}:{}'.format(os.path.basename(path), anchor),
+             {'searchText': searchText, 'searchAnchor': anchor, 'targetText': targetText})
+            for anchor in range(0, len(searchText), _DOCUMENT_ANCHOR_STEP)]
+
+
+def _regexFuzzySearch(searchText, targetText, timeout):
+    return regex.search('(' + regex.escape(searchText) + '){e}', targetText, regex.BESTMATCH,
+                        timeout=timeout)
+
+
+def _regexFindApproxText(searchText, targetText, timeout):
+    mo = _regexFuzzySearch(searchText, targetText, timeout)
+    if mo:
+        moPre = _regexFuzzySearch(searchText, targetText[:mo.start()], timeout)
+        moPost = _regexFuzzySearch(searchText, targetText[mo.end():], timeout)
+        moError = sum(mo.fuzzy_counts)
+        moPreError = sum(moPre.fuzzy_counts) if moPre else moError * 2
+        moPostError = sum(moPost.fuzzy_counts) if moPost else moError * 2
+        if moError * 1.1 <= moPreError and moError * 1.1 <= moPostError:
+            return mo
+    return None
+
+
+def referenceFindApproxTextInTarget(searchText, searchAnchor, targetText, timeout, searchRange=30):
+    """findApproxTextInTarget() as it was implemented with the regex module
+    """
+    begin = max(0, searchAnchor - searchRange)
+    end = min(len(searchText), searchAnchor + searchRange)
+    if end <= begin:
+        return 0
+    mo = _regexFindApproxText(searchText[begin:end], targetText, timeout)
+    if not mo:
+        begin = max(0, searchAnchor - int(searchRange * 1.5))
+        end = min(len(searchText), searchAnchor + int(searchRange * 1.5))
+        mo = _regexFindApproxText(searchText[begin:end], targetText, timeout)
+        if not mo:
+            return -1
+
+    offset, lcsString = approx_match.refineSearchResult(searchText[begin:end], searchAnchor - begin,
+                                                        targetText[mo.start():mo.end()])
+    if offset != -1:
+        offset = offset + mo.start()
+    return offset
+
+
+def measure(function, kwargs, repeat):
+    """Returns (result, seconds per call)
+    """
+    startTime = time.perf_counter()
+    for _ in range(repeat):
+        result = function(**kwargs)
+    return result, (time.perf_counter() - startTime) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark approximate matching')
+    parser.add_argument('--repeat', type=int, default=10, help='count of calls of the new implementation per case')
+    parser.add_argument('--timeout', type=float, default=10, help='time limit of a reference search, seconds')
+    parser.add_argument('--document', help='also search in this document with the markup removed')
+    args = parser.parse_args()
+
+    cases = loadCorpus()
+    if args.document:
+        cases += documentCases(args.document)
+
+    if regex is None:
+        print('The regex module is not installed. Only the new implementation is measured')
+
+    print('{:<32}{:>8}{:>8}{:>12}{:>12}{:>10}'.format('case', 'index', 'ref', 'new, ms', 'ref, ms', 'speedup'))
+    failed = False
+    newTotal = 0
+    referenceTotal = 0
+    for name, kwargs in cases:
+        index, seconds = measure(approx_match.findApproxTextInTarget, kwargs, args.repeat)
+
+        referenceIndex = referenceSeconds = None
+        if regex is not None:
+            try:
+                referenceIndex, referenceSeconds = measure(referenceFindApproxTextInTarget,
+                                                           dict(kwargs, timeout=args.timeout), 1)
+            except TimeoutError:
+                pass
+
+        if referenceSeconds is None:
+            print('{:<32}{:>8}{:>8}{:>12.3f}{:>12}'.format(name, index, '-', seconds * 1000, '-'))
+            continue
+
+        newTotal += seconds
+        referenceTotal += referenceSeconds
+        print('{:<32}{:>8}{:>8}{:>12.3f}{:>12.3f}{:>10.0f}'.format(name, index, referenceIndex, seconds * 1000,
+                                                                   referenceSeconds * 1000,
+                                                                   referenceSeconds / seconds))
+        if index != referenceIndex:
+            print('    Results are different!')
+            failed = True
+
+    if newTotal:
+        print('\nTotal of the cases, measured for both: new {:.3f} ms, reference {:.3f} ms, speedup {:.0f}'.format(
+              newTotal * 1000, referenceTotal * 1000, referenceTotal / newTotal))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
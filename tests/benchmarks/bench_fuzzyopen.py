@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Benchmark of the fuzzy open matchers.
+
+Generates a synthetic list of project paths, types patterns character by character
+and prints time of every keystroke for the Python and the NumPy matcher.
+Also checks, that both matchers give the same results.
+
+Usage: bench_fuzzyopen.py [--count N] [--seed SEED] [PATTERN ...]
+"""
+
+import argparse
+import os.path
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from enki.lib.filelist import FileList
+from enki.plugins.fuzzyopen import matcher
+
+
+_WORDS = ['src', 'lib', 'core', 'test', 'plugins', 'widget', 'main', 'util', 'config', 'data',
+          'model', 'view', 'python', 'docs', 'build', 'include', 'impl', 'api', 'Manager', 'Dialog']
+_EXTENSIONS = ['py', 'cpp', 'h', 'txt', 'json', 'ui']
+
+_DEFAULT_PATTERNS = ['widmain', 'cowo', 'Dialog', 'srcutilpy']
+
+_MAX_COUNT = 32
+
+
+def makePaths(count, seed):
+    """Generate reproducible list of unique relative paths
+    """
+    rand = random.Random(seed)
+    paths = []
+    for index in range(count):
+        dirs = [rand.choice(_WORDS) for _ in range(rand.randint(1, 6))]
+        fileName = '{}_{}{}.{}'.format(rand.choice(_WORDS), rand.choice(_WORDS), index,
+                                       rand.choice(_EXTENSIONS))
+        paths.append(os.path.join(*(dirs + [fileName])))
+    return paths
+
+
+def typePattern(matcherObject, pattern):
+    """Match every prefix of the pattern. Returns list of (prefix, seconds, results)
+    """
+    stopEvent = threading.Event()
+    measurements = []
+    for length in range(1, len(pattern) + 1):
+        prefix = pattern[:length]
+        startTime = time.perf_counter()
+        results = matcherObject.match(prefix, _MAX_COUNT, set(), stopEvent)
+        measurements.append((prefix, time.perf_counter() - startTime, results))
+    return measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark fuzzy open matchers')
+    parser.add_argument('--count', type=int, default=1000000, help='count of the generated paths')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('patterns', nargs='*', default=_DEFAULT_PATTERNS)
+    args = parser.parse_args()
+
+    startTime = time.perf_counter()
+    paths = FileList(makePaths(args.count, args.seed))  # the project gives FileList
+    print('Generated {} paths in {:.2f} s'.format(len(paths), time.perf_counter() - startTime))
+
+    backends = [('python', matcher.FuzzyMatcher)]
+    if matcher.numpy is not None:
+        backends.append(('numpy', matcher.NumpyFuzzyMatcher))
+    else:
+        print('NumPy is not installed. Only the Python matcher is measured')
+
+    failed = False
+    for pattern in args.patterns:
+        print('\nPattern {!r}'.format(pattern))
+        print('{:<20}'.format('prefix') + ''.join('{:>12}'.format(name + ', ms') for name, _ in backends))
+
+        measurements = []
+        for name, matcherClass in backends:
+            matcherObject = matcherClass(paths)  # new matcher, so the first keystroke includes preparation
+            measurements.append(typePattern(matcherObject, pattern))
+
+        for keystroke in zip(*measurements):
+            times = ''.join('{:>12.1f}'.format(seconds * 1000) for _, seconds, _ in keystroke)
+            print('{:<20}{}'.format(keystroke[0][0], times))
+            if any(results != keystroke[0][2] for _, _, results in keystroke):
+                print('    Results are different!')
+                failed = True
+
+        totals = ''.join('{:>12.1f}'.format(sum(seconds for _, seconds, _ in backendMeasurements) * 1000)
+                         for backendMeasurements in measurements)
+        print('{:<20}{}'.format('total', totals))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
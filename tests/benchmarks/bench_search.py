@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Benchmark and regression check of search, replace, project scanning and fuzzy open.
+
+Generates a reproducible synthetic repository and measures:
+
+* scanning the project with the project scanner, without and with the cache of the previous scan
+* walking the directory by the search thread
+* searching for a literal, a regular expression and a case insensitive literal
+* replacing in the found files. A copy of the tree is modified
+* fuzzy matching of the project file list
+
+Every measurement is repeated and the best time is taken.
+Results are printed and can be saved as JSON with --output.
+If --baseline is given, the results are compared with the saved results of the same tree parameters.
+The exit code is 1, if any measurement is slower than the baseline by more than --threshold.
+
+Usage: bench_search.py [--files N] [--depth N] [--file-size BYTES] [--binary-ratio R] [--seed SEED]
+                       [--repeat N] [--output PATH] [--baseline PATH] [--threshold R]
+"""
+
+import argparse
+import json
+import os
+import os.path
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from enki.core.filefilter import FileNameMatcher
+from enki.core.project import _ScannerThread, _cachedFiles
+from enki.lib import ignorefiles
+from enki.plugins.fuzzyopen import matcher
+from enki.plugins.searchreplace import replaceengine, searchengine
+from enki.plugins.searchreplace.threads import SearchThread
+
+
+_WORDS = ['src', 'lib', 'core', 'test', 'plugins', 'widget', 'main', 'util', 'config', 'data',
+          'model', 'view', 'python', 'docs', 'build', 'include', 'impl', 'api', 'Manager', 'Dialog']
+_EXTENSIONS = ['py', 'cpp', 'h', 'txt', 'json']
+_DIRS_PER_LEVEL = 4
+_IGNORE_FILE = '*.json\n'
+
+# Default of the NegativeFileFilter option
+_FILTER_PATTERNS = [".*", "*~", "*.o", "*.pyc", "*.bak", "__pycache__", "*.class"]
+
+_SEARCHES = [('literal', 'needle', 0),
+             ('regexp', r'def \w+_needle\(', 0),
+             ('ignorecase', 'NeEdLe', re.IGNORECASE)]
+_REPLACE = ('needle', 'pin')
+_FUZZY_PATTERNS = ['widmain', 'cowo', 'Dialog', 'srcutilpy']
+_FUZZY_MAX_COUNT = 32
+
+
+def makeTree(path, fileCount, depth, fileSize, binaryRatio, seed):
+    """Generate reproducible tree of text and binary files.
+    Every 10th text file might contain the searched word. JSON files are ignored by .gitignore
+    """
+    rand = random.Random(seed)
+    dirs = ['']
+    levelDirs = ['']
+    for _ in range(depth):
+        levelDirs = [os.path.join(parent, '{}{}'.format(rand.choice(_WORDS), index))
+                     for parent in levelDirs
+                     for index in range(_DIRS_PER_LEVEL)]
+        dirs += levelDirs
+
+    for relDir in dirs:
+        os.makedirs(os.path.join(path, relDir), exist_ok=True)
+    with open(os.path.join(path, '.gitignore'), 'w') as ignoreFile:
+        ignoreFile.write(_IGNORE_FILE)
+
+    for index in range(fileCount):
+        relDir = rand.choice(dirs)
+        if rand.random() < binaryRatio:
+            fileName = 'blob{}.bin'.format(index)
+            data = bytes(rand.getrandbits(8) for _ in range(fileSize // 4)) * 4
+        else:
+            fileName = '{}_{}{}.{}'.format(rand.choice(_WORDS), rand.choice(_WORDS), index, rand.choice(_EXTENSIONS))
+            lines = []
+            size = 0
+            while size < fileSize:
+                line = ' '.join(rand.choice(_WORDS) for _ in range(rand.randint(2, 12)))
+                if index % 10 == 0 and rand.random() < 0.05:
+                    line += ' def {}_needle():'.format(rand.choice(_WORDS))
+                lines.append(line)
+                size += len(line) + 1
+            data = '\n'.join(lines).encode('utf-8')
+
+        with open(os.path.join(path, relDir, fileName), 'wb') as file_:
+            file_.write(data)
+
+
+def measure(function, repeat):
+    """Returns (result of the last call, the best time of a call in seconds)
+    """
+    bestTime = None
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - startTime
+        if bestTime is None or seconds < bestTime:
+            bestTime = seconds
+    return result, bestTime
+
+
+def benchmark(treePath, repeat):
+    """Run all measurements. Returns ordered list of (name, seconds)
+    """
+    results = []
+    filterMatcher = FileNameMatcher(_FILTER_PATTERNS)
+    rules = ignorefiles.rulesForTree(treePath)
+
+    def scan(cachedDirs):
+        thread = _ScannerThread(None, treePath, cachedDirs)
+        return thread._scanSubtrees([('', rules, True)], filterMatcher, time.time_ns())
+
+    dirs, seconds = measure(lambda: scan(None), repeat)
+    results.append(('scan', seconds))
+    _, seconds = measure(lambda: scan(dirs), repeat)
+    results.append(('scan_cached', seconds))
+    projectFiles = _cachedFiles(dirs)
+
+    searchThread = SearchThread()
+    walk = lambda: [fileName
+                    for files in searchThread._walkFiles(treePath, None, filterMatcher, rules)
+                    for fileName in files]
+    files, seconds = measure(walk, repeat)
+    results.append(('walk', seconds))
+
+    items = [(fileName, None) for fileName in sorted(files)]
+    for name, pattern, flags in _SEARCHES:
+        regExp = re.compile(pattern, flags)
+        (found, metadata), seconds = measure(lambda: searchengine.searchInFiles(regExp, items), repeat)
+        results.append(('search_' + name, seconds))
+        print('{}: {} matches in {} files'.format(name, sum(len(matches) for _, matches in found), len(found)))
+
+    # Replace in a fresh copy of the tree every time
+    regExp = re.compile(_REPLACE[0])
+    copyPath = treePath + '.replace'
+    replacedCount = 0
+    bestTime = None
+    for _ in range(repeat):
+        shutil.rmtree(copyPath, ignore_errors=True)
+        shutil.copytree(treePath, copyPath)
+        found, metadata = searchengine.searchInFiles(regExp, [(fileName.replace(treePath, copyPath, 1), None)
+                                                              for fileName, _ in items])
+        replaceItems = [(fileName, [(line, column, length) for _, line, column, length in matches])
+                        for fileName, matches in found]
+        handled, seconds = measure(lambda: replaceengine.replaceInFiles(regExp, _REPLACE[1], replaceItems), 1)
+        replacedCount = sum(count for _, count, _, _ in handled)
+        bestTime = seconds if bestTime is None else min(bestTime, seconds)
+    shutil.rmtree(copyPath, ignore_errors=True)
+    results.append(('replace', bestTime))
+    print('replace: {} replacements'.format(replacedCount))
+
+    stopEvent = threading.Event()
+    for pattern in _FUZZY_PATTERNS:
+        def typePattern():
+            fuzzyMatcher = matcher.FuzzyMatcher(projectFiles)
+            for length in range(1, len(pattern) + 1):
+                fuzzyMatcher.match(pattern[:length], _FUZZY_MAX_COUNT, set(), stopEvent)
+        _, seconds = measure(typePattern, repeat)
+        results.append(('fuzzy_' + pattern, seconds))
+
+    return results
+
+
+def compare(results, baseline, threshold, minDelta):
+    """Compare results with the baseline. Returns list of names of the regressed measurements
+    """
+    regressed = []
+    for name, seconds in results:
+        baseSeconds = baseline.get(name)
+        if baseSeconds is not None and \
+           seconds > baseSeconds * (1 + threshold) and \
+           seconds - baseSeconds > minDelta:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark search, replace, project scanning and fuzzy open')
+    parser.add_argument('--files', type=int, default=5000, help='count of the generated files')
+    parser.add_argument('--depth', type=int, default=3, help='depth of the generated tree')
+    parser.add_argument('--file-size', type=int, default=4096, help='size of a generated file, bytes')
+    parser.add_argument('--binary-ratio', type=float, default=0.1, help='part of binary files')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--repeat', type=int, default=3, help='count of runs of every measurement')
+    parser.add_argument('--output', help='save results as JSON to this file')
+    parser.add_argument('--baseline', help='compare with JSON results, saved with --output')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown relative to the baseline, 0.2 means 20%%')
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help='slowdowns less than this, in seconds, are not regressions')
+    args = parser.parse_args()
+
+    params = {'files': args.files,
+              'depth': args.depth,
+              'fileSize': args.file_size,
+              'binaryRatio': args.binary_ratio,
+              'seed': args.seed}
+
+    tmpDir = tempfile.mkdtemp(prefix='enki_bench_')
+    try:
+        treePath = os.path.join(tmpDir, 'tree')
+        startTime = time.perf_counter()
+        makeTree(treePath, args.files, args.depth, args.file_size, args.binary_ratio, args.seed)
+        print('Generated {} files in {:.2f} s'.format(args.files, time.perf_counter() - startTime))
+
+        results = benchmark(treePath, args.repeat)
+    finally:
+        shutil.rmtree(tmpDir, ignore_errors=True)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baselineFile:
+            data = json.load(baselineFile)
+        if data['params'] == params:
+            baseline = data['results']
+        else:
+            print('Baseline was measured with different parameters {}. Not compared'.format(data['params']))
+
+    regressed = compare(results, baseline, args.threshold, args.min_delta)
+
+    print('\n{:<24}{:>12}{:>12}'.format('measurement', 'ms', 'baseline'))
+    for name, seconds in results:
+        baseSeconds = baseline.get(name)
+        print('{:<24}{:>12.1f}{:>12}{}'.format(name, seconds * 1000,
+                                              '-' if baseSeconds is None else '{:.1f}'.format(baseSeconds * 1000),
+                                              '  REGRESSION' if name in regressed else ''))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as outputFile:
+            json.dump({'params': params, 'results': dict(results)}, outputFile, indent=4)
+
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
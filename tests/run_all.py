@@ -6,7 +6,6 @@ import sys
 # Import just to check that dependencies are installed
 import markdown
 import docutils
-import regex
 
 
 if __name__ == "__main__":
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+
+import unittest
+import os.path
+import sys
+import fnmatch
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+
+import base
+
+from enki.core.filefilter import FileNameMatcher
+
+
+class Matcher(unittest.TestCase):
+    PATTERNS = [".*", "*~", "*.o", "*.pyc", "*.bak", "__pycache__", "*.class", "build*", "*.[ch]pp", "t?st"]
+    NAMES = ['.git', '.', 'file~', '~', 'a.o', '.o', 'a.oo', 'o', 'x.pyc', 'x.py', '__pycache__', '__pycache__x',
+             'Main.class', 'build', 'build.sh', 'rebuild', 'a.cpp', 'a.hpp', 'a.xpp', 'test', 'toast', 'main.c', '']
+
+    def test_same_as_fnmatch(self):
+        matcher = FileNameMatcher(self.PATTERNS)
+        for name in self.NAMES * 2:  # second time from the cache
+            expected = any(fnmatch.fnmatchcase(name, pattern) for pattern in self.PATTERNS)
+            self.assertEqual(matcher.match(name), expected, name)
+
+    def test_empty(self):
+        self.assertFalse(FileNameMatcher([]).match('a.o'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -48,6 +48,90 @@ class Test(base.TestCase):
         self.assertEqual(proj.path(), newPath)
         self.assertEqual(proj.files(), None)
 
+    def test_2(self):
+        """ Files are loaded from the cache and updated by the next scan
+        """
+        projPath = os.path.join(self.TEST_FILE_DIR, 'proj')
+        os.makedirs(os.path.join(projPath, 'dir'))
+        for name in ('a.txt', os.path.join('dir', 'b.txt'), os.path.join('dir', 'c.pyc')):
+            open(os.path.join(projPath, name), 'w').close()
+
+        proj = core.project()
+        proj.open(projPath)
+        proj.startLoadingFiles()
+        self.waitUntilPassed(5000, lambda: self.assertIsNotNone(proj.files()))
+        self.assertEqual(sorted(proj.files()), ['a.txt', os.path.join('dir', 'b.txt')])
+
+        proj.open(PROJ_ROOT)
+        proj.open(projPath)
+        self.assertEqual(sorted(proj.files()), ['a.txt', os.path.join('dir', 'b.txt')])
+
+        changes = []
+        proj.filesChanged.connect(lambda added, removed: changes.append((added, removed)))
+        os.unlink(os.path.join(projPath, 'a.txt'))
+        open(os.path.join(projPath, 'dir', 'd.txt'), 'w').close()
+
+        proj.startLoadingFiles()
+        self.waitUntilPassed(5000, lambda: self.assertEqual(len(changes), 1))
+        self.assertEqual(changes[0], ([os.path.join('dir', 'd.txt')], ['a.txt']))
+        self.assertEqual(sorted(proj.files()), [os.path.join('dir', 'b.txt'), os.path.join('dir', 'd.txt')])
+
+    def test_3(self):
+        """ Changes of the loaded project are applied without scanning
+        """
+        projPath = os.path.join(self.TEST_FILE_DIR, 'proj')
+        os.makedirs(os.path.join(projPath, 'dir'))
+        open(os.path.join(projPath, 'a.txt'), 'w').close()
+
+        proj = core.project()
+        proj.open(projPath)
+        proj.startLoadingFiles()
+        self.waitUntilPassed(5000, lambda: self.assertIsNotNone(proj.files()))
+
+        changes = []
+        proj.filesChanged.connect(lambda added, removed: changes.append((added, removed)))
+        os.makedirs(os.path.join(projPath, 'dir', 'subdir'))
+        open(os.path.join(projPath, 'dir', 'subdir', 'b.txt'), 'w').close()
+        os.unlink(os.path.join(projPath, 'a.txt'))
+
+        self.waitUntilPassed(5000, lambda: self.assertEqual(len(changes), 1))
+        self.assertEqual(changes[0], ([os.path.join('dir', 'subdir', 'b.txt')], ['a.txt']))
+        self.assertEqual(proj.files(), [os.path.join('dir', 'subdir', 'b.txt')])
+
+    def test_4(self):
+        """ Project with a few roots. Files of a root are updated independently
+        """
+        projPath = os.path.join(self.TEST_FILE_DIR, 'proj')
+        otherPath = os.path.join(self.TEST_FILE_DIR, 'other')
+        os.makedirs(projPath)
+        os.makedirs(os.path.join(otherPath, 'dir'))
+        open(os.path.join(projPath, 'a.txt'), 'w').close()
+        open(os.path.join(otherPath, 'dir', 'b.txt'), 'w').close()
+
+        proj = core.project()
+        proj.open(projPath)
+        self.assertFalse(proj.addRoot(projPath))
+        self.assertTrue(proj.addRoot(os.path.join(otherPath, 'dir', '..')))
+        self.assertFalse(proj.addRoot(os.path.join(otherPath, 'dir')))  # nested roots are not allowed
+        self.assertEqual(proj.roots(), [projPath, otherPath])
+
+        proj.startLoadingFiles()
+        self.waitUntilPassed(5000, lambda: self.assertEqual(len(proj.files()), 2))
+        otherFile = os.path.join('..', 'other', 'dir', 'b.txt')
+        self.assertEqual(list(proj.files()), ['a.txt', otherFile])
+        self.assertEqual(proj.fileNameIndex().findByName('b.txt'), [otherFile])
+
+        changes = []
+        proj.filesChanged.connect(lambda added, removed: changes.append((added, removed)))
+        open(os.path.join(otherPath, 'dir', 'c.txt'), 'w').close()
+        self.waitUntilPassed(5000, lambda: self.assertEqual(len(changes), 1))
+        self.assertEqual(changes[0], ([os.path.join('..', 'other', 'dir', 'c.txt')], []))
+
+        self.assertTrue(proj.removeRoot(otherPath))
+        self.assertFalse(proj.removeRoot(projPath))
+        self.assertEqual(list(proj.files()), ['a.txt'])
+        self.assertEqual(proj.roots(), [projPath])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import unittest
+import os.path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+
+import base
+
+from enki.lib.filelist import FileList, FileNameIndex
+import enki.lib.filelist
+
+
+_PATHS = ['README', 'src/main.c', 'src/Lib/Util.h', 'docs/ÄNDERUNGEN.txt', 'İstanbul.txt']
+
+
+class Test(unittest.TestCase):
+    def test_sequence(self):
+        files = FileList(_PATHS)
+        self.assertEqual(len(files), len(_PATHS))
+        self.assertEqual(list(files), _PATHS)
+        self.assertEqual([files[i] for i in range(len(files))], _PATHS)
+        self.assertEqual(files[-1], _PATHS[-1])
+        self.assertEqual(files[1:3], _PATHS[1:3])
+        self.assertIn('src/main.c', files)
+        self.assertEqual(files.index('src/Lib/Util.h'), 2)
+        self.assertRaises(IndexError, lambda: files[len(_PATHS)])
+        self.assertRaises(IndexError, lambda: files[-len(_PATHS) - 1])
+
+    def test_empty(self):
+        files = FileList([])
+        self.assertEqual(len(files), 0)
+        self.assertEqual(list(files), [])
+        self.assertEqual(files.text(), '')
+        self.assertEqual(list(files.lower()), [])
+
+    def test_iterate_chunks(self):
+        paths = ['dir{}/file{}'.format(i % 7, i) for i in range(enki.lib.filelist._ITER_CHUNK_SIZE * 2 + 3)]
+        self.assertEqual(list(FileList(iter(paths))), paths)
+
+    def test_text(self):
+        files = FileList(_PATHS)
+        offsets = files.offsets()
+        self.assertEqual(offsets[-1], len(files.text()))
+        for i, path in enumerate(_PATHS):
+            self.assertEqual(files.text()[offsets[i]:offsets[i + 1]], path + '\n')
+
+    def test_lower(self):
+        files = FileList(_PATHS)
+        lower = files.lower()
+        self.assertEqual(list(lower), [path.lower() for path in _PATHS])
+        self.assertIs(files.lower(), lower)
+        self.assertIs(lower.lower(), lower)
+
+        asciiFiles = FileList(['A/B.C', 'd'])
+        self.assertIs(asciiFiles.lower().offsets(), asciiFiles.offsets())
+
+    def test_concatenate(self):
+        first = FileList(_PATHS[:2])
+        self.assertIs(FileList.concatenate([first]), first)
+        files = FileList.concatenate([first, FileList([]), FileList(_PATHS[2:])])
+        self.assertEqual(list(files), _PATHS)
+        self.assertEqual(files[2], _PATHS[2])
+        self.assertEqual(list(files.lower()), [path.lower() for path in _PATHS])
+
+    def test_equal(self):
+        self.assertEqual(FileList(_PATHS), FileList(list(_PATHS)))
+        self.assertNotEqual(FileList(_PATHS), FileList(_PATHS[1:]))
+        self.assertEqual(FileList(_PATHS), _PATHS)
+        self.assertEqual(_PATHS, FileList(_PATHS))
+        self.assertNotEqual(FileList(_PATHS), _PATHS[1:])
+        self.assertNotEqual(FileList(['a', 'b']), ['a', 'c'])
+
+
+
+class Index(unittest.TestCase):
+    _FILES = [os.path.join(*path.split('/'))
+              for path in ('include/foo/util.h', 'src/foo/util.cpp', 'src/bar/util.cpp', 'Makefile',
+                           'src/.gitignore', 'lib/archive.tar.gz', 'src/main.cpp')]
+
+    def test_name(self):
+        for files in (self._FILES, FileList(self._FILES)):
+            index = FileNameIndex(files)
+            self.assertIs(index.files(), files)
+            self.assertEqual(index.findByName('util.cpp'), [self._FILES[1], self._FILES[2]])
+            self.assertEqual(index.findByName('Makefile'), [self._FILES[3]])
+            self.assertEqual(index.findByName('util'), [])
+            self.assertEqual(index.findByName('foo'), [])
+
+    def test_stem(self):
+        index = FileNameIndex(FileList(self._FILES))
+        self.assertEqual(index.findByStem('util'), self._FILES[:3])
+        self.assertEqual(index.findByStem('Makefile'), [self._FILES[3]])
+        self.assertEqual(index.findByStem('.gitignore'), [self._FILES[4]])
+        self.assertEqual(index.findByStem('archive.tar'), [self._FILES[5]])
+        self.assertEqual(index.findByStem('archive'), [])
+
+    def test_empty(self):
+        index = FileNameIndex(FileList([]))
+        self.assertEqual(index.findByName('a'), [])
+        self.assertEqual(index.findByStem('a'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
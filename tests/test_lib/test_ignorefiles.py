@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import os.path
+import sys
+import tempfile
+import shutil
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+
+import base
+
+from enki.lib import ignorefiles
+
+
+def _rules(text):
+    return ignorefiles.IgnoreRules(ignoreFile=ignorefiles._IgnoreFile(ignorefiles.parseIgnoreFile(text)))
+
+
+class Patterns(unittest.TestCase):
+    def test_name(self):
+        rules = _rules('# comment\n\n*.o\nbuild\n')
+        self.assertTrue(rules.isIgnored('a.o', False))
+        self.assertTrue(rules.isIgnored('src/lib/a.o', False))
+        self.assertTrue(rules.isIgnored('src/build', True))
+        self.assertTrue(rules.isIgnored('build', False))
+        self.assertFalse(rules.isIgnored('a.c', False))
+        self.assertFalse(rules.isIgnored('a.o.c', False))
+        self.assertFalse(rules.isIgnored('# comment', False))
+
+    def test_directory_only(self):
+        rules = _rules('node_modules/\n')
+        self.assertTrue(rules.isIgnored('node_modules', True))
+        self.assertTrue(rules.isIgnored('web/node_modules', True))
+        self.assertFalse(rules.isIgnored('node_modules', False))
+
+    def test_anchored(self):
+        rules = _rules('/out\ndoc/*.html\n')
+        self.assertTrue(rules.isIgnored('out', True))
+        self.assertFalse(rules.isIgnored('src/out', True))
+        self.assertTrue(rules.isIgnored('doc/index.html', False))
+        self.assertFalse(rules.isIgnored('doc/api/index.html', False))
+        self.assertFalse(rules.isIgnored('src/doc/index.html', False))
+
+    def test_double_star(self):
+        rules = _rules('**/cache\nlogs/**\na/**/b\n')
+        self.assertTrue(rules.isIgnored('cache', True))
+        self.assertTrue(rules.isIgnored('x/y/cache', True))
+        self.assertTrue(rules.isIgnored('logs/x/y', False))
+        self.assertFalse(rules.isIgnored('logs', True))
+        self.assertTrue(rules.isIgnored('a/b', True))
+        self.assertTrue(rules.isIgnored('a/x/y/b', True))
+
+    def test_wildcards(self):
+        rules = _rules('file?.[ch]\n[!a]*.txt\n\\#literal\n')
+        self.assertTrue(rules.isIgnored('file1.c', False))
+        self.assertTrue(rules.isIgnored('file2.h', False))
+        self.assertFalse(rules.isIgnored('file10.c', False))
+        self.assertTrue(rules.isIgnored('b.txt', False))
+        self.assertFalse(rules.isIgnored('a.txt', False))
+        self.assertTrue(rules.isIgnored('#literal', False))
+
+    def test_negation(self):
+        rules = _rules('*.log\n!keep.log\n')
+        self.assertTrue(rules.isIgnored('a.log', False))
+        self.assertFalse(rules.isIgnored('keep.log', False))
+
+        rules = _rules('!keep.log\n*.log\n')  # the last matching pattern wins
+        self.assertTrue(rules.isIgnored('keep.log', False))
+
+
+class Hierarchy(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _write(self, relPath, text):
+        fullPath = os.path.join(self.path, relPath)
+        os.makedirs(os.path.dirname(fullPath), exist_ok=True)
+        with open(fullPath, 'w') as file_:
+            file_.write(text)
+
+    def _rulesFor(self, rules, relDir):
+        fullPath = os.path.join(self.path, relDir)
+        return rules.forDirectory(relDir, fullPath, os.listdir(fullPath))
+
+    def test_subdirectory_overrides(self):
+        self._write('.gitignore', '*.log\n')
+        self._write('sub/.gitignore', '!debug.log\n/local\n')
+        self._write('sub/.ignore', 'generated.py\n')
+
+        rootRules = self._rulesFor(ignorefiles.IgnoreRules(), '')
+        subRules = self._rulesFor(rootRules, 'sub')
+
+        self.assertTrue(rootRules.isIgnored('debug.log', False))
+        self.assertTrue(subRules.isIgnored(os.path.join('sub', 'a.log'), False))
+        self.assertFalse(subRules.isIgnored(os.path.join('sub', 'debug.log'), False))
+        self.assertTrue(subRules.isIgnored(os.path.join('sub', 'local'), True))
+        self.assertFalse(subRules.isIgnored('local', True))
+        self.assertTrue(subRules.isIgnored(os.path.join('sub', 'generated.py'), False))
+        self.assertFalse(rootRules.isIgnored('generated.py', False))
+
+    def test_no_ignore_files(self):
+        self._write('a.txt', '')
+        rules = ignorefiles.IgnoreRules()
+        self.assertIs(self._rulesFor(rules, ''), rules)
+        self.assertTrue(rules.isEmpty())
+
+    def test_tree_in_repository(self):
+        os.mkdir(os.path.join(self.path, '.git'))
+        self._write('.gitignore', 'src/generated/\n*.tmp\n')
+
+        rules = ignorefiles.rulesForTree(os.path.join(self.path, 'src'))
+        self.assertFalse(rules.isEmpty())
+        self.assertTrue(rules.isIgnored('generated', True))
+        self.assertTrue(rules.isIgnored(os.path.join('lib', 'a.tmp'), False))
+        self.assertFalse(rules.isIgnored('main.c', False))
+
+    def test_tree_outside_repository(self):
+        self._write('.gitignore', '*.tmp\n')
+        rules = ignorefiles.rulesForTree(os.path.join(self.path, 'src'))
+        self.assertTrue(rules.isEmpty())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import unittest
+import glob
+import os
+import os.path
+import sys
+import tempfile
+import shutil
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+
+import base
+
+from enki.lib import pathcompleter
+
+
+class DirectoryCache(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        for relPath in ('src/main.py', 'src/util.py', 'src/lib/a.c', 'doc/index.rst', '.hidden/x', 'README'):
+            fullPath = os.path.join(self.path, relPath)
+            os.makedirs(os.path.dirname(fullPath), exist_ok=True)
+            open(fullPath, 'w').close()
+
+        # Listings of the recently modified directories are not cached
+        oldTime = 1000000000
+        for root, dirs, files in os.walk(self.path):
+            os.utime(root, (oldTime, oldTime))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_listing(self):
+        cache = pathcompleter._DirectoryCache(2)
+        srcPath = os.path.join(self.path, 'src')
+        listing = cache.listing(srcPath)
+        self.assertEqual(listing, {'main.py': False, 'util.py': False, 'lib': True})
+        self.assertIs(cache.listing(srcPath + '/'), listing)
+
+        open(os.path.join(srcPath, 'new.py'), 'w').close()  # changes mtime
+        self.assertIn('new.py', cache.listing(srcPath))
+
+        with self.assertRaises(NotADirectoryError):
+            cache.listing(os.path.join(self.path, 'README'))
+
+    def test_glob(self):
+        for pattern in ('*', 's*/*', '*/*.py', 'src/l*/*', '.h*/*', 'doc/index.rst', 'no*/*'):
+            fullPattern = os.path.join(self.path, pattern)
+            self.assertEqual(sorted(path for path, isDir in pathcompleter._glob(fullPattern)),
+                             sorted(glob.glob(fullPattern)),
+                             pattern)
+            for path, isDir in pathcompleter._glob(fullPattern):
+                self.assertEqual(isDir, os.path.isdir(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,6 +37,21 @@ class TestFindApproxText(unittest.TestCase):
         self.assertTrue(mo)
         self.assertEqual(mo.start(), 3)
         self.assertEqual(mo.end(), 4)
+
+    # Find a match with errors in a long text, where only the ranges around
+    # exact pieces of the searchText are searched.
+    def test_2(self):
+        targetText = 'Some filler text. '*50 + 'The CodeChat user manual' + ' More filler text.'*50
+        mo = g(searchText='The :doc:`README` user manual',
+               targetText=targetText)
+        self.assertTrue(mo)
+        self.assertEqual(targetText[mo.start():mo.end()], 'The CodeChat user manual')
+
+    # A match which is as good as another one isn't unique.
+    def test_3(self):
+        mo = g(searchText='abcdefgh',
+               targetText='abcdefxx abcdefyy')
+        self.assertIsNone(mo)
 #
 # Tests for findApproxTextInTarget
 # ================================
@@ -7,6 +7,7 @@ import unittest
 import os.path
 import os
 import sys
+import threading
 
 
 sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
@@ -17,6 +18,8 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtTest import QTest
 
 from enki.core.core import core
+from enki.lib.filelist import FileList
+from enki.plugins.fuzzyopen import matcher
 
 
 PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'enki'))
@@ -126,5 +129,65 @@ class Test(base.TestCase):
         self._waitFiles()
         self.assertFalse(core.project().isScanning())
 
+
+class Matcher(unittest.TestCase):
+    matcherClass = matcher.FuzzyMatcher
+
+    _FILES = ['core/workspace.py', 'core/mainwindow.py', 'ui/UISettings.ui',
+              'plugins/helpmenu/UIAbout.ui', 'plugins/qpartsettings/Indentation.ui']
+
+    def _match(self, matcher, pattern, excluded=frozenset()):
+        return [path for path, score, indexes in matcher.match(pattern, 3, excluded, threading.Event())]
+
+    def test_order(self):
+        matcher = self.matcherClass(self._FILES)
+        self.assertEqual(self._match(matcher, 'cowo'), ['core/workspace.py', 'core/mainwindow.py'])
+        self.assertEqual(self._match(matcher, 'cowo', {'core/workspace.py'}), ['core/mainwindow.py'])
+        self.assertEqual(len(self._match(matcher, 'u')), 3)
+
+    def test_extend_pattern(self):
+        """ Results are the same, when the previous candidates are reused """
+        matcher = self.matcherClass(self._FILES)
+        for pattern in ('a', 'at', 'atu', 'At', 'Atu', 'a', 'at', 'atux'):
+            self.assertEqual(self._match(matcher, pattern),
+                             self._match(self.matcherClass(self._FILES), pattern),
+                             pattern)
+
+    def test_stop(self):
+        event = threading.Event()
+        event.set()
+        self.assertIsNone(self.matcherClass(self._FILES).match('a', 3, set(), event))
+
+
+@unittest.skipIf(matcher.numpy is None, 'NumPy is not installed')
+class NumpyMatcher(Matcher):
+    matcherClass = matcher.NumpyFuzzyMatcher
+
+    def test_same_as_python(self):
+        files = [os.path.join(dirPath, fileName)
+                 for dirPath, dirNames, fileNames in os.walk(PROJ_ROOT)
+                 for fileName in fileNames]
+        pythonMatcher = matcher.FuzzyMatcher(files)
+        numpyMatcher = matcher.NumpyFuzzyMatcher(files)
+        excluded = set(files[::10])
+        for pattern in ('p', 'py', 'co', 'cowo', 'Atu', 'ui', 'uis', 'x/', 'zzz'):
+            self.assertEqual(numpyMatcher.match(pattern, 10, excluded, threading.Event()),
+                             pythonMatcher.match(pattern, 10, excluded, threading.Event()),
+                             pattern)
+
+    def test_file_list(self):
+        """ FileList gives the same results as list """
+        files = [os.path.join(dirPath, fileName)
+                 for dirPath, dirNames, fileNames in os.walk(PROJ_ROOT)
+                 for fileName in fileNames]
+        for matcherClass in (matcher.FuzzyMatcher, matcher.NumpyFuzzyMatcher):
+            listMatcher = matcherClass(files)
+            fileListMatcher = matcherClass(FileList(files))
+            for pattern in ('p', 'py', 'pyx', 'Atu', 'ui', 'u'):
+                self.assertEqual(fileListMatcher.match(pattern, 10, set(), threading.Event()),
+                                 listMatcher.match(pattern, 10, set(), threading.Event()),
+                                 pattern)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import unittest
+import os.path
+import sys
+import random
+import re
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+
+import base
+
+from enki.plugins.searchreplace.matchindex import MatchIndex
+
+
+def _allMatches(index):
+    return [index.match(i) for i in range(index.count())]
+
+
+def _expectedMatches(regExp, text):
+    return [match.span() for match in regExp.finditer(text)]
+
+
+class Test(unittest.TestCase):
+    def _edit(self, index, text, position, removed, added):
+        index.invalidate(position, removed, len(added))
+        return text[:position] + added + text[position + removed:]
+
+    def test_queries(self):
+        index = MatchIndex(re.compile('foo'), 'foo bar foo\nbaz foo')
+        self.assertEqual(index.count(), 3)
+        self.assertEqual(index.indexAt(0), 0)
+        self.assertEqual(index.indexAt(1), 1)
+        self.assertEqual(index.indexAt(17), 3)
+        self.assertEqual(index.match(2), (16, 19))
+        self.assertEqual(index.matchesInRange(2, 10), [(0, 3), (8, 11)])
+        self.assertEqual(index.matchesInRange(12, 15), [])
+
+    def test_edit(self):
+        regExp = re.compile('foo')
+        text = 'foo\nbar\n' * 100
+        index = MatchIndex(regExp, text)
+        text = self._edit(index, text, 400, 0, 'xfoo')
+        text = self._edit(index, text, 10, 4, '')
+        self.assertFalse(index.isUpToDate())
+        index.update(text)
+        self.assertTrue(index.isUpToDate())
+        self.assertEqual(_allMatches(index), _expectedMatches(regExp, text))
+        self.assertEqual(index.indexAt(403), 51)
+
+    def test_multiline_match(self):
+        regExp = re.compile('a\n\n\nb')
+        text = 'a\nccaaa\n\n\ncbc\n\n\n'
+        index = MatchIndex(regExp, text)
+        text = self._edit(index, text, 10, 1, 'b')
+        index.update(text)
+        self.assertEqual(_allMatches(index), [(6, 11)])
+
+    def test_long_line(self):
+        regExp = re.compile('a.*b')
+        text = 'a' + 'c' * 5000 + 'b\n'
+        index = MatchIndex(regExp, text)
+        text = self._edit(index, text, 0, 1, '')
+        index.update(text)
+        self.assertEqual(_allMatches(index), [])
+        text = self._edit(index, text, 0, 0, 'a')
+        index.update(text)
+        self.assertEqual(_allMatches(index), [(0, 5002)])
+
+    def test_random_edits(self):
+        patterns = ['a', 'ab*', r'\bab\b', 'a\nb', '^b', r'(?<=\n)a', 'b*', '[ab]+c?',
+                    'a\n\n\nb', r'a\s+b', '(?s)a.{0,5}b', '[^c]{3}b', r'a(?=[^c]*b)']
+        rand = random.Random(1)
+        for pattern in patterns:
+            regExp = re.compile(pattern, re.MULTILINE)
+            text = ''.join(rand.choice('aabc \n') for _ in range(3000))
+            index = MatchIndex(regExp, text)
+            for _ in range(200):
+                for _ in range(rand.randint(1, 3)):  # several edits before the update
+                    position = rand.randint(0, len(text))
+                    removed = rand.randint(0, min(5, len(text) - position))
+                    added = ''.join(rand.choice('ab \n') for _ in range(rand.randint(0, 5)))
+                    text = self._edit(index, text, position, removed, added)
+                index.update(text)
+                self.assertEqual(_allMatches(index), _expectedMatches(regExp, text), pattern)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import unittest
+import os.path
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+
+import base
+
+from enki.plugins.searchreplace.projectcache import FileMetadataCache
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_update_and_reload(self):
+        cache = FileMetadataCache('/project', self._dir.name)
+        cache.load()
+        self.assertEqual(cache.entries(), {})
+
+        entry = ((1, 2, 3), 'ascii')
+        entries = cache.updatedEntries([('/project/a', entry), ('/other/b', entry), ('/project/c', None)])
+        self.assertEqual(entries, {'/project/a': entry})
+        self.assertEqual(cache.entries(), {})  # entries are replaced, not modified
+        cache.setEntries(entries)
+        self.assertIsNone(cache.updatedEntries([('/project/a', entry)]))
+        cache.save()
+
+        reloaded = FileMetadataCache('/project', self._dir.name)
+        reloaded.load()
+        self.assertEqual(reloaded.entries(), {'/project/a': entry})
+        self.assertEqual(reloaded.updatedEntries([('/project/a', None)]), {})
+
+    def test_other_project(self):
+        cache = FileMetadataCache('/project', self._dir.name)
+        cache.setEntries({'/project/a': ((1, 2, 3), 'text')})
+        cache.save()
+
+        otherCache = FileMetadataCache('/project2', self._dir.name)
+        otherCache.load()
+        self.assertEqual(otherCache.entries(), {})
+
+
+    def test_roots(self):
+        cache = FileMetadataCache('/project', self._dir.name, ['/project', '/other'])
+        self.assertEqual(cache.relativePath('/project/a'), 'a')
+        self.assertEqual(cache.relativePath('/other/b'), os.path.join('..', 'other', 'b'))
+        self.assertIsNone(cache.relativePath('/another/c'))
+
+        cache.load()
+        entry = ((1, 2, 3), 'ascii')
+        entries = cache.updatedEntries([('/project/a', entry), ('/other/b', entry), ('/another/c', entry)])
+        self.assertEqual(entries, {'/project/a': entry, '/other/b': entry})
+
+
+if __name__ == '__main__':
+    unittest.main()
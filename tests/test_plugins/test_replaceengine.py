@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import os.path
+import sys
+import re
+import stat
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+
+import base
+
+from enki.plugins.searchreplace import replaceengine
+from enki.plugins.searchreplace import searchengine
+
+
+def _positions(regExp, text):
+    """Find matches in the format of replaceengine
+    """
+    return [(line, column, length)
+            for wholeLine, line, column, length in searchengine.searchInText(regExp, text)]
+
+
+class ReplaceInText(unittest.TestCase):
+    def test_constant(self):
+        regExp = re.compile('a+')
+        text = 'a b aa\nc aaa\n'
+        self.assertEqual(replaceengine.replaceInText(regExp, 'X', text, _positions(regExp, text)),
+                         ('X b X\nc X\n', 3, 0))
+
+    def test_substitutions(self):
+        regExp = re.compile(r'(\w+)=(\w+)')
+        text = 'a=b\nfoo=bar x=y'
+        self.assertEqual(replaceengine.replaceInText(regExp, r'\2=\1\t', text, _positions(regExp, text)),
+                         (regExp.sub(r'\2=\1\t', text), 3, 0))
+
+    def test_modified(self):
+        regExp = re.compile('foo')
+        positions = _positions(regExp, 'foo\nfoo\nfoo')
+        self.assertEqual(replaceengine.replaceInText(regExp, 'bar', 'foo\nfo\nfoo', positions),
+                         ('bar\nfo\nbar', 2, 1))
+
+
+class ReplaceAllInText(unittest.TestCase):
+    @staticmethod
+    def _apply(text, hunks):
+        for start, end, newText in reversed(hunks):
+            text = text[:start] + newText + text[end:]
+        return text
+
+    def test_hunks(self):
+        text = 'foo foo\nbar\nfoo\nbaz\nbar\n'
+        hunks, count = replaceengine.replaceAllInText(re.compile('foo'), 'X', text)
+        self.assertEqual(count, 3)
+        self.assertEqual(hunks, [(0, 7, 'X X'), (12, 15, 'X')])  # only changed lines
+
+    def test_multiline(self):
+        regExp = re.compile(r'a\nb')
+        text = 'xa\nby\nz\na\nb'
+        hunks, count = replaceengine.replaceAllInText(regExp, r'\n', text)
+        self.assertEqual(count, 2)
+        self.assertEqual(self._apply(text, hunks), regExp.sub('\n', text))
+
+    def test_many_hunks(self):
+        text = 'foo\nbar\n' * (replaceengine.MAX_HUNK_COUNT + 1)
+        hunks, count = replaceengine.replaceAllInText(re.compile('foo'), 'baz', text)
+        self.assertEqual(len(hunks), 1)
+        self.assertEqual(self._apply(text, hunks), text.replace('foo', 'baz'))
+
+    def test_stop(self):
+        self.assertIsNone(replaceengine.replaceAllInText(re.compile('a'), 'b', 'a' * 10000, lambda: True))
+
+
+class ReplaceInFile(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._dir.name, 'file.txt')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_replace(self):
+        text = ''.join('line {} foo\n'.format(i) for i in range(10000))
+        with open(self._path, 'w') as openedFile:
+            openedFile.write(text)
+        os.chmod(self._path, 0o640)
+
+        regExp = re.compile('foo')
+        replacedCount, writtenBytes, errors = replaceengine.replaceInFile(regExp, 'barbaz', self._path,
+                                                                          _positions(regExp, text))
+        self.assertEqual((replacedCount, errors), (10000, []))
+
+        with open(self._path) as openedFile:
+            newText = openedFile.read()
+        self.assertEqual(newText, text.replace('foo', 'barbaz'))
+        self.assertEqual(writtenBytes, len(newText))
+        self.assertEqual(stat.S_IMODE(os.stat(self._path).st_mode), 0o640)
+        self.assertEqual(os.listdir(self._dir.name), ['file.txt'])  # no temporary files left
+
+    def test_hard_link(self):
+        with open(self._path, 'w') as openedFile:
+            openedFile.write('foo\n')
+        linkPath = os.path.join(self._dir.name, 'link.txt')
+        os.link(self._path, linkPath)
+
+        regExp = re.compile('foo')
+        replacedCount, writtenBytes, errors = replaceengine.replaceInFile(regExp, 'bar', self._path,
+                                                                          _positions(regExp, 'foo\n'))
+        self.assertEqual((replacedCount, errors), (1, []))
+        for path in (self._path, linkPath):
+            with open(path) as openedFile:
+                self.assertEqual(openedFile.read(), 'bar\n')
+        self.assertTrue(os.path.samefile(self._path, linkPath))
+
+    def test_not_readable(self):
+        replacedCount, writtenBytes, errors = replaceengine.replaceInFile(re.compile('a'), 'b', self._path,
+                                                                          [(0, 0, 1)])
+        self.assertEqual((replacedCount, writtenBytes, len(errors)), (0, 0, 1))
+        self.assertFalse(os.path.exists(self._path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+import unittest
+import bisect
+import mmap
+import os.path
+import sys
+import re
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+
+import base
+
+from enki.plugins.searchreplace import searchengine
+
+
+class SearchInData(unittest.TestCase):
+    """Searching in bytes must give the same results as searching in the decoded text
+    """
+    _PATTERNS = ['ab', r'\bab\b', r'\s+', r'\w+', 'a.b', 'b$', '(?m)^a', '(?i)k', 'é', 'b\na']
+
+    def _check(self, text):
+        for pattern in self._PATTERNS:
+            regExp = re.compile(pattern)
+            self.assertEqual(searchengine.searchInData(regExp, text.encode('utf8')),
+                             searchengine.searchInText(regExp, text),
+                             pattern)
+
+    def test_ascii(self):
+        self._check('ab a_b\nab\n\n xab ab\tk\na\nb')
+
+    def test_non_ascii(self):
+        self._check('ab aéb\nab\n\n éab ab\tK\na\nb')
+
+    def test_unicode_spaces(self):
+        self._check('ab\x1cab\nab\x1f\n')
+
+    def test_binary(self):
+        self.assertEqual(searchengine.searchInData(re.compile('ab'), b'ab\0ab'), [])
+
+
+class PatternProperties(unittest.TestCase):
+    def _properties(self, pattern, flags=0):
+        return tuple(searchengine.patternProperties(re.compile(pattern, flags)))
+
+    def test_newline(self):
+        for pattern in ['a\nb', r'a\s+b', '(?s)a.b', 'a(?s:.)b', '[^c]', r'[\x00-\x20]', r'[^\S]', r'\W']:
+            self.assertTrue(self._properties(pattern)[0], pattern)
+        for pattern in ['a.b', '(?s)a(?-s:.)b', r'\S+', r'[^\n]', r'\w\d', '[a-z]', r'\ba\b']:
+            self.assertFalse(self._properties(pattern)[0], pattern)
+        self.assertTrue(self._properties('a.b', re.DOTALL)[0])
+
+    def test_length(self):
+        self.assertEqual(self._properties('ab{0,5}c')[1], 7)
+        self.assertEqual(self._properties('(ab|c)')[1], 2)
+        for pattern in ['ab*', 'a(?=b)', r'(a)\1', '(a)?(?(1)b|c)']:
+            self.assertIsNone(self._properties(pattern)[1], pattern)
+
+    def test_anchors(self):
+        for pattern in [r'\Aa', r'a\Z', '^a', 'a$', '(?-m:^a)']:
+            self.assertTrue(self._properties(pattern, re.MULTILINE if pattern.startswith('(') else 0)[2],
+                            pattern)
+        for pattern in ['(?m)^a', '(?m)a$', r'\ba\B', '(?m:^a)']:
+            self.assertFalse(self._properties(pattern)[2], pattern)
+
+
+class LiteralSearch(unittest.TestCase):
+    """Strings and alternations of strings are searched without the regular expression,
+    the results must be the same
+    """
+    _PATTERNS = ['ab', 'b', r'a\.b', r'a\ b', 'ab|a|b', 'ba|ab', 'abc|xyz', 'xyz', r'\bab\b', r'\bxyz\b', 'é', 'é|ab']
+
+    def _check(self, text):
+        for pattern in self._PATTERNS:
+            for flags in (0, re.IGNORECASE):
+                regExp = re.compile(pattern, flags)
+                for content in (text, text.encode('utf8')):
+                    if isinstance(content, bytes):
+                        try:
+                            regExp = re.compile(pattern.encode('ascii'), flags)
+                        except UnicodeEncodeError:
+                            continue
+                    self.assertEqual(list(searchengine._matchSpans(regExp, content)),
+                                     [match.span() for match in regExp.finditer(content)],
+                                     (pattern, flags, content))
+
+    def test_ascii(self):
+        self._check('ab Ab a.b a b\nbab AB aab\nabab xy')
+
+    def test_non_ascii(self):
+        self._check('ab Ab é É\nbab AB aab')
+
+    def test_not_literal(self):
+        for pattern in ['a.b', 'a+', r'a\d', '(ab)', 'a|', r'\bab|cd\b', '[ab]']:
+            self.assertIsNone(searchengine._literalSearchParams(pattern, 0), pattern)
+
+    def test_ignore_case_search(self):
+        regExp = re.compile('foo|bar', re.IGNORECASE)
+        text = 'Foo\nxBARx foo\n'
+        self.assertEqual(searchengine.searchInData(regExp, text.encode('utf8')),
+                         [('Foo', 0, 0, 3), ('xBARx foo', 1, 1, 3), ('xBARx foo', 1, 6, 3)])
+
+
+class SearchInFile(unittest.TestCase):
+    def test_mapped_file(self):
+        text = ''.join('line {} foo={}\n'.format(i, i * 7) for i in range(50000))
+        self.assertGreater(len(text), searchengine.MMAP_MIN_FILE_SIZE)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as textFile:
+            textFile.write(text)
+        try:
+            regExp = re.compile(r'foo=7\d+')
+            self.assertEqual(searchengine.searchInFile(regExp, textFile.name),
+                             searchengine.searchInText(regExp, text))
+        finally:
+            os.unlink(textFile.name)
+
+    def test_mapped_non_ascii_file(self):
+        """Non-ASCII mapped files are searched by chunks, if the pattern allows it
+        """
+        lines = ['line {} foo={} {}\n'.format(i, i * 7, 'é' if i % 1000 == 999 else 'e') for i in range(50000)]
+        text = ''.join(lines)
+        data = text.encode('utf8')[:-20] + b'\xff' + text.encode('utf8')[-20:]  # invalid byte is skipped
+        text = searchengine.decodeData(data, 'ignore')
+
+        with tempfile.NamedTemporaryFile('wb', suffix='.txt', delete=False) as textFile:
+            textFile.write(data)
+        oldChunkSize = searchengine._CHUNK_SIZE
+        searchengine._CHUNK_SIZE = 10000
+        try:
+            for pattern in [r'foo=7\d+', r'é', r'\d+ [eé]$', '(?m)^line 4', 'line 0', r'\d+\Z', r'\d\n', '=4.+7']:
+                regExp = re.compile(pattern)
+                matches, metadata = searchengine.searchInFileWithMetadata(regExp, textFile.name, None)
+                self.assertEqual(matches, searchengine.searchInText(regExp, text), pattern)
+                self.assertEqual(metadata[1], searchengine.KIND_TEXT)
+        finally:
+            searchengine._CHUNK_SIZE = oldChunkSize
+            os.unlink(textFile.name)
+
+    def test_empty_matches_in_chunks(self):
+        """Empty matches on the chunk borders are found once
+        """
+        text = ('é\n' + 'x' * 5 + '\n') * 10
+        with tempfile.NamedTemporaryFile('wb', suffix='.txt', delete=False) as textFile:
+            textFile.write(text.encode('utf8'))
+        oldChunkSize = searchengine._CHUNK_SIZE
+        searchengine._CHUNK_SIZE = 16
+        try:
+            with open(textFile.name, 'rb') as openedFile, \
+                    mmap.mmap(openedFile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for pattern in ['(?m)$', 'x*', 'q?', '(?m)^', 'x']:
+                    regExp = re.compile(pattern)
+                    lineStarts = searchengine.lineStartOffsets(text)
+                    expected = []
+                    for match in regExp.finditer(text):
+                        line = bisect.bisect_right(lineStarts, match.start()) - 1
+                        expected.append((line, match.start() - lineStarts[line], match.end() - match.start()))
+                    found = searchengine.searchInData(regExp, data)
+                    self.assertEqual([result[1:] for result in found], expected, pattern)
+        finally:
+            searchengine._CHUNK_SIZE = oldChunkSize
+            os.unlink(textFile.name)
+
+    def test_empty_file(self):
+        with tempfile.NamedTemporaryFile(delete=False) as emptyFile:
+            pass
+        try:
+            self.assertEqual(searchengine.searchInFile(re.compile('a'), emptyFile.name), [])
+        finally:
+            os.unlink(emptyFile.name)
+
+
+class SearchInFileWithMetadata(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._dir.name, 'file.txt')
+        with open(self._path, 'w') as openedFile:
+            openedFile.write('foo\n')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_detect(self):
+        matches, metadata = searchengine.searchInFileWithMetadata(re.compile('foo'), self._path, None)
+        self.assertEqual(matches, [('foo', 0, 0, 3)])
+        self.assertEqual(metadata, (searchengine.fileKey(self._path), searchengine.KIND_ASCII))
+
+    def test_known_binary(self):
+        metadata = (searchengine.fileKey(self._path), searchengine.KIND_BINARY)
+        self.assertEqual(searchengine.searchInFileWithMetadata(re.compile('foo'), self._path, metadata),
+                         ([], metadata))
+
+    def test_modified(self):
+        metadata = (searchengine.fileKey(self._path), searchengine.KIND_BINARY)
+        with open(self._path, 'a') as openedFile:
+            openedFile.write('bar foo\n')
+        matches, newMetadata = searchengine.searchInFileWithMetadata(re.compile('foo'), self._path, metadata)
+        self.assertEqual(len(matches), 2)
+        self.assertEqual(newMetadata[1], searchengine.KIND_ASCII)
+
+    def test_not_readable(self):
+        self.assertEqual(searchengine.searchInFileWithMetadata(re.compile('foo'), self._path + '.none', None),
+                         ([], None))
+
+
+if __name__ == '__main__':
+    unittest.main()
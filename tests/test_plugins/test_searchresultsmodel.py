@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import unittest
+import os.path
+import sys
+import random
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+
+import base
+
+from PyQt5.QtCore import QModelIndex, QPersistentModelIndex, Qt
+
+from enki.plugins.searchreplace.searchresultsmodel import FileResults, SearchResultsModel, _RowIndex
+
+
+def _fileResults(fileName, lineCount):
+    return FileResults('/base', '/base/' + fileName,
+                       [('foo line %d' % line, line, 0, 3) for line in range(lineCount)])
+
+
+class RowIndex(unittest.TestCase):
+    def test_random(self):
+        rand = random.Random(1)
+        index = _RowIndex()
+        alive = []
+        for _ in range(2000):
+            if alive and rand.random() < 0.4:
+                slot = alive.pop(rand.randrange(len(alive)))
+                index.remove(slot)
+            else:
+                alive.append(index.append())
+                alive.sort()
+
+            self.assertEqual(index.count(), len(alive))
+            row = rand.randrange(len(alive)) if alive else None
+            if row is not None:
+                self.assertEqual(index.slot(row), alive[row])
+                self.assertEqual(index.row(alive[row]), row)
+
+
+class Model(unittest.TestCase):
+    def setUp(self):
+        self.model = SearchResultsModel(None)
+        self.model.setReplaceMode(True)
+        self.model.appendResults([_fileResults('a', 3), _fileResults('b', 5), _fileResults('c', 1)])
+
+    def _fileIndex(self, row):
+        return self.model.index(row, 0, QModelIndex())
+
+    def test_structure(self):
+        self.assertEqual(self.model.rowCount(QModelIndex()), 3)
+        self.assertEqual(self.model.matchesCount(), 9)
+        fileIndex = self._fileIndex(1)
+        self.assertEqual(fileIndex.data(), 'b (5)')
+        self.assertEqual(self.model.rowCount(fileIndex), 5)
+
+        resultIndex = self.model.index(2, 0, fileIndex)
+        self.assertEqual(self.model.parent(resultIndex), fileIndex)
+        self.assertIn('Line: 3, Column: 0', resultIndex.data())
+        self.assertEqual(resultIndex.data(Qt.ToolTipRole), 'foo line 2')
+
+    def test_check(self):
+        fileIndex = self._fileIndex(1)
+        self.model.setData(self.model.index(1, 0, fileIndex), Qt.Unchecked, Qt.CheckStateRole)
+        self.assertEqual(fileIndex.data(Qt.CheckStateRole), Qt.PartiallyChecked)
+        self.assertEqual(self.model.checkedPositions()['/base/b'], [(0, 0, 3), (2, 0, 3), (3, 0, 3), (4, 0, 3)])
+
+        self.model.setData(fileIndex, Qt.Unchecked, Qt.CheckStateRole)
+        self.assertEqual(fileIndex.data(Qt.CheckStateRole), Qt.Unchecked)
+        self.assertNotIn('/base/b', self.model.checkedPositions())
+
+    def test_remove(self):
+        self.model.onResultsHandledByReplaceThread('/base/b', [(1, 0, 3), (2, 0, 3), (4, 0, 3)])
+        self.assertEqual(self.model.matchesCount(), 6)
+        self.assertEqual(self.model.checkedPositions()['/base/b'], [(0, 0, 3), (3, 0, 3)])
+
+        self.model.onResultsHandledByReplaceThread('/base/a', [(0, 0, 3), (1, 0, 3), (2, 0, 3)])
+        self.assertEqual(self.model.rowCount(QModelIndex()), 2)
+        self.assertEqual(self._fileIndex(0).data(), 'b (2)')
+        self.assertEqual(self._fileIndex(1).data(), 'c (1)')
+        self.assertEqual(self.model.matchesCount(), 3)
+
+    def test_sort(self):
+        self.model.appendResults([_fileResults('0', 2)])
+        fileIndex = self._fileIndex(3)
+        resultIndex = self.model.index(1, 0, fileIndex)
+        persistentFileIndex = QPersistentModelIndex(fileIndex)
+        persistentResultIndex = QPersistentModelIndex(resultIndex)
+
+        self.model.sortResults()
+        self.assertEqual([self._fileIndex(row).data() for row in range(4)],
+                         ['0 (2)', 'a (3)', 'b (5)', 'c (1)'])
+        self.assertEqual(persistentFileIndex.row(), 0)
+        self.assertEqual(persistentResultIndex.parent(), self._fileIndex(0))
+
+        self.model.onResultsHandledByReplaceThread('/base/a', [(0, 0, 3), (1, 0, 3), (2, 0, 3)])
+        self.assertEqual(self._fileIndex(1).data(), 'b (5)')
+
+
+if __name__ == '__main__':
+    unittest.main()
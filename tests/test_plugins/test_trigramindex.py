@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import unittest
+import os.path
+import sys
+import re
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+
+import base
+
+from enki.plugins.searchreplace import trigramindex
+from enki.plugins.searchreplace.trigramindex import TrigramIndex, indexFiles, requiredTrigrams
+
+
+def _never():
+    return False
+
+
+class RequiredTrigrams(unittest.TestCase):
+    def _trigrams(self, pattern, flags=0):
+        return requiredTrigrams(re.compile(pattern, flags))
+
+    def test_literal(self):
+        self.assertEqual(self._trigrams('Hello'), {b'hel', b'ell', b'llo'})
+        self.assertEqual(self._trigrams('ab'), set())
+
+    def test_alternation(self):
+        self.assertEqual(self._trigrams('foo|bar'), set())
+        self.assertEqual(self._trigrams('abcd(x|y)'), {b'abc', b'bcd'})
+
+    def test_groups(self):
+        self.assertEqual(self._trigrams('ab(cd)ef'), set())  # trigrams across the group borders are not used
+        self.assertEqual(self._trigrams('abc(def)'), {b'abc', b'def'})
+
+    def test_quantified_group(self):
+        self.assertEqual(self._trigrams('abc(def)*'), {b'abc'})
+        self.assertEqual(self._trigrams('abc(def)?ghi'), {b'abc', b'ghi'})
+        self.assertEqual(self._trigrams('abcd+'), {b'abc'})
+
+    def test_word_boundary(self):
+        self.assertEqual(self._trigrams(r'\bfoo\b'), {b'foo'})
+
+    def test_ignore_case(self):
+        self.assertEqual(self._trigrams('(?i)FOO'), {b'foo'})
+        self.assertEqual(self._trigrams('FOO', re.IGNORECASE), {b'foo'})
+        # Case folding of non-ASCII characters is not indexed
+        self.assertEqual(self._trigrams('(?i)фыв'), set())
+        self.assertNotEqual(self._trigrams('фыв'), set())
+
+    def test_local_flags(self):
+        self.assertEqual(self._trigrams('(?i)abc(?-i:DEF)'), {b'abc', b'def'})
+        self.assertEqual(self._trigrams('(?i)фыв(?-i:фыв)'), self._trigrams('фыв'))
+
+    def test_not_literal(self):
+        self.assertEqual(self._trigrams(r'a\w+b'), set())
+        self.assertEqual(self._trigrams('[abc]{3}'), set())
+
+
+class Index(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._cacheDir = tempfile.TemporaryDirectory()
+        self._projectPath = self._dir.name
+        self._write('foo.txt', b'hello world\n')
+        self._write('bar.txt', b'another text\n')
+        self._write('binary.bin', b'hello\0world\n')
+        self._write('invalid.txt', b'ab\xffcd\n')
+
+        self._index = TrigramIndex(self._projectPath, self._cacheDir.name)
+        self._index.load()
+        relPaths = ['foo.txt', 'bar.txt', 'binary.bin', 'invalid.txt']
+        self._index.setEntries(dict(indexFiles(self._projectPath, relPaths)))
+
+    def tearDown(self):
+        self._dir.cleanup()
+        self._cacheDir.cleanup()
+
+    def _path(self, relPath):
+        return os.path.join(self._projectPath, relPath)
+
+    def _write(self, relPath, data):
+        with open(self._path(relPath), 'wb') as file_:
+            file_.write(data)
+
+    def _filter(self, pattern, relPaths):
+        fileNames = [self._path(relPath) for relPath in relPaths]
+        candidates = self._index.filterFiles(fileNames, re.compile(pattern), _never)
+        return [os.path.relpath(fileName, self._projectPath) for fileName in candidates]
+
+    def test_filter(self):
+        allFiles = ['foo.txt', 'bar.txt', 'binary.bin', 'invalid.txt']
+        self.assertEqual(self._filter('world', allFiles), ['foo.txt'])
+        self.assertEqual(self._filter('(?i)TEXT', allFiles), ['bar.txt'])
+        self.assertEqual(self._filter('o', allFiles), allFiles)  # no trigrams, nothing is filtered
+
+    def test_not_indexed_files_are_kept(self):
+        self._write('new.txt', b'nothing\n')
+        self.assertEqual(self._filter('world', ['new.txt', 'foo.txt']), ['new.txt', 'foo.txt'])
+
+    def test_big_file_is_not_indexed(self):
+        oldSize = trigramindex.MAX_INDEXED_FILE_SIZE
+        trigramindex.MAX_INDEXED_FILE_SIZE = 4
+        try:
+            entries = dict(indexFiles(self._projectPath, ['foo.txt']))
+        finally:
+            trigramindex.MAX_INDEXED_FILE_SIZE = oldSize
+        self.assertIsNone(entries['foo.txt'][2])
+        self._index.setEntries(entries)
+        self.assertEqual(self._filter('nothing', ['foo.txt']), ['foo.txt'])
+
+    def test_invalid_utf8(self):
+        # The search drops invalid bytes, so 'abcd' is found in the file
+        self.assertEqual(self._filter('abcd', ['invalid.txt']), ['invalid.txt'])
+
+    def test_outdated_files(self):
+        relPaths = ['foo.txt', 'bar.txt', 'missing.txt']
+        self.assertEqual(self._index.outdatedFiles(relPaths, _never), ['missing.txt'])
+
+        self._write('foo.txt', b'hello changed world\n')
+        self.assertEqual(self._index.outdatedFiles(relPaths, _never), ['foo.txt', 'missing.txt'])
+        # modified file is kept by the filter
+        self.assertEqual(self._filter('xyz', ['foo.txt', 'bar.txt']), ['foo.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()